@@ -1,13 +1,27 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, status
+import asyncio
+import json
+import time
+from contextlib import ExitStack, asynccontextmanager
+from typing import List, Optional
 from datetime import datetime
-from app.schemas.response_models import AnalysisResultsResponse, SkinAnalysisResponse
-from app.services.image_processor import ImageProcessor
-from app.services.color_utils import ColorUtils
-from app.models.skin_analyzer import SkinAnalyzer
-from app.services.product_recommender import ProductRecommender
-from app.services.routine_builder import RoutineBuilder
+from fastapi import (
+    APIRouter, Depends, File, Query, Request, UploadFile, HTTPException, WebSocket, WebSocketDisconnect, status
+)
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from app.schemas.response_models import AnalysisResultsResponse, ColorAnalysisRequest, MultiFaceAnalysisResponse
+from app.services.analysis_pipeline import AnalysisOptions
+from app.services.lifecycle import components
+from app.services.live_tracker import LiveFaceTracker
+from app.services.quality_tiers import QualityTier, tier_controller
+from app.utils.deadline import RequestDeadline
 from app.utils.logger import app_logger
-from app.utils.error_handlers import InvalidImageException, FaceDetectionException
+from app.utils.resource_governor import resource_governor
+from app.utils.error_handlers import (
+    CosmoChromaException, InvalidImageException, FaceDetectionException, InvalidColorException, InvalidParameterException,
+    RequestCancelledException, exception_handler
+)
+from app.utils.validators import validate_rgb_values, validate_hex_color
 from config import settings
 
 router = APIRouter(
@@ -15,91 +29,351 @@ router = APIRouter(
     tags=["analysis"]
 )
 
-# Initialize components
-image_processor = ImageProcessor()
-color_utils = ColorUtils()
-skin_analyzer = SkinAnalyzer()
-product_recommender = ProductRecommender()
-routine_builder = RoutineBuilder()
+def analysis_options(
+    include: Optional[str] = Query(
+        None,
+        description="Comma-separated sections to compute, e.g. skin_analysis,foundation or recommendations,routines"
+    ),
+    top_k: int = Query(5, ge=1, le=50, description="Number of products per recommendation category"),
+    routine_refs: bool = Query(False, description="Link to /api/routines/{skin_type} instead of inlining routines")
+) -> AnalysisOptions:
+    """Parse the include/top_k/routine_refs query parameters shared by the analysis endpoints"""
+    return _parse_options(include, top_k, routine_refs)
+
+def face_analysis_options(
+    include: Optional[str] = Query(
+        "skin_analysis",
+        description="Comma-separated sections to compute per face, e.g. skin_analysis,foundation"
+    ),
+    top_k: int = Query(5, ge=1, le=50, description="Number of products per recommendation category"),
+    routine_refs: bool = Query(False, description="Link to /api/routines/{skin_type} instead of inlining routines")
+) -> AnalysisOptions:
+    """include/top_k/routine_refs for group photos, which default to skin analysis only"""
+    return _parse_options(include, top_k, routine_refs)
+
+def _parse_options(include: Optional[str], top_k: int, routine_refs: bool = False) -> AnalysisOptions:
+    try:
+        return AnalysisOptions.from_include(include, top_k, routine_refs)
+    except InvalidParameterException as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": e.code, "message": e.message}
+        )
 
-@router.post("/analyze", response_model=AnalysisResultsResponse)
-async def analyze_image(file: UploadFile = File(...)):
+def request_deadline(request: Request) -> RequestDeadline:
+    """Deadline for this request from the client's timeout header or the default"""
+    try:
+        return RequestDeadline.from_header(request.headers.get(settings.REQUEST_TIMEOUT_HEADER))
+    except InvalidParameterException as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": e.code, "message": e.message}
+        )
+
+@asynccontextmanager
+async def _cancel_on_disconnect(request: Request, deadline: RequestDeadline):
+    """Cancel the deadline if the client disconnects while the body runs"""
+    async def watch():
+        while not await request.is_disconnected():
+            await asyncio.sleep(settings.DISCONNECT_POLL_INTERVAL)
+        app_logger.info("Client disconnected, abandoning analysis")
+        deadline.cancel()
+    
+    watcher = asyncio.ensure_future(watch())
+    try:
+        yield
+    finally:
+        watcher.cancel()
+
+@router.post("/analyze", response_model=AnalysisResultsResponse, response_model_exclude_unset=True)
+async def analyze_image(
+    request: Request,
+    file: UploadFile = File(...),
+    options: AnalysisOptions = Depends(analysis_options),
+    deadline: RequestDeadline = Depends(request_deadline)
+):
     """
     Analyze a skin selfie and provide comprehensive results
     
     - **file**: JPG or PNG image file (max 10MB)
+    - **include**: optional comma-separated sections to compute (default: all)
+    - **top_k**: products per recommendation category (default: 5)
+    - **routine_refs**: return a routines_ref link instead of the routines
+    - **X-Request-Timeout** header: seconds after which the analysis is abandoned (504)
     
     Returns complete analysis with skin tone, undertone, season, skin type,
     personalized skincare routine, and makeup recommendations
     """
     try:
-        # Validate file
-        if file.content_type not in settings.ALLOWED_IMAGE_TYPES:
-            raise InvalidImageException(f"Unsupported image format: {file.content_type}")
-        
-        # Read and validate file size
+        # Read and validate file
         content = await file.read()
-        if len(content) > settings.MAX_UPLOAD_SIZE:
-            raise InvalidImageException(f"File size exceeds {settings.MAX_UPLOAD_SIZE / 1024 / 1024}MB limit")
-        
-        # Convert to base64
-        import base64
-        image_data = base64.b64encode(content).decode('utf-8')
-        
-        # Load image
-        image = image_processor.load_image_from_base64(image_data)
-        
-        # Validate image
-        if not image_processor.validate_image(image):
-            raise InvalidImageException("Invalid image format or corrupted data")
-        
-        # Detect face
-        face_coords = image_processor.detect_face(image)
-        
-        # Extract skin region
-        skin_region = image_processor.extract_skin_region(image, face_coords)
-        
-        # Extract dominant color
-        r, g, b = color_utils.extract_dominant_color(skin_region)
+        components.pipeline.validate_upload(file.content_type, content)
         
-        # Complete skin analysis
-        analysis_data = skin_analyzer.analyze_complete(r, g, b)
+        # Run the CPU-bound pipeline off the event loop, at the tier current load allows
+        loop = asyncio.get_running_loop()
+        tier = tier_controller.select()
+        async with _cancel_on_disconnect(request, deadline):
+            with tier_controller.track(tier):
+                results = await loop.run_in_executor(
+                    resource_governor.executor, components.pipeline.analyze_bytes, content, options, tier, deadline
+                )
         
-        # Create skin analysis response
-        skin_analysis = SkinAnalysisResponse(
-            skin_tone_rgb=analysis_data['skin_tone']['rgb'],
-            skin_tone_hex=analysis_data['skin_tone']['hex'],
-            skin_tone_hsv=analysis_data['skin_tone']['hsv'],
-            undertone=analysis_data['undertone'],
-            season=analysis_data['season'],
-            skin_type=analysis_data['skin_type'],
-            confidence_scores=analysis_data['confidence_scores']
+        app_logger.info(f"Analysis completed successfully at {results.analysis_timestamp}")
+        return results
+    
+    except InvalidImageException as e:
+        app_logger.error(f"Invalid image: {e.message}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": e.code, "message": e.message}
         )
-        
-        # Get product recommendations
-        product_recs = product_recommender.get_recommendations_by_skin_type(
-            analysis_data['skin_tone']['rgb'],
-            analysis_data['skin_type'].value
+    except FaceDetectionException as e:
+        app_logger.error(f"Face detection failed: {e.message}")
+        raise HTTPException(
+            status_code=422,
+            detail={"error": e.code, "message": e.message}
+        )
+    except CosmoChromaException as e:
+        # Oversized images (413), memory admission timeouts (503), ...
+        exception_handler(e)
+    except Exception as e:
+        app_logger.error(f"Unexpected error during analysis: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"error": "ANALYSIS_FAILED", "message": "An error occurred during analysis. Please try again."}
         )
+
+def _format_stream_event(event: str, payload: dict, use_sse: bool) -> str:
+    """Format one progressive result as an SSE event or an NDJSON line"""
+    if use_sse:
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    return json.dumps({"section": event, **payload}) + "\n"
+
+async def _stream_sections(request: Request, sections, use_sse: bool, quality_tier: str, omitted: list,
+                           deadline: RequestDeadline, tracking: ExitStack):
+    """Forward pipeline sections to the client as each one is computed, then end the analysis' tracking"""
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            # Stop computing as soon as the client goes away; the pipeline
+            # abandons the next stage and counts it
+            if await request.is_disconnected():
+                app_logger.info("Client disconnected, abandoning streamed analysis")
+                deadline.cancel()
+            
+            section = await loop.run_in_executor(resource_governor.executor, next, sections, None)
+            if section is None:
+                break
+            
+            name, value = section
+            yield _format_stream_event(name, {"data": jsonable_encoder(value)}, use_sse)
         
-        # Build skincare routines
-        routines = routine_builder.build_all_routines(analysis_data['skin_type'].value)
+        done = {"quality_tier": quality_tier, "analysis_timestamp": datetime.utcnow().isoformat()}
+        if omitted:
+            done["omitted_sections"] = omitted
+        yield _format_stream_event("done", done, use_sse)
+    
+    except RequestCancelledException:
+        return
+    except CosmoChromaException as e:
+        app_logger.error(f"Streamed analysis stopped: {e.message}")
+        yield _format_stream_event("error", {"error": {"error": e.code, "message": e.message}}, use_sse)
+    except Exception as e:
+        app_logger.error(f"Unexpected error during streamed analysis: {str(e)}")
+        error = {"error": "ANALYSIS_FAILED", "message": "An error occurred during analysis. Please try again."}
+        yield _format_stream_event("error", {"error": error}, use_sse)
+    finally:
+        tracking.close()
+
+@router.post("/analyze/stream")
+async def analyze_image_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    options: AnalysisOptions = Depends(analysis_options),
+    deadline: RequestDeadline = Depends(request_deadline)
+):
+    """
+    Analyze a skin selfie and stream results progressively
+    
+    - **file**: JPG or PNG image file (max 10MB)
+    - **include**, **top_k**, **X-Request-Timeout**: as for /api/analyze
+    
+    Emits skin_analysis first, then each recommendation category, then each
+    routine, followed by a final "done" event. Responds with Server-Sent Events
+    when the client accepts text/event-stream, NDJSON otherwise.
+    """
+    tracking = ExitStack()
+    try:
+        # Read and validate file
+        content = await file.read()
+        components.pipeline.validate_upload(file.content_type, content)
         
-        # Compile complete results
-        results = AnalysisResultsResponse(
-            skin_analysis=skin_analysis,
-            foundation_recommendations=product_recs['foundation'],
-            blush_recommendations=product_recs['blush'],
-            lipstick_recommendations=product_recs['lipstick'],
-            concealer_recommendations=product_recs['concealer'],
-            eyeshadow_recommendations=product_recs['eyeshadow'],
-            morning_routine=routines['morning'],
-            evening_routine=routines['evening'],
-            weekly_routine=routines['weekly'],
-            analysis_timestamp=datetime.utcnow().isoformat()
+        # Image errors are still reported with a proper status code. The
+        # analysis stays tracked until its last section has been streamed.
+        loop = asyncio.get_running_loop()
+        tier = tier_controller.select()
+        tracking.enter_context(tier_controller.track(tier))
+        try:
+            async with _cancel_on_disconnect(request, deadline):
+                r, g, b = await loop.run_in_executor(
+                    resource_governor.executor, components.pipeline.extract_skin_color, content, tier, deadline
+                )
+        except BaseException:
+            tracking.close()
+            raise
+        del content
+    
+    except CosmoChromaException as e:
+        exception_handler(e)
+    except Exception as e:
+        app_logger.error(f"Unexpected error during analysis: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"error": "ANALYSIS_FAILED", "message": "An error occurred during analysis. Please try again."}
+        )
+    
+    use_sse = "text/event-stream" in request.headers.get("accept", "")
+    sections = components.pipeline.iter_sections(r, g, b, options, tier, deadline)
+    return StreamingResponse(
+        _stream_sections(request, sections, use_sse, tier.name, options.omitted_by(tier.categories), deadline, tracking),
+        media_type="text/event-stream" if use_sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+def _analyze_batch_item(index: int, filename: str, content: bytes, options: AnalysisOptions,
+                        tier: QualityTier, deadline: RequestDeadline) -> dict:
+    """Analyze one batch item, turning failures into a per-item error object"""
+    try:
+        results = components.pipeline.analyze_bytes(content, options, tier, deadline)
+        return {
+            "index": index,
+            "filename": filename,
+            "status": "ok",
+            "result": results.model_dump(mode="json", exclude_unset=True)
+        }
+    except CosmoChromaException as e:
+        app_logger.error(f"Batch item {index} ({filename}) failed: {e.message}")
+        return {"index": index, "filename": filename, "status": "error", "error": {"error": e.code, "message": e.message}}
+    except Exception as e:
+        app_logger.error(f"Unexpected error in batch item {index} ({filename}): {str(e)}")
+        return {
+            "index": index,
+            "filename": filename,
+            "status": "error",
+            "error": {"error": "ANALYSIS_FAILED", "message": "An error occurred during analysis. Please try again."}
+        }
+
+async def _run_batch_item(index: int, filename: str, content: bytes, options: AnalysisOptions,
+                          deadline: RequestDeadline) -> dict:
+    """Analyze one batch item in the executor at the tier current load allows"""
+    tier = tier_controller.select()
+    with tier_controller.track(tier):
+        return await asyncio.get_running_loop().run_in_executor(
+            resource_governor.executor, _analyze_batch_item, index, filename, content, options, tier, deadline
         )
+
+async def _stream_batch_results(files: List[UploadFile], options: AnalysisOptions, deadline: RequestDeadline):
+    """Yield one NDJSON line per file in completion order"""
+    # Bound in-flight items so only a few decoded images are resident at once
+    max_in_flight = resource_governor.executor_threads * 2
+    items = iter(enumerate(files))
+    pending = set()
+    exhausted = False
+    
+    try:
+        while True:
+            while not exhausted and len(pending) < max_in_flight:
+                try:
+                    index, upload = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                
+                content = await upload.read()
+                await upload.close()
+                try:
+                    components.pipeline.validate_upload(upload.content_type, content)
+                except InvalidImageException as e:
+                    yield json.dumps({
+                        "index": index,
+                        "filename": upload.filename,
+                        "status": "error",
+                        "error": {"error": e.code, "message": e.message}
+                    }) + "\n"
+                    continue
+                
+                pending.add(asyncio.ensure_future(_run_batch_item(index, upload.filename, content, options, deadline)))
+                del content
+            
+            if not pending:
+                break
+            
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                yield json.dumps(future.result()) + "\n"
+    finally:
+        # The stream was closed early (client went away): abandon queued items
+        if pending:
+            deadline.cancel()
+
+@router.post("/analyze/batch")
+async def analyze_batch(
+    files: List[UploadFile] = File(...),
+    options: AnalysisOptions = Depends(analysis_options),
+    deadline: RequestDeadline = Depends(request_deadline)
+):
+    """
+    Analyze many skin selfies in one request
+    
+    - **files**: JPG or PNG image files (max 10MB each)
+    - **include**, **top_k**, **X-Request-Timeout**: as for /api/analyze (the timeout covers the whole batch)
+    
+    Images are processed in parallel and streamed back as NDJSON, one line per
+    image in completion order. Failed images produce an error object instead of
+    failing the whole batch.
+    """
+    if len(files) > settings.BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": "BATCH_TOO_LARGE", "message": f"A batch may contain at most {settings.BATCH_MAX_FILES} images"}
+        )
+    
+    app_logger.info(f"Starting batch analysis of {len(files)} images")
+    return StreamingResponse(_stream_batch_results(files, options, deadline), media_type="application/x-ndjson")
+
+@router.post("/analyze/faces", response_model=MultiFaceAnalysisResponse, response_model_exclude_unset=True)
+async def analyze_faces(
+    request: Request,
+    file: UploadFile = File(...),
+    max_faces: int = Query(10, ge=1, description="Largest number of faces to analyze (capped by MULTI_FACE_MAX_FACES)"),
+    options: AnalysisOptions = Depends(face_analysis_options),
+    deadline: RequestDeadline = Depends(request_deadline)
+):
+    """
+    Analyze every face in a group photo
+    
+    - **file**: JPG or PNG image file (max 10MB)
+    - **max_faces**: analyze at most this many faces, largest first (default: 10)
+    - **include**: sections computed per face (default: skin_analysis)
+    - **top_k**, **X-Request-Timeout**: as for /api/analyze
+    
+    The photo is decoded and searched for faces once; each face is returned
+    with its box and its own analysis
+    """
+    try:
+        content = await file.read()
+        components.pipeline.validate_upload(file.content_type, content)
         
-        app_logger.info(f"Analysis completed successfully at {results.analysis_timestamp}")
+        loop = asyncio.get_running_loop()
+        tier = tier_controller.select()
+        async with _cancel_on_disconnect(request, deadline):
+            with tier_controller.track(tier):
+                results = await loop.run_in_executor(
+                    resource_governor.executor, components.pipeline.analyze_faces,
+                    content, min(max_faces, settings.MULTI_FACE_MAX_FACES), options, tier, deadline
+                )
+        
+        app_logger.info(f"Group analysis of {results.face_count} faces completed at {results.analysis_timestamp}")
         return results
     
     except InvalidImageException as e:
@@ -111,12 +385,180 @@ async def analyze_image(file: UploadFile = File(...)):
     except FaceDetectionException as e:
         app_logger.error(f"Face detection failed: {e.message}")
         raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            status_code=422,
             detail={"error": e.code, "message": e.message}
         )
+    except CosmoChromaException as e:
+        exception_handler(e)
     except Exception as e:
-        app_logger.error(f"Unexpected error during analysis: {str(e)}")
+        app_logger.error(f"Unexpected error during group analysis: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail={"error": "ANALYSIS_FAILED", "message": "An error occurred during analysis. Please try again."}
         )
+
+def _resolve_skin_color(request: ColorAnalysisRequest) -> tuple:
+    """Validate a color-only request and convert it to RGB"""
+    supplied = [name for name in ("rgb", "hex", "lab") if getattr(request, name) is not None]
+    if len(supplied) != 1:
+        raise InvalidColorException("Provide exactly one of 'rgb', 'hex' or 'lab'")
+    
+    try:
+        if request.rgb is not None:
+            r, g, b = (int(request.rgb[k]) for k in ("r", "g", "b"))
+            is_valid, message = validate_rgb_values(r, g, b)
+            if not is_valid:
+                raise InvalidColorException(message)
+            return r, g, b
+        
+        if request.hex is not None:
+            is_valid, message = validate_hex_color(request.hex)
+            if not is_valid:
+                raise InvalidColorException(message)
+            return components.pipeline.color_utils.hex_to_rgb(request.hex)
+        
+        l, a, b = (float(request.lab[k]) for k in ("l", "a", "b"))
+        if not 0 <= l <= 100 or not -128 <= a <= 127 or not -128 <= b <= 127:
+            raise InvalidColorException("LAB values must be L in 0-100 and a/b in -128-127")
+        return components.pipeline.color_utils.lab_to_rgb(l, a, b)
+    
+    except (KeyError, TypeError, ValueError):
+        raise InvalidColorException(f"Malformed '{supplied[0]}' color value")
+
+@router.post("/analyze/color", response_model=AnalysisResultsResponse, response_model_exclude_unset=True)
+async def analyze_color(
+    request: Request,
+    color: ColorAnalysisRequest,
+    options: AnalysisOptions = Depends(analysis_options),
+    deadline: RequestDeadline = Depends(request_deadline)
+):
+    """
+    Analyze a skin color measured on-device or with a colorimeter
+    
+    - **rgb**, **hex** or **lab**: exactly one skin color value
+    - **include**, **top_k**, **X-Request-Timeout**: as for /api/analyze
+    
+    Skips image decoding and face detection and returns the same results as
+    /api/analyze
+    """
+    try:
+        r, g, b = _resolve_skin_color(color)
+        
+        # Classification and matching (possibly waiting on a micro-batch) run off the event loop
+        loop = asyncio.get_running_loop()
+        async with _cancel_on_disconnect(request, deadline):
+            results = await loop.run_in_executor(
+                resource_governor.executor, components.pipeline.analyze_color, r, g, b, options, None, deadline
+            )
+        
+        app_logger.info(f"Color analysis completed successfully at {results.analysis_timestamp}")
+        return results
+    
+    except InvalidColorException as e:
+        app_logger.error(f"Invalid color: {e.message}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": e.code, "message": e.message}
+        )
+    except CosmoChromaException as e:
+        # Expired deadlines (504), cancelled requests (499), ...
+        exception_handler(e)
+    except Exception as e:
+        app_logger.error(f"Unexpected error during color analysis: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"error": "ANALYSIS_FAILED", "message": "An error occurred during analysis. Please try again."}
+        )
+
+def _analyze_live_frame(tracker: LiveFaceTracker, frame: bytes, top_k: int) -> tuple:
+    """Process one live frame and report the CPU time it took"""
+    started = time.thread_time()
+    try:
+        image = components.pipeline.image_processor.load_image_from_bytes(frame)
+        tracked = tracker.process_frame(image)
+        del image
+        
+        result = {"keyframe": tracked["keyframe"], "face": tracked["face"]}
+        if tracked["rgb"] is not None:
+            rgb = tracked["rgb"]
+            analysis_data = components.pipeline.skin_analyzer.analyze_complete(rgb["r"], rgb["g"], rgb["b"])
+            result.update({
+                "skin_tone_rgb": rgb,
+                "skin_tone_hex": analysis_data["skin_tone"]["hex"],
+                "undertone": analysis_data["undertone"].value,
+                "season": analysis_data["season"].value,
+                "foundation_recommendations": jsonable_encoder(
+                    components.pipeline.product_recommender.find_best_matches(rgb, "foundation", top_k)
+                )
+            })
+    except CosmoChromaException as e:
+        result = {"error": {"error": e.code, "message": e.message}}
+    
+    return result, time.thread_time() - started
+
+@router.websocket("/analyze/live")
+async def analyze_live(websocket: WebSocket, top_k: int = 3):
+    """
+    Live camera shade finding over a WebSocket
+    
+    The client sends downscaled JPG/PNG frames as binary messages and receives
+    one JSON message per processed frame. Faces are fully detected only on
+    keyframes and tracked in between, colors are smoothed over time, and
+    frames that arrive while the server is busy are dropped in favour of the
+    newest one. Each connection is limited to LIVE_CPU_BUDGET of one core.
+    """
+    await websocket.accept()
+    loop = asyncio.get_running_loop()
+    tracker = LiveFaceTracker(components.pipeline.image_processor, components.pipeline.color_utils)
+    top_k = max(1, min(top_k, 10))
+    
+    latest = {"frame": None, "received": 0, "dropped": 0}
+    frame_ready = asyncio.Event()
+    closed = asyncio.Event()
+    
+    async def receive_frames():
+        """Keep only the newest frame; anything unprocessed is stale"""
+        try:
+            while True:
+                frame = await websocket.receive_bytes()
+                if len(frame) > settings.LIVE_MAX_FRAME_SIZE:
+                    continue
+                if latest["frame"] is not None:
+                    latest["dropped"] += 1
+                latest["frame"] = frame
+                latest["received"] += 1
+                frame_ready.set()
+        except (WebSocketDisconnect, RuntimeError, KeyError):
+            pass
+        finally:
+            closed.set()
+            frame_ready.set()
+    
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while True:
+            await frame_ready.wait()
+            frame_ready.clear()
+            if closed.is_set():
+                break
+            
+            frame, latest["frame"] = latest["frame"], None
+            if frame is None:
+                continue
+            
+            result, cpu_seconds = await loop.run_in_executor(
+                resource_governor.executor, _analyze_live_frame, tracker, frame, top_k
+            )
+            result.update({"frame": latest["received"], "dropped_frames": latest["dropped"]})
+            await websocket.send_json(result)
+            
+            # Stay within the per-connection CPU budget by idling after each frame
+            idle = cpu_seconds / settings.LIVE_CPU_BUDGET - cpu_seconds
+            if idle > 0:
+                await asyncio.sleep(idle)
+    
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        receiver.cancel()
+        app_logger.info(f"Live session closed after {latest['received']} frames ({latest['dropped']} dropped)")
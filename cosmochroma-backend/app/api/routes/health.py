@@ -1,5 +1,8 @@
-from fastapi import APIRouter
-from app.schemas.response_models import HealthResponse
+from fastapi import APIRouter, Response, status
+from fastapi.responses import PlainTextResponse
+from app.schemas.response_models import HealthResponse, ReadinessResponse
+from app.services.lifecycle import components
+from app.utils.metrics import metrics
 from config import settings
 
 router = APIRouter(
@@ -19,3 +22,32 @@ async def health_check():
         version=settings.API_VERSION,
         message="API is running and ready to process requests"
     )
+
+@router.get("/ready", response_model=ReadinessResponse)
+async def readiness_check(response: Response):
+    """
+    Readiness probe
+    
+    Returns 200 once the analysis pipeline has been built and warmed up,
+    503 until then
+    """
+    if not components.is_ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    
+    return ReadinessResponse(
+        status=components.state,
+        ready=components.is_ready,
+        startup_seconds=components.startup_seconds,
+        warmup_seconds=components.warmup_seconds
+    )
+
+@router.get("/metrics")
+async def get_metrics(format: str = "json"):
+    """
+    Export in-process metrics
+    
+    - **format**: json (default) or prometheus
+    """
+    if format == "prometheus":
+        return PlainTextResponse(metrics.render_prometheus())
+    return metrics.snapshot()
@@ -0,0 +1,127 @@
+from typing import List, Optional
+from fastapi import APIRouter, Header, Query, HTTPException, Response, status
+from app.schemas.response_models import ShadeSearchResponse
+from app.services.lifecycle import components
+from app.utils.logger import app_logger
+from app.utils.error_handlers import (
+    CosmoChromaException, InvalidColorException, InvalidParameterException, exception_handler
+)
+from app.utils.validators import validate_rgb_values, validate_hex_color
+
+router = APIRouter(
+    prefix="/api",
+    tags=["products"]
+)
+
+def split_query_list(value: Optional[str]) -> Optional[List[str]]:
+    """Comma-separated query value as a list (None if absent or empty)"""
+    if not value:
+        return None
+    return [item.strip() for item in value.split(',') if item.strip()] or None
+
+def parse_query_color(hex: Optional[str], rgb: Optional[str]) -> Optional[dict]:
+    """Color given as ?hex=#RRGGBB or ?rgb=r,g,b (at most one)"""
+    if hex and rgb:
+        raise InvalidColorException("Provide either 'hex' or 'rgb', not both")
+    if hex:
+        is_valid, message = validate_hex_color(hex)
+        if not is_valid:
+            raise InvalidColorException(message)
+        r, g, b = components.pipeline.color_utils.hex_to_rgb(hex)
+        return {'r': r, 'g': g, 'b': b}
+    if rgb:
+        try:
+            r, g, b = (int(value) for value in rgb.split(','))
+        except ValueError:
+            raise InvalidColorException("rgb must be three comma-separated integers, e.g. 230,190,170")
+        is_valid, message = validate_rgb_values(r, g, b)
+        if not is_valid:
+            raise InvalidColorException(message)
+        return {'r': r, 'g': g, 'b': b}
+    return None
+
+@router.get("/products/search", response_model=ShadeSearchResponse)
+def search_shades(
+    hex: Optional[str] = Query(None, description="Color to match, e.g. #E6BEAA"),
+    rgb: Optional[str] = Query(None, description="Color to match as r,g,b, e.g. 230,190,170"),
+    category: Optional[str] = Query(None, description="Comma-separated categories, e.g. foundation,concealer"),
+    brand: Optional[str] = Query(None, description="Comma-separated brands"),
+    finish: Optional[str] = Query(None, description="Comma-separated finishes, e.g. matte,dewy"),
+    min_price: Optional[float] = Query(None, ge=0, description="Minimum price in INR"),
+    max_price: Optional[float] = Query(None, ge=0, description="Maximum price in INR"),
+    min_rating: Optional[float] = Query(None, ge=0, le=5, description="Minimum product rating"),
+    min_reviews: Optional[int] = Query(None, ge=0, description="Minimum number of reviews"),
+    top_k: int = Query(10, ge=1, le=100, description="Number of shades to return")
+):
+    """
+    Faceted shade search, e.g. the best foundation match under 600 INR rated 4+ from given brands
+    
+    - **hex** / **rgb**: optional color; results are ranked by Delta-E to it
+      (without one, by rating and review count)
+    - **category**, **brand**, **finish**: keep shades matching any listed value
+    - **min_price**, **max_price**, **min_rating**, **min_reviews**: range filters
+    
+    Filters are evaluated on precomputed indexes and only the shades that
+    pass them are color-ranked
+    """
+    try:
+        user_rgb = parse_query_color(hex, rgb)
+        if min_price is not None and max_price is not None and min_price > max_price:
+            raise InvalidParameterException("min_price cannot be greater than max_price")
+        
+        results, total = components.pipeline.product_recommender.search_shades(
+            user_rgb,
+            categories=split_query_list(category),
+            brands=split_query_list(brand),
+            finishes=split_query_list(finish),
+            min_price=min_price,
+            max_price=max_price,
+            min_rating=min_rating,
+            min_reviews=min_reviews,
+            count=top_k
+        )
+        return ShadeSearchResponse(results=results, total=total)
+    
+    except (InvalidColorException, InvalidParameterException) as e:
+        app_logger.error(f"Invalid shade search: {e.message}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": e.code, "message": e.message}
+        )
+    except CosmoChromaException as e:
+        app_logger.error(f"Shade search failed: {e.message}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"error": e.code, "message": e.message}
+        )
+
+@router.get("/products")
+def list_products(
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+) -> Response:
+    """
+    The whole product catalog, as {categories, products, total}
+    
+    The body is serialized and compressed (gzip, and brotli if installed)
+    once per catalog. Send the ETag back in **If-None-Match** to get a 304
+    while the catalog is unchanged.
+    """
+    try:
+        return components.pipeline.static_payloads.catalog().response(if_none_match, accept_encoding)
+    except CosmoChromaException as e:
+        exception_handler(e)
+
+@router.get("/products/{category}")
+def list_category_products(
+    category: str,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+) -> Response:
+    """
+    The products of one category (404 if the catalog has none), cached like /api/products
+    """
+    try:
+        return components.pipeline.static_payloads.catalog(category).response(if_none_match, accept_encoding)
+    except CosmoChromaException as e:
+        exception_handler(e)
@@ -0,0 +1,27 @@
+from typing import Optional
+from fastapi import APIRouter, Header, Response
+from app.services.lifecycle import components
+from app.utils.error_handlers import CosmoChromaException, exception_handler
+
+router = APIRouter(
+    prefix="/api",
+    tags=["routines"]
+)
+
+@router.get("/routines/{skin_type}")
+async def get_routines(
+    skin_type: str,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+) -> Response:
+    """
+    Morning, evening and weekly skincare routines of a skin type
+    
+    Routines depend only on the skin type, so the body is built and
+    compressed once and served with a strong ETag. Send it back in
+    **If-None-Match** to get a 304 while the routines are unchanged.
+    """
+    try:
+        return components.pipeline.static_payloads.routines(skin_type).response(if_none_match, accept_encoding)
+    except CosmoChromaException as e:
+        exception_handler(e)
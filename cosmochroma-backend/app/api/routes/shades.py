@@ -0,0 +1,117 @@
+import base64
+import json
+from typing import Optional, Tuple
+from fastapi import APIRouter, Query, HTTPException, status
+from app.api.routes.products import split_query_list, parse_query_color
+from app.schemas.response_models import ShadePageResponse
+from app.services.lifecycle import components
+from app.utils.logger import app_logger
+from app.utils.error_handlers import (
+    CosmoChromaException, InvalidColorException, InvalidParameterException, ShadeNotFoundException
+)
+from config import settings
+
+router = APIRouter(
+    prefix="/api/shades",
+    tags=["shades"]
+)
+
+def _encode_cursor(key: Optional[Tuple[float, int]]) -> Optional[str]:
+    """Opaque cursor for a (delta_e, row) page key"""
+    if key is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode('utf-8')).decode('ascii')
+
+def _decode_cursor(cursor: Optional[str]) -> Optional[Tuple[float, int]]:
+    if not cursor:
+        return None
+    try:
+        delta_e, row = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return float(delta_e), int(row)
+    except (ValueError, TypeError):
+        raise InvalidParameterException("Invalid cursor")
+
+def _page(user_lab: dict, k: Optional[int], radius: Optional[float], category: Optional[str],
+          exclude: Optional[int], limit: int, cursor: Optional[str]) -> ShadePageResponse:
+    results, total, next_key = components.pipeline.product_recommender.shade_neighborhood(
+        user_lab,
+        k=k,
+        radius=radius,
+        categories=split_query_list(category),
+        exclude=exclude,
+        limit=limit,
+        after=_decode_cursor(cursor)
+    )
+    return ShadePageResponse(results=results, total=total, next_cursor=_encode_cursor(next_key))
+
+def _raise_http(e: CosmoChromaException):
+    """Map a shade query error to its HTTP response"""
+    if isinstance(e, ShadeNotFoundException):
+        http_status = status.HTTP_404_NOT_FOUND
+    elif isinstance(e, (InvalidColorException, InvalidParameterException)):
+        http_status = status.HTTP_400_BAD_REQUEST
+    else:
+        http_status = status.HTTP_500_INTERNAL_SERVER_ERROR
+    app_logger.error(f"Shade query failed: {e.message}")
+    raise HTTPException(status_code=http_status, detail={"error": e.code, "message": e.message})
+
+@router.get("/near", response_model=ShadePageResponse)
+def shades_near(
+    hex: Optional[str] = Query(None, description="Reference color, e.g. #E6BEAA"),
+    rgb: Optional[str] = Query(None, description="Reference color as r,g,b"),
+    shade_id: Optional[str] = Query(None, description="Reference catalog shade (excluded from results)"),
+    radius: Optional[float] = Query(None, gt=0, le=100, description="Return every shade within this Delta-E"),
+    k: Optional[int] = Query(None, ge=1, le=settings.SHADE_NEIGHBORS_MAX_K, description="Return the k nearest shades"),
+    category: Optional[str] = Query(None, description="Comma-separated categories to search"),
+    limit: int = Query(20, ge=1, le=settings.SHADE_PAGE_MAX_SIZE, description="Shades per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page")
+):
+    """
+    Shades within a Delta-E radius of a color and/or its k nearest shades
+    
+    The reference is given as exactly one of **hex**, **rgb** or **shade_id**.
+    With both **radius** and **k**, the k nearest shades within the radius are
+    returned. Results are sorted closest first and paginated with **cursor**.
+    """
+    try:
+        if sum(value is not None for value in (hex, rgb, shade_id)) != 1:
+            raise InvalidParameterException("Provide exactly one of 'hex', 'rgb' or 'shade_id'")
+        if radius is None and k is None:
+            raise InvalidParameterException("Provide 'radius', 'k' or both")
+        
+        recommender = components.pipeline.product_recommender
+        exclude = None
+        if shade_id is not None:
+            exclude = recommender.shade_row(shade_id)
+            user_lab = recommender.shade_index.lab(exclude)
+        else:
+            user_rgb = parse_query_color(hex, rgb)
+            user_lab = recommender.color_utils.rgb_to_lab(user_rgb['r'], user_rgb['g'], user_rgb['b'])
+        
+        return _page(user_lab, k, radius, category, exclude, limit, cursor)
+    
+    except CosmoChromaException as e:
+        _raise_http(e)
+
+@router.get("/{shade_id}/neighbors", response_model=ShadePageResponse)
+def shade_neighbors(
+    shade_id: str,
+    k: int = Query(10, ge=1, le=settings.SHADE_NEIGHBORS_MAX_K, description="Number of nearest shades"),
+    radius: Optional[float] = Query(None, gt=0, le=100, description="Only shades within this Delta-E"),
+    category: Optional[str] = Query(None, description="Comma-separated categories to search (default: all)"),
+    limit: int = Query(20, ge=1, le=settings.SHADE_PAGE_MAX_SIZE, description="Shades per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page")
+):
+    """
+    Catalog shades closest to a given shade across all brands (dupe finder)
+    
+    The shade itself is excluded. Results are sorted closest first and
+    paginated with **cursor**.
+    """
+    try:
+        recommender = components.pipeline.product_recommender
+        row = recommender.shade_row(shade_id)
+        return _page(recommender.shade_index.lab(row), k, radius, category, row, limit, cursor)
+    
+    except CosmoChromaException as e:
+        _raise_http(e)
@@ -1,4 +1,5 @@
 import numpy as np
+from typing import List, Tuple
 from app.services.color_utils import ColorUtils
 from app.schemas.response_models import UndertoneEnum, SeasonEnum, SkinTypeEnum
 from app.utils.logger import app_logger
@@ -222,6 +223,97 @@ class SkinAnalyzer:
         self.app_logger.info(f"Skin type classified: {skin_type} (confidence: {confidence}) | Scores: {confidence_scores}")
         return skin_type, confidence
     
+    def analyze_batch(self, rgbs: List[Tuple[int, int, int]]) -> List[dict]:
+        """
+        analyze_complete for several colors (e.g. every face in a group photo)
+        
+        Features, scores and classes are computed for all colors at once with
+        the same thresholds as classify_undertone, classify_season and
+        classify_skin_type; ties resolve in the same order
+        """
+        rgb = np.array(rgbs, dtype=np.int64).reshape((-1, 3))
+        features = self.color_utils.skin_features(rgb)
+        warm = features['warm_score']
+        olive = features['olive_score']
+        brightness = features['brightness']
+        saturation = features['saturation']
+        
+        # Columns in the classify_undertone score order
+        undertone_scores = np.stack([
+            np.where(warm > 0.60, warm * 100, 0),
+            np.where((warm > 0.60) & (olive > 0.65), np.minimum(warm, olive) * 100, 0),
+            np.where(warm < 0.40, (1 - warm) * 100, 0),
+            np.where((0.40 < warm) & (warm < 0.60) & (olive < 0.65), (1 - np.abs(warm - 0.5) * 2) * 100, 0),
+        ], axis=1)
+        
+        # Columns in the classify_season score order
+        season_scores = np.stack([
+            35 * (brightness > 65) + 35 * (warm > 0.55) + 30 * (saturation > 55),
+            30 * ((45 < brightness) & (brightness < 75)) + 35 * (warm < 0.50) + 35 * (saturation < 65),
+            25 * (brightness > 35) + 35 * (warm > 0.55) + 40 * (saturation < 70),
+            30 * (brightness < 70) + 35 * (warm < 0.50) + 35 * (saturation > 45),
+        ], axis=1)
+        
+        # Columns in the classify_skin_type score order
+        medium_saturation = (50 < saturation) & (saturation < 70)
+        skin_type_scores = np.stack([
+            45 * (saturation > 70) + 45 * (brightness > 65)
+            + 10 * ((50 < saturation) & (saturation < 85) & (60 < brightness) & (brightness < 80)),
+            45 * (saturation < 45) + 45 * (brightness < 55)
+            + 10 * ((25 < saturation) & (saturation < 50) & (40 < brightness) & (brightness < 60)),
+            40 * ((50 < saturation) & (saturation < 75)) + 40 * ((50 < brightness) & (brightness < 70))
+            + 20 * ((saturation > 50) | (brightness > 55)),
+            35 * ((50 < brightness) & (brightness < 75)) + 35 * medium_saturation
+            + 30 * ((50 < brightness) & (brightness < 70) & medium_saturation),
+            50 * ((45 < brightness) & (brightness < 70) & (40 < saturation) & (saturation < 65))
+            + 50 * ((55 < brightness) & (brightness < 68) & (45 < saturation) & (saturation < 62)),
+        ], axis=1)
+        
+        undertones = [UndertoneEnum.WARM_GOLDEN, UndertoneEnum.WARM_OLIVE, UndertoneEnum.COOL, UndertoneEnum.NEUTRAL]
+        seasons = [SeasonEnum('Spring'), SeasonEnum('Summer'), SeasonEnum('Autumn'), SeasonEnum('Winter')]
+        skin_types = [SkinTypeEnum(name) for name in ['oily', 'dry', 'combination', 'normal', 'sensitive']]
+        
+        results = []
+        for i, (r, g, b) in enumerate(rgb.tolist()):
+            # argmax keeps the first of equal scores, like max() over the score dicts
+            undertone_index = int(np.argmax(undertone_scores[i]))
+            season_index = int(np.argmax(season_scores[i]))
+            skin_type_index = int(np.argmax(skin_type_scores[i]))
+            
+            best_undertone = float(undertone_scores[i, undertone_index])
+            undertone_confidence = round(min(best_undertone, 100), 2) if best_undertone else 0
+            season_confidence = max(30, int(season_scores[i, season_index]))
+            skin_type_confidence = max(40, int(skin_type_scores[i, skin_type_index]))
+            
+            hsv = features['hsv'][i].tolist()
+            lab = features['lab'][i].tolist()
+            results.append({
+                'skin_tone': {
+                    'rgb': {'r': r, 'g': g, 'b': b},
+                    'hex': self.color_utils.rgb_to_hex(r, g, b),
+                    'hsv': {'h': hsv[0], 's': hsv[1], 'v': hsv[2]},
+                    'lab': {'l': lab[0], 'a': lab[1], 'b': lab[2]},
+                    'brightness': float(brightness[i]),
+                    'saturation': float(saturation[i]),
+                    'warm_score': float(warm[i]),
+                    'olive_score': float(olive[i]),
+                },
+                'undertone': undertones[undertone_index],
+                'undertone_confidence': undertone_confidence,
+                'season': seasons[season_index],
+                'season_confidence': season_confidence,
+                'skin_type': skin_types[skin_type_index],
+                'skin_type_confidence': skin_type_confidence,
+                'confidence_scores': {
+                    'undertone': undertone_confidence,
+                    'season': season_confidence,
+                    'skin_type': skin_type_confidence,
+                }
+            })
+        
+        self.app_logger.info(f"Batch analyzed {len(results)} skin tones")
+        return results
+    
     def analyze_complete(self, r: int, g: int, b: int) -> dict:
         """Complete skin analysis"""
         try:
@@ -34,6 +34,12 @@ class AnalysisRequest(BaseModel):
     image_data: str = Field(..., description="Base64 encoded image data")
     gender: Optional[str] = Field(None, description="User gender (optional for better recommendations)")
 
+class ColorAnalysisRequest(BaseModel):
+    """Request model for color-only analysis (provide exactly one color)"""
+    rgb: Optional[dict] = Field(None, description="Skin color as RGB, e.g. {\"r\": 230, \"g\": 190, \"b\": 170}")
+    hex: Optional[str] = Field(None, description="Skin color as hex code, e.g. #E6BEAA")
+    lab: Optional[dict] = Field(None, description="Skin color as CIELAB, e.g. {\"l\": 80.1, \"a\": 8.2, \"b\": 12.5}")
+
 class SkinAnalysisResponse(BaseModel):
     """Response model for skin analysis results"""
     skin_tone_rgb: dict = Field(..., description="RGB values of skin tone")
@@ -56,6 +62,23 @@ class ProductRecommendation(BaseModel):
     reviews_count: int = Field(..., description="Number of reviews")
     buy_link: str = Field(..., description="Direct purchase link")
     delta_e_distance: Optional[float] = Field(None, description="Color matching distance")
+    palette: Optional[str] = Field(None, description="Harmony palette an accent shade was chosen for")
+
+class ShadeMatch(ProductRecommendation):
+    """A catalog shade returned by shade search"""
+    shade_id: str = Field(..., description="Shade id (<product id>-<shade position>)")
+    hex: Optional[str] = Field(None, description="Shade color as hex code")
+
+class ShadeSearchResponse(BaseModel):
+    """Faceted shade search results"""
+    results: List[ShadeMatch] = Field(..., description="Matching shades, closest color first (or best rated without a color)")
+    total: int = Field(..., description="Number of shades passing the filters")
+
+class ShadePageResponse(BaseModel):
+    """One page of a shade radius / nearest-neighbour query"""
+    results: List[ShadeMatch] = Field(..., description="Shades on this page, closest first")
+    total: int = Field(..., description="Number of shades in the whole result set")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page (None on the last page)")
 
 class SkincareStep(BaseModel):
     """Single skincare routine step"""
@@ -71,17 +94,56 @@ class SkincareRoutine(BaseModel):
     steps: List[SkincareStep] = Field(..., description="List of routine steps")
     total_duration_minutes: int = Field(..., description="Total routine duration")
 
+class RoutineReference(BaseModel):
+    """Link to a skin type's cacheable routines"""
+    url: str = Field(..., description="Routines endpoint, e.g. /api/routines/oily")
+    etag: str = Field(..., description="Current ETag of the routines (for If-None-Match)")
+    routine_types: List[str] = Field(..., description="Routines the analysis asked for")
+
 class AnalysisResultsResponse(BaseModel):
-    """Complete analysis results with recommendations"""
-    skin_analysis: SkinAnalysisResponse = Field(..., description="Skin analysis results")
-    foundation_recommendations: List[ProductRecommendation] = Field(..., description="Top 5 foundation options")
-    blush_recommendations: List[ProductRecommendation] = Field(..., description="Top 5 blush options")
-    lipstick_recommendations: List[ProductRecommendation] = Field(..., description="Top 5 lipstick options")
-    concealer_recommendations: List[ProductRecommendation] = Field(..., description="Top 5 concealer options")
-    eyeshadow_recommendations: List[ProductRecommendation] = Field(..., description="Top 5 eyeshadow options")
-    morning_routine: SkincareRoutine = Field(..., description="Morning skincare routine")
-    evening_routine: SkincareRoutine = Field(..., description="Evening skincare routine")
-    weekly_routine: SkincareRoutine = Field(..., description="Weekly skincare routine")
+    """Complete analysis results with recommendations (sections not requested via include are omitted)"""
+    skin_analysis: Optional[SkinAnalysisResponse] = Field(None, description="Skin analysis results")
+    foundation_recommendations: Optional[List[ProductRecommendation]] = Field(None, description="Top foundation options (5 by default)")
+    blush_recommendations: Optional[List[ProductRecommendation]] = Field(None, description="Top blush options (5 by default)")
+    lipstick_recommendations: Optional[List[ProductRecommendation]] = Field(None, description="Top lipstick options (5 by default)")
+    concealer_recommendations: Optional[List[ProductRecommendation]] = Field(None, description="Top concealer options (5 by default)")
+    eyeshadow_recommendations: Optional[List[ProductRecommendation]] = Field(None, description="Top eyeshadow options (5 by default)")
+    morning_routine: Optional[SkincareRoutine] = Field(None, description="Morning skincare routine")
+    evening_routine: Optional[SkincareRoutine] = Field(None, description="Evening skincare routine")
+    weekly_routine: Optional[SkincareRoutine] = Field(None, description="Weekly skincare routine")
+    routines_ref: Optional[RoutineReference] = Field(None, description="Where to fetch the routines (instead of inlining them)")
+    quality_tier: Optional[str] = Field(None, description="Quality tier used under current load: full, fast or minimal")
+    omitted_sections: Optional[List[str]] = Field(None, description="Requested sections the quality tier skipped under load")
+    analysis_timestamp: str = Field(..., description="Timestamp of analysis")
+
+class FaceBox(BaseModel):
+    """Detected face box in image pixel coordinates"""
+    x: int = Field(..., description="Left edge")
+    y: int = Field(..., description="Top edge")
+    width: int = Field(..., description="Box width")
+    height: int = Field(..., description="Box height")
+    confidence: float = Field(..., description="Detection confidence (0-1)")
+
+class FaceAnalysisResult(BaseModel):
+    """Analysis of one face in a group photo (sections not requested via include are omitted)"""
+    face: FaceBox = Field(..., description="Face location")
+    skin_analysis: Optional[SkinAnalysisResponse] = Field(None, description="Skin analysis results")
+    foundation_recommendations: Optional[List[ProductRecommendation]] = Field(None, description="Top foundation options")
+    blush_recommendations: Optional[List[ProductRecommendation]] = Field(None, description="Top blush options")
+    lipstick_recommendations: Optional[List[ProductRecommendation]] = Field(None, description="Top lipstick options")
+    concealer_recommendations: Optional[List[ProductRecommendation]] = Field(None, description="Top concealer options")
+    eyeshadow_recommendations: Optional[List[ProductRecommendation]] = Field(None, description="Top eyeshadow options")
+    morning_routine: Optional[SkincareRoutine] = Field(None, description="Morning skincare routine")
+    evening_routine: Optional[SkincareRoutine] = Field(None, description="Evening skincare routine")
+    weekly_routine: Optional[SkincareRoutine] = Field(None, description="Weekly skincare routine")
+    routines_ref: Optional[RoutineReference] = Field(None, description="Where to fetch the routines (instead of inlining them)")
+
+class MultiFaceAnalysisResponse(BaseModel):
+    """Per-face analysis of a group photo, largest face first"""
+    faces: List[FaceAnalysisResult] = Field(..., description="One result per detected face")
+    face_count: int = Field(..., description="Number of faces analyzed")
+    quality_tier: Optional[str] = Field(None, description="Quality tier used under current load: full, fast or minimal")
+    omitted_sections: Optional[List[str]] = Field(None, description="Requested sections the quality tier skipped under load")
     analysis_timestamp: str = Field(..., description="Timestamp of analysis")
 
 class HealthResponse(BaseModel):
@@ -89,3 +151,10 @@ class HealthResponse(BaseModel):
     status: str = Field("ok", description="API status")
     version: str = Field(..., description="API version")
     message: str = Field("API is running", description="Status message")
+
+class ReadinessResponse(BaseModel):
+    """API readiness probe response"""
+    status: str = Field(..., description="starting, warming_up, ready or failed")
+    ready: bool = Field(..., description="Whether the API can serve analysis requests")
+    startup_seconds: Optional[float] = Field(None, description="Time taken to start serving requests")
+    warmup_seconds: Optional[float] = Field(None, description="Time taken to warm up the analysis pipeline")
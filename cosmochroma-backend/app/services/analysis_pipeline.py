@@ -0,0 +1,374 @@
+from datetime import datetime
+from typing import Any, Iterator, Optional, Tuple
+from app.schemas.response_models import (
+    AnalysisResultsResponse, FaceAnalysisResult, MultiFaceAnalysisResponse, RoutineReference, SkinAnalysisResponse
+)
+from app.services.image_processor import ImageProcessor
+from app.services.color_utils import ColorUtils
+from app.models.skin_analyzer import SkinAnalyzer
+from app.services.product_recommender import ProductRecommender
+from app.services.routine_builder import RoutineBuilder
+from app.services.micro_batcher import MicroBatcher
+from app.services.quality_gate import QualityGate
+from app.services.quality_tiers import QUALITY_TIERS, QualityTier
+from app.services.selfie_cache import CacheProbe, PerceptualHashCache
+from app.services.shared_frames import SharedFrameProcessPool
+from app.services.static_payloads import StaticPayloads
+from app.utils.deadline import RequestDeadline
+from app.utils.image_memory import image_memory
+from app.utils.logger import app_logger
+from app.utils.resource_governor import resource_governor
+from app.utils.error_handlers import InvalidImageException, InvalidParameterException
+from config import settings
+
+RECOMMENDATION_CATEGORIES = ['foundation', 'blush', 'lipstick', 'concealer', 'eyeshadow']
+ROUTINE_TYPES = ['morning', 'evening', 'weekly']
+
+class AnalysisOptions:
+    """Result sections to compute for one analysis request"""
+    
+    def __init__(self, include_skin_analysis: bool = True, categories: list = None,
+                 routine_types: list = None, top_k: int = 5, routine_refs: bool = False):
+        self.include_skin_analysis = include_skin_analysis
+        self.categories = list(RECOMMENDATION_CATEGORIES) if categories is None else categories
+        self.routine_types = list(ROUTINE_TYPES) if routine_types is None else routine_types
+        self.top_k = top_k
+        self.routine_refs = routine_refs  # Link to /api/routines instead of inlining routines
+    
+    @classmethod
+    def from_include(cls, include: Optional[str], top_k: int = 5, routine_refs: bool = False) -> "AnalysisOptions":
+        """
+        Parse a comma-separated include list
+        
+        Accepts section names (skin_analysis, foundation, morning, ...), response
+        field names (foundation_recommendations, morning_routine, ...) and the
+        groups 'recommendations' and 'routines'. No include means everything.
+        """
+        if not include:
+            return cls(top_k=top_k, routine_refs=routine_refs)
+        
+        include_skin_analysis = False
+        categories = []
+        routine_types = []
+        
+        for token in (t.strip() for t in include.split(',')):
+            if not token:
+                continue
+            if token == 'skin_analysis':
+                include_skin_analysis = True
+            elif token == 'recommendations':
+                categories.extend(RECOMMENDATION_CATEGORIES)
+            elif token == 'routines':
+                routine_types.extend(ROUTINE_TYPES)
+            elif token.removesuffix('_recommendations') in RECOMMENDATION_CATEGORIES:
+                categories.append(token.removesuffix('_recommendations'))
+            elif token.removesuffix('_routine') in ROUTINE_TYPES:
+                routine_types.append(token.removesuffix('_routine'))
+            else:
+                raise InvalidParameterException(f"Unknown include section: {token}")
+        
+        # Keep canonical order and drop duplicates
+        categories = [c for c in RECOMMENDATION_CATEGORIES if c in categories]
+        routine_types = [r for r in ROUTINE_TYPES if r in routine_types]
+        return cls(include_skin_analysis, categories, routine_types, top_k, routine_refs)
+    
+    def omitted_by(self, categories: Optional[list]) -> list:
+        """Response fields of requested categories that restricting to categories drops"""
+        if categories is None:
+            return []
+        return [f'{c}_recommendations' for c in self.categories if c not in categories]
+    
+    def restricted_to(self, categories: Optional[list]) -> "AnalysisOptions":
+        """Copy of these options computing only the given categories (None keeps all)"""
+        if categories is None:
+            return self
+        return AnalysisOptions(
+            self.include_skin_analysis,
+            [c for c in self.categories if c in categories],
+            self.routine_types,
+            self.top_k,
+            self.routine_refs
+        )
+
+class AnalysisPipeline:
+    """Run the complete skin analysis pipeline from upload bytes to results"""
+    
+    def __init__(self):
+        self.image_processor = ImageProcessor()
+        self.color_utils = ColorUtils()
+        self.skin_analyzer = SkinAnalyzer()
+        self.product_recommender = ProductRecommender()
+        self.routine_builder = RoutineBuilder()
+        self.static_payloads = StaticPayloads(self.routine_builder, self.product_recommender)
+        self.quality_gate = QualityGate(self.image_processor) if settings.QUALITY_GATE_ENABLED else None
+        self.selfie_cache = PerceptualHashCache() if settings.PERCEPTUAL_CACHE_ENABLED else None
+        self.app_logger = app_logger
+        
+        # Classify and match concurrent analyses in vectorized batches
+        self.micro_batcher = None
+        if settings.MICRO_BATCH_ENABLED:
+            self.micro_batcher = MicroBatcher(self.skin_analyzer, self.product_recommender)
+        
+        # Optionally run the image stages in worker processes, handing frames
+        # over through shared memory instead of pickling them
+        self.frame_pool = None
+        if settings.PIPELINE_EXECUTION_MODE == "process":
+            self.frame_pool = SharedFrameProcessPool(
+                self.image_processor,
+                quality_gate=self.quality_gate,
+                workers=resource_governor.executor_threads,
+                opencv_threads=resource_governor.opencv_threads
+            )
+    
+    def validate_upload(self, content_type: str, content: bytes) -> None:
+        """Validate upload content type and size"""
+        if content_type not in settings.ALLOWED_IMAGE_TYPES:
+            raise InvalidImageException(f"Unsupported image format: {content_type}")
+        
+        if len(content) > settings.MAX_UPLOAD_SIZE:
+            raise InvalidImageException(f"File size exceeds {settings.MAX_UPLOAD_SIZE / 1024 / 1024}MB limit")
+    
+    def extract_skin_color(self, image_bytes: bytes, tier: QualityTier = None,
+                           deadline: RequestDeadline = None) -> Tuple[int, int, int]:
+        """
+        Decode an image, locate the face and return its dominant skin color
+        
+        The deadline is checked between stages, so a request that timed out or
+        whose client went away stops at the next stage boundary. Near-duplicates
+        of recent uploads reuse their color, skipping detection and estimation,
+        or at least their face box, skipping detection.
+        """
+        tier = tier or QUALITY_TIERS['full']
+        deadline = deadline or RequestDeadline.unbounded()
+        
+        # Check the pixel budget from the header
+        deadline.check('decode')
+        pil_image = self.image_processor.open_image(image_bytes, target_pixels=tier.max_pixels)
+        
+        cache_probe = self.selfie_cache.probe(tier.level) if self.selfie_cache is not None else None
+        return self._extract_skin_color(pil_image, tier, deadline, cache_probe)
+    
+    def _extract_skin_color(self, pil_image, tier: QualityTier, deadline: RequestDeadline,
+                            cache_probe: CacheProbe = None) -> Tuple[int, int, int]:
+        """Decode an opened image (within the decode memory budget) and run the image stages"""
+        with image_memory.reserve(self.image_processor.estimate_decode_bytes(pil_image), deadline.remaining()):
+            if self.frame_pool is not None:
+                deadline.check('detect')
+                return self.frame_pool.extract_skin_color(pil_image, tier, deadline, cache_probe)
+            
+            # Load image
+            image = self.image_processor.decode_image(pil_image)
+            del pil_image
+            
+            # Validate image
+            if not self.image_processor.validate_image(image):
+                raise InvalidImageException("Invalid image format or corrupted data")
+            
+            # One thumbnail serves the quality gate and the upload cache
+            thumbnail = None
+            if self.quality_gate is not None or cache_probe is not None:
+                thumbnail = self.image_processor.make_thumbnail(image, settings.QUALITY_THUMBNAIL_SIZE)
+            
+            # Reuse the color, or else the face box, of a near-duplicate upload
+            face_coords = None
+            if cache_probe is not None:
+                cached = cache_probe.lookup(thumbnail)
+                if cached is not None:
+                    if cached.rgb is not None:
+                        return cached.rgb
+                    face_coords = cached.face_coords(image.shape)
+            
+            # Reject dark, blown-out, blurry or face-less photos before detection
+            if self.quality_gate is not None:
+                self.quality_gate.check(image, thumbnail)
+            
+            # Detect face
+            deadline.check('detect')
+            if face_coords is None:
+                face_coords = self.image_processor.detect_face(image, **tier.detector_params())
+            
+            # Extract skin region
+            deadline.check('extract')
+            skin_region = self.image_processor.extract_skin_region(image, face_coords)
+            
+            # Extract dominant color (the decoded image is released on return)
+            deadline.check('estimate')
+            color = self.color_utils.extract_dominant_color(skin_region, tier.estimator)
+            if cache_probe is not None:
+                cache_probe.store(face_coords, image.shape, color)
+            return color
+    
+    def _skin_analysis_response(self, analysis_data: dict) -> SkinAnalysisResponse:
+        return SkinAnalysisResponse(
+            skin_tone_rgb=analysis_data['skin_tone']['rgb'],
+            skin_tone_hex=analysis_data['skin_tone']['hex'],
+            skin_tone_hsv=analysis_data['skin_tone']['hsv'],
+            undertone=analysis_data['undertone'],
+            season=analysis_data['season'],
+            skin_type=analysis_data['skin_type'],
+            confidence_scores=analysis_data['confidence_scores']
+        )
+    
+    def routines_reference(self, skin_type: str, routine_types: list) -> RoutineReference:
+        """Reference to the cacheable routines of a skin type"""
+        return RoutineReference(
+            url=f"/api/routines/{skin_type}",
+            etag=self.static_payloads.routines(skin_type).etag,
+            routine_types=routine_types
+        )
+    
+    def iter_sections(self, r: int, g: int, b: int, options: AnalysisOptions = None,
+                      tier: QualityTier = None, deadline: RequestDeadline = None) -> Iterator[Tuple[str, Any]]:
+        """
+        Yield (response field, value) result sections for a skin color
+        
+        Sections are computed lazily in response order (skin analysis, each
+        recommendation category, then routines), so a consumer can forward each
+        one as soon as it is ready and stop early without paying for the rest.
+        With micro-batching, the color is classified together with concurrent
+        requests and the requested categories are matched with them once skin
+        analysis has been yielded. Degraded quality tiers skip some
+        recommendation categories.
+        """
+        options = (options or AnalysisOptions()).restricted_to((tier or QUALITY_TIERS['full']).categories)
+        deadline = deadline or RequestDeadline.unbounded()
+        
+        # Complete skin analysis (always needed to pick products and routines)
+        deadline.check('classify')
+        batch_item = None
+        if self.micro_batcher is not None:
+            batch_item = self.micro_batcher.submit((r, g, b), options.categories, options.top_k, deadline)
+            analysis_data = self.micro_batcher.analysis(batch_item)
+        else:
+            analysis_data = self.skin_analyzer.analyze_complete(r, g, b)
+        skin_type = analysis_data['skin_type'].value
+        
+        # Create skin analysis response
+        if options.include_skin_analysis:
+            yield 'skin_analysis', self._skin_analysis_response(analysis_data)
+        
+        # Get product recommendations for the requested categories only
+        recommendations = None
+        for category in options.categories:
+            deadline.check('recommend')
+            if batch_item is not None:
+                if recommendations is None:
+                    recommendations = self.micro_batcher.recommendations(batch_item)
+                yield f'{category}_recommendations', recommendations[category]
+                continue
+            product_recs = self.product_recommender.get_recommendations_by_skin_type(
+                analysis_data['skin_tone']['rgb'],
+                skin_type,
+                categories=[category],
+                count=options.top_k,
+                season=analysis_data['season'].value,
+                undertone=analysis_data['undertone'].value
+            )
+            yield f'{category}_recommendations', product_recs[category]
+        
+        # Build the requested skincare routines only, or point to them
+        if options.routine_refs and options.routine_types:
+            yield 'routines_ref', self.routines_reference(skin_type, options.routine_types)
+            return
+        for routine_type in options.routine_types:
+            deadline.check('routines')
+            yield f'{routine_type}_routine', self.routine_builder.build_routine(skin_type, routine_type)
+    
+    def analyze_color(self, r: int, g: int, b: int, options: AnalysisOptions = None,
+                      tier: QualityTier = None, deadline: RequestDeadline = None) -> AnalysisResultsResponse:
+        """Run classification, recommendations and routines for a skin color"""
+        tier = tier or QUALITY_TIERS['full']
+        options = options or AnalysisOptions()
+        sections = dict(self.iter_sections(r, g, b, options, tier, deadline))
+        
+        # Compile results; unrequested sections stay unset and are not serialized
+        omitted = options.omitted_by(tier.categories)
+        if omitted:
+            sections['omitted_sections'] = omitted
+        return AnalysisResultsResponse(
+            **sections,
+            quality_tier=tier.name,
+            analysis_timestamp=datetime.utcnow().isoformat()
+        )
+    
+    def analyze_bytes(self, image_bytes: bytes, options: AnalysisOptions = None,
+                      tier: QualityTier = None, deadline: RequestDeadline = None) -> AnalysisResultsResponse:
+        """Run the full pipeline on encoded image bytes"""
+        r, g, b = self.extract_skin_color(image_bytes, tier, deadline)
+        return self.analyze_color(r, g, b, options, tier, deadline)
+    
+    def analyze_faces(self, image_bytes: bytes, max_faces: int, options: AnalysisOptions = None,
+                      tier: QualityTier = None, deadline: RequestDeadline = None) -> MultiFaceAnalysisResponse:
+        """
+        Analyze every face in a group photo
+        
+        The image is decoded, quality-checked and searched for faces once.
+        Colors, classifications and recommendations are then computed for all
+        faces together rather than face by face; routines are built once per
+        distinct skin type. Runs in the calling thread in every execution mode.
+        """
+        tier = tier or QUALITY_TIERS['full']
+        requested = options or AnalysisOptions()
+        options = requested.restricted_to(tier.categories)
+        deadline = deadline or RequestDeadline.unbounded()
+        
+        deadline.check('decode')
+        pil_image = self.image_processor.open_image(image_bytes, target_pixels=tier.max_pixels)
+        with image_memory.reserve(self.image_processor.estimate_decode_bytes(pil_image), deadline.remaining()):
+            image = self.image_processor.decode_image(pil_image)
+            del pil_image
+            
+            if not self.image_processor.validate_image(image):
+                raise InvalidImageException("Invalid image format or corrupted data")
+            
+            if self.quality_gate is not None:
+                self.quality_gate.check(image)
+            
+            deadline.check('detect')
+            faces = self.image_processor.detect_faces(image, max_faces, **tier.detector_params())
+            
+            deadline.check('extract')
+            skin_regions = [self.image_processor.extract_skin_region(image, face) for face in faces]
+            
+            deadline.check('estimate')
+            colors = self.color_utils.extract_dominant_colors(skin_regions, tier.estimator)
+            del skin_regions, image
+        
+        deadline.check('classify')
+        analyses = self.skin_analyzer.analyze_batch(colors)
+        results = [{'face': face} for face in faces]
+        if options.include_skin_analysis:
+            for result, analysis_data in zip(results, analyses):
+                result['skin_analysis'] = self._skin_analysis_response(analysis_data)
+        
+        for category in options.categories:
+            deadline.check('recommend')
+            matches = self.product_recommender.recommend_batch(analyses, category, options.top_k)
+            for result, recommendations in zip(results, matches):
+                result[f'{category}_recommendations'] = recommendations
+        
+        if options.routine_refs and options.routine_types:
+            for result, analysis_data in zip(results, analyses):
+                result['routines_ref'] = self.routines_reference(analysis_data['skin_type'].value, options.routine_types)
+        else:
+            for routine_type in options.routine_types:
+                deadline.check('routines')
+                routines = {}
+                for result, analysis_data in zip(results, analyses):
+                    skin_type = analysis_data['skin_type'].value
+                    if skin_type not in routines:
+                        routines[skin_type] = self.routine_builder.build_routine(skin_type, routine_type)
+                    result[f'{routine_type}_routine'] = routines[skin_type]
+        
+        self.app_logger.info(f"Analyzed {len(results)} faces in one pass")
+        response = {}
+        omitted = requested.omitted_by(tier.categories)
+        if omitted:
+            response['omitted_sections'] = omitted
+        return MultiFaceAnalysisResponse(
+            faces=[FaceAnalysisResult(**result) for result in results],
+            face_count=len(results),
+            quality_tier=tier.name,
+            analysis_timestamp=datetime.utcnow().isoformat(),
+            **response
+        )
@@ -0,0 +1,347 @@
+import csv
+import json
+import os
+import time
+import numpy as np
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+from app.services.color_utils import ColorUtils
+from app.utils.logger import app_logger
+from app.utils.validators import validate_hex_color
+from config import settings
+
+COMPILED_CATALOG_VERSION = 1
+
+# Product-level fields of a feed row; the remaining columns describe the shade
+PRODUCT_FIELDS = ('name', 'brand', 'category', 'price_inr', 'image_url', 'rating', 'reviews_count', 'buy_link')
+
+# Optional product attributes (yes/no flags and SPF), used for skin type ranking
+FLAG_FIELDS = ('long_wear', 'hydrating', 'hypoallergenic')
+
+# Accepted shades whose L*a*b* is computed together
+LAB_CHUNK_ROWS = 50000
+
+# Issue examples kept for the report (counts are always complete)
+MAX_ISSUE_EXAMPLES = 50
+
+def compiled_catalog_path() -> Path:
+    if settings.CATALOG_PATH:
+        return Path(settings.CATALOG_PATH)
+    return Path(__file__).parent.parent / "data" / "compiled" / "catalog.json"
+
+def load_compiled_catalog(path: Path = None) -> Optional[Tuple[list, np.ndarray]]:
+    """
+    Products and shade L*a*b* (one row per shade, in catalog order) of a compiled catalog
+    
+    Returns None if no catalog has been compiled; raises ValueError if one
+    exists but is unreadable or inconsistent.
+    """
+    path = Path(path or compiled_catalog_path())
+    if not path.exists():
+        return None
+    with open(path, encoding='utf-8') as f:
+        catalog = json.load(f)
+    if catalog.get('version') != COMPILED_CATALOG_VERSION:
+        raise ValueError(f"Unsupported compiled catalog version {catalog.get('version')}")
+    
+    products = catalog['products']
+    with np.load(path.with_suffix('.npz')) as arrays:
+        labs = arrays['labs']
+    if len(labs) != sum(len(product['shades']) for product in products):
+        raise ValueError("Compiled catalog shades and L*a*b* array differ in length")
+    return products, labs
+
+class CatalogCompiler:
+    """
+    Stream retailer feeds into the compiled catalog the recommender loads
+    
+    Feeds are CSV or JSONL files with one shade per row (a JSON line may also
+    hold a whole product with a shades list, like indian_products.json). Rows
+    are read and validated one at a time, L*a*b* is computed per chunk of
+    accepted shades, and products and shades are de-duplicated as they
+    arrive. Only the de-duplicated catalog is kept in memory, never the feed,
+    and shades are held as compact tuples until the catalog is written. Memory
+    therefore grows with the number of distinct shades (roughly 400 bytes
+    each), which stays below what the recommender needs to load the result.
+    """
+    
+    def __init__(self, trust: str = 'rgb', chunk_rows: int = LAB_CHUNK_ROWS):
+        self.trust = trust  # Color kept when a row's hex and RGB disagree
+        self.chunk_rows = chunk_rows
+        self.products = []  # Product fields, without shades
+        self.product_keys = {}
+        self.shades = []  # Per product: casefolded shade name -> (name, RGB, finish)
+        
+        self._pending_rgb = []
+        self._lab_chunks = []
+        self._product_rows = array('i')  # Product and shade position of each converted shade
+        self._shade_rows = array('i')
+        
+        self.sources = []
+        self.counts = Counter()
+        self.errors = Counter()
+        self.warnings = Counter()
+        self.examples = []
+        self.stage_seconds = Counter()
+        self.app_logger = app_logger
+    
+    def _issue(self, severity: Counter, source: str, line: int, code: str, message: str):
+        severity[code] += 1
+        if len(self.examples) < MAX_ISSUE_EXAMPLES:
+            self.examples.append({'file': source, 'line': line, 'issue': code, 'message': message})
+    
+    @staticmethod
+    def _flatten(record: dict) -> List[dict]:
+        """Feed rows of a JSON record: itself, or one per shade of a nested product"""
+        if 'shades' not in record:
+            return [record]
+        rows = []
+        for shade in record.get('shades') or []:
+            rgb = shade.get('rgb') or {}
+            rows.append({
+                **{field: record.get(field) for field in PRODUCT_FIELDS + FLAG_FIELDS + ('spf',)},
+                'product_id': record.get('id'),
+                'shade_name': shade.get('name'),
+                'r': rgb.get('r'), 'g': rgb.get('g'), 'b': rgb.get('b'),
+                'hex': shade.get('hex'),
+                'finish': shade.get('finish') or record.get('finish'),
+            })
+        return rows
+    
+    def _read(self, path: str) -> Iterator[Tuple[int, dict]]:
+        """(line number, row) pairs of a feed, read lazily"""
+        suffix = Path(path).suffix.lower()
+        with open(path, encoding='utf-8', newline='') as f:
+            if suffix == '.csv':
+                for line, row in enumerate(csv.DictReader(f), start=2):
+                    yield line, row
+            elif suffix in ('.jsonl', '.ndjson'):
+                for line, text in enumerate(f, start=1):
+                    if not text.strip():
+                        continue
+                    try:
+                        record = json.loads(text)
+                    except ValueError as e:
+                        self._issue(self.errors, path, line, 'invalid_json', str(e))
+                        continue
+                    for row in self._flatten(record):
+                        yield line, row
+            elif suffix == '.json':
+                # Hand-written catalog (a JSON array of products), small enough to load whole
+                for line, record in enumerate(json.load(f), start=1):
+                    for row in self._flatten(record):
+                        yield line, row
+            else:
+                raise ValueError(f"Unsupported feed format '{suffix}' (expected .csv, .jsonl or .json)")
+    
+    @staticmethod
+    def _text(value) -> str:
+        return '' if value is None else str(value).strip()
+    
+    def _validate(self, source: str, line: int, row: dict) -> Optional[Tuple[dict, tuple]]:
+        """(product fields, (shade name, RGB, finish)) of a valid row, or None after recording why it was rejected"""
+        for field in ('name', 'brand', 'category', 'shade_name'):
+            if not self._text(row.get(field)):
+                self._issue(self.errors, source, line, 'missing_field', f"'{field}' is required")
+                return None
+        
+        try:
+            price = float(row.get('price_inr'))
+            rating = float(row.get('rating'))
+            reviews = int(float(row.get('reviews_count')))
+        except (TypeError, ValueError):
+            self._issue(self.errors, source, line, 'invalid_number', "price_inr, rating and reviews_count must be numbers")
+            return None
+        if price < 0 or not 0 <= rating <= 5 or reviews < 0:
+            self._issue(self.errors, source, line, 'invalid_number', "price_inr or reviews_count is negative, or rating is outside 0-5")
+            return None
+        
+        attributes = {}
+        for field in FLAG_FIELDS:
+            flag = self._text(row.get(field)).lower()
+            if flag in ('true', 'yes', 'y', '1'):
+                attributes[field] = True
+            elif flag not in ('', 'false', 'no', 'n', '0'):
+                self._issue(self.errors, source, line, 'invalid_attribute', f"'{field}' must be yes/no, got '{flag}'")
+                return None
+        if self._text(row.get('spf')):
+            try:
+                attributes['spf'] = float(row.get('spf'))
+            except (TypeError, ValueError):
+                attributes['spf'] = -1.0
+            if not (np.isfinite(attributes['spf']) and attributes['spf'] >= 0):
+                self._issue(self.errors, source, line, 'invalid_attribute', "'spf' must be a non-negative number")
+                return None
+        
+        rgb = None
+        channels = [row.get(channel) for channel in ('r', 'g', 'b')]
+        if any(self._text(value) for value in channels):
+            try:
+                rgb = tuple(int(value) for value in channels)
+            except (TypeError, ValueError):
+                rgb = None
+            if rgb is None or not all(0 <= value <= 255 for value in rgb):
+                self._issue(self.errors, source, line, 'invalid_rgb', f"RGB {channels} is not three integers in 0-255")
+                return None
+        
+        hex_color = self._text(row.get('hex')).upper()
+        if hex_color:
+            is_valid, message = validate_hex_color(hex_color)
+            if not is_valid:
+                self._issue(self.errors, source, line, 'invalid_hex', f"{hex_color}: {message}")
+                return None
+        
+        if rgb is None and not hex_color:
+            self._issue(self.errors, source, line, 'missing_color', "A shade needs RGB or hex")
+            return None
+        if hex_color:
+            hex_rgb = ColorUtils.hex_to_rgb(hex_color)
+            if rgb is not None and hex_rgb != rgb:
+                self._issue(self.warnings, source, line, 'hex_rgb_mismatch',
+                            f"{hex_color} is not RGB {rgb}; keeping the {self.trust} value")
+            if rgb is None or self.trust == 'hex':
+                rgb = hex_rgb
+        
+        product = {
+            'name': self._text(row['name']),
+            'brand': self._text(row['brand']),
+            'category': self._text(row['category']).lower(),
+            'price_inr': price,
+            'image_url': self._text(row.get('image_url')),
+            'rating': rating,
+            'reviews_count': reviews,
+            'buy_link': self._text(row.get('buy_link')),
+            **attributes,
+        }
+        product['id'] = self._text(row.get('product_id')) or None
+        shade = (self._text(row['shade_name']), rgb, self._text(row.get('finish')).lower() or None)
+        return product, shade
+    
+    def _add(self, source: str, line: int, product: dict, shade: tuple):
+        """Merge a valid row into the catalog, dropping duplicate products and shades"""
+        product_id = product.pop('id')
+        key = ('id', product_id) if product_id else ('name', product['brand'].casefold(), product['name'].casefold())
+        product_row = self.product_keys.get(key)
+        if product_row is None:
+            product_row = len(self.products)
+            self.product_keys[key] = product_row
+            self.products.append({'id': product_id or product_row + 1, **product})
+            self.shades.append({})
+        else:
+            existing = self.products[product_row]
+            if any(existing[field] != product[field] for field in PRODUCT_FIELDS):
+                self._issue(self.warnings, source, line, 'product_field_conflict',
+                            f"{product['brand']} {product['name']} differs from its first row; keeping the first")
+        
+        shades = self.shades[product_row]
+        name, rgb, _ = shade
+        existing = shades.get(name.casefold())
+        if existing is not None:
+            code = 'duplicate_shade' if existing[1] == rgb else 'conflicting_duplicate_shade'
+            self._issue(self.warnings, source, line, code, f"Shade '{name}' already listed; keeping the first")
+            return
+        
+        self._product_rows.append(product_row)
+        self._shade_rows.append(len(shades))
+        self._pending_rgb.append(rgb)
+        shades[name.casefold()] = shade
+        self.counts['shades'] += 1
+    
+    def _flush_labs(self):
+        """L*a*b* of the pending shades in one vectorized conversion"""
+        if self._pending_rgb:
+            started = time.perf_counter()
+            rgb = np.array(self._pending_rgb, dtype=np.int64)
+            self._lab_chunks.append(ColorUtils.round_array(ColorUtils.rgb_to_lab_array(rgb)))
+            self._pending_rgb = []
+            self.stage_seconds['lab'] += time.perf_counter() - started
+    
+    def ingest(self, path: str):
+        """Stream one feed into the catalog"""
+        self.sources.append(os.path.basename(path))
+        rows = self._read(path)
+        while True:
+            started = time.perf_counter()
+            item = next(rows, None)
+            validated = time.perf_counter()
+            self.stage_seconds['read'] += validated - started
+            if item is None:
+                break
+            
+            line, row = item
+            self.counts['rows'] += 1
+            valid = self._validate(path, line, row)
+            deduplicated = time.perf_counter()
+            self.stage_seconds['validate'] += deduplicated - validated
+            if valid is None:
+                self.counts['rejected'] += 1
+                continue
+            
+            self._add(path, line, *valid)
+            self.stage_seconds['deduplicate'] += time.perf_counter() - deduplicated
+            if len(self._pending_rgb) >= self.chunk_rows:
+                self._flush_labs()
+        self._flush_labs()
+    
+    def shade_labs(self) -> np.ndarray:
+        """(shades, 3) L*a*b* in catalog order (by product, then shade position)"""
+        self._flush_labs()
+        labs = np.concatenate(self._lab_chunks) if self._lab_chunks else np.zeros((0, 3))
+        order = np.lexsort((np.frombuffer(self._shade_rows, dtype=np.int32),
+                            np.frombuffer(self._product_rows, dtype=np.int32)))
+        return labs[order]
+    
+    def _catalog_products(self) -> Iterator[dict]:
+        """Products in the indian_products.json layout, built one at a time"""
+        for product, shades in zip(self.products, self.shades):
+            product = dict(product, shades=[])
+            for name, rgb, finish in shades.values():
+                shade = {'name': name, 'rgb': {'r': rgb[0], 'g': rgb[1], 'b': rgb[2]}, 'hex': ColorUtils.rgb_to_hex(*rgb)}
+                if finish:
+                    shade['finish'] = finish
+                product['shades'].append(shade)
+            yield product
+    
+    def write(self, path: Path = None) -> Path:
+        """Write the catalog JSON and its .npz L*a*b* sidecar atomically"""
+        started = time.perf_counter()
+        path = Path(path or compiled_catalog_path())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f".{path.stem}.{os.getpid()}.tmp")
+        
+        np.savez(temporary.with_suffix('.npz'), labs=self.shade_labs())
+        with open(temporary.with_suffix('.json'), 'w', encoding='utf-8') as f:
+            # Streamed product by product instead of serializing the whole catalog at once
+            f.write(f'{{"version": {COMPILED_CATALOG_VERSION}, "sources": {json.dumps(self.sources)}, "products": [')
+            for i, product in enumerate(self._catalog_products()):
+                f.write((',\n' if i else '\n') + json.dumps(product, ensure_ascii=False))
+            f.write('\n]}\n')
+        os.replace(temporary.with_suffix('.npz'), path.with_suffix('.npz'))
+        os.replace(temporary.with_suffix('.json'), path)
+        self.stage_seconds['write'] += time.perf_counter() - started
+        return path
+    
+    def report(self) -> dict:
+        """Row, issue and per-stage throughput totals"""
+        rows = self.counts['rows']
+        stages = {}
+        for stage in ('read', 'validate', 'deduplicate', 'lab', 'write'):
+            seconds = self.stage_seconds[stage]
+            items = self.counts['shades'] if stage in ('lab', 'write') else rows
+            stages[stage] = {
+                'seconds': round(seconds, 3),
+                'rows_per_second': round(items / seconds) if seconds > 0 else None,
+            }
+        return {
+            'sources': self.sources,
+            'rows': rows,
+            'rejected': self.counts['rejected'],
+            'products': len(self.products),
+            'shades': self.counts['shades'],
+            'errors': dict(self.errors),
+            'warnings': dict(self.warnings),
+            'examples': self.examples,
+            'stages': stages,
+        }
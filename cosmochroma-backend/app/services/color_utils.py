@@ -1,7 +1,9 @@
 import numpy as np
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List
 from app.utils.logger import app_logger
-import cv2
+from app.utils.lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
 
 class ColorUtils:
     """Color conversion and analysis utilities"""
@@ -76,6 +78,37 @@ class ColorUtils:
         
         return {'l': round(l, 2), 'a': round(a, 2), 'b': round(b_lab, 2)}
     
+    @staticmethod
+    def lab_to_rgb(l: float, a: float, b: float) -> Tuple[int, int, int]:
+        """Convert CIELAB to RGB (inverse of rgb_to_lab, clamped to the sRGB gamut)"""
+        # Convert LAB to XYZ
+        delta = 6/29
+        y_f = (l + 16) / 116
+        x_f = y_f + a / 500
+        z_f = y_f - b / 200
+        
+        x = x_f ** 3 if x_f > delta else 3 * delta ** 2 * (x_f - 4/29)
+        y = y_f ** 3 if y_f > delta else 3 * delta ** 2 * (y_f - 4/29)
+        z = z_f ** 3 if z_f > delta else 3 * delta ** 2 * (z_f - 4/29)
+        
+        # Convert XYZ to linear RGB
+        xyz = np.array([x * 0.95047, y * 1.00000, z * 1.08883])
+        rgb_matrix = np.array([
+            [0.4124, 0.3576, 0.1805],
+            [0.2126, 0.7152, 0.0722],
+            [0.0193, 0.1192, 0.9505],
+        ])
+        linear = np.linalg.solve(rgb_matrix, xyz)
+        
+        # Undo gamma correction
+        channels = []
+        for c_lin in linear:
+            c_lin = max(0.0, float(c_lin))
+            c_norm = c_lin ** (1 / 2.4) if c_lin > 0.04045 ** 2.4 else c_lin * 12.92
+            channels.append(max(0, min(255, int(round(c_norm * 255)))))
+        
+        return tuple(channels)
+    
     @staticmethod
     def delta_e_cie76(lab1: Dict[str, float], lab2: Dict[str, float]) -> float:
         """Calculate color difference using CIE76 formula"""
@@ -109,28 +142,183 @@ class ColorUtils:
         return round(float(delta_e), 2)
     
     @staticmethod
-    def extract_dominant_color(region: np.ndarray) -> Tuple[int, int, int]:
-        """Extract dominant color from image region with improved accuracy"""
+    def round_array(values: np.ndarray, decimals: int = 2) -> np.ndarray:
+        """Round like Python's round() (np.round differs on values that scale to exact .5)"""
+        values = np.asarray(values, dtype=np.float64)
+        scale = 10.0 ** decimals
+        scaled = values * scale
+        rounded = np.rint(scaled) / scale
+        with np.errstate(invalid='ignore'):
+            ties = np.abs(scaled - np.trunc(scaled)) == 0.5
+        for index in zip(*np.nonzero(ties)):
+            rounded[index] = round(float(values[index]), decimals)
+        return rounded
+    
+    @staticmethod
+    def rgb_to_lab_array(rgb: np.ndarray) -> np.ndarray:
+        """Vectorized rgb_to_lab for an (N, 3) array; returns unrounded (N, 3) L*a*b*"""
+        norm = np.asarray(rgb, dtype=np.float64) / 255.0
+        linear = np.where(norm > 0.04045, norm ** 2.4, norm / 12.92)
+        r_lin, g_lin, b_lin = linear[:, 0], linear[:, 1], linear[:, 2]
+        
+        x = (r_lin * 0.4124 + g_lin * 0.3576 + b_lin * 0.1805) / 0.95047
+        y = (r_lin * 0.2126 + g_lin * 0.7152 + b_lin * 0.0722) / 1.00000
+        z = (r_lin * 0.0193 + g_lin * 0.1192 + b_lin * 0.9505) / 1.08883
+        
+        delta = 6/29
+        xyz = np.stack([x, y, z], axis=1)
+        f = np.where(xyz > delta ** 3, xyz ** (1/3), xyz / (3 * delta ** 2) + 4/29)
+        
+        return np.stack([
+            (116 * f[:, 1]) - 16,
+            500 * (f[:, 0] - f[:, 1]),
+            200 * (f[:, 1] - f[:, 2]),
+        ], axis=1)
+    
+    @staticmethod
+    def skin_features(rgb: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Vectorized skin tone features for an (N, 3) RGB array
+        
+        Matches rgb_to_hsv, rgb_to_lab, calculate_brightness,
+        calculate_saturation, calculate_warm_score and calculate_olive_score
+        value for value, including their rounding
+        """
+        rgb = np.asarray(rgb, dtype=np.int64)
+        r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+        norm = rgb / 255.0
+        r_norm, g_norm, b_norm = norm[:, 0], norm[:, 1], norm[:, 2]
+        
+        # Hue (shared by HSV and the olive score)
+        max_c = norm.max(axis=1)
+        min_c = norm.min(axis=1)
+        delta = max_c - min_c
+        with np.errstate(divide='ignore', invalid='ignore'):
+            hue = np.select(
+                [delta == 0, max_c == r_norm, max_c == g_norm],
+                [0.0, 60 * (((g_norm - b_norm) / delta) % 6), 60 * (((b_norm - r_norm) / delta) + 2)],
+                60 * (((r_norm - g_norm) / delta) + 4)
+            )
+            hsv_s = np.where(max_c == 0, 0.0, delta / max_c)
+        
+        lab = ColorUtils.rgb_to_lab_array(rgb)
+        
+        brightness = (0.299 * r + 0.587 * g + 0.114 * b) / 255 * 100
+        max_i = rgb.max(axis=1)
+        min_i = rgb.min(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            saturation = np.where(max_i == 0, 0.0, ((max_i - min_i) / max_i) * 100)
+        
+        warm = np.clip((lab[:, 1] + 128) / 256, 0, 1.0)
+        
+        olive = np.where((hue > 50) & (hue < 120), 1.0 - np.abs(hue - 85) / 70, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            olive = np.where(r + b > 0, np.maximum(olive, g / (r + b) / 2), olive)
+        olive = np.clip(olive, 0, 1.0)
+        
+        round_array = ColorUtils.round_array
+        return {
+            'hsv': np.stack([round_array(hue), round_array(hsv_s * 100), round_array(max_c * 100)], axis=1),
+            'lab': round_array(lab),
+            'brightness': round_array(brightness),
+            'saturation': round_array(saturation),
+            'warm_score': round_array(warm),
+            'olive_score': round_array(olive),
+        }
+    
+    @staticmethod
+    def delta_e_cie94_matrix(lab1: np.ndarray, lab2: np.ndarray,
+                             kl: float = 1, kc: float = 1, kh: float = 1) -> np.ndarray:
+        """
+        Vectorized delta_e_cie94 between (N, 3) and (M, 3) Lab arrays -> (N, M), unrounded
+        
+        Negative squared hue differences from floating point error are clamped
+        to zero instead of producing NaN
+        """
+        lab1 = np.asarray(lab1, dtype=np.float64)[:, None, :]
+        lab2 = np.asarray(lab2, dtype=np.float64)[None, :, :]
+        dl = lab1[..., 0] - lab2[..., 0]
+        da = lab1[..., 1] - lab2[..., 1]
+        db = lab1[..., 2] - lab2[..., 2]
+        
+        c1 = np.sqrt(lab1[..., 1]**2 + lab1[..., 2]**2)
+        c2 = np.sqrt(lab2[..., 1]**2 + lab2[..., 2]**2)
+        dc = c1 - c2
+        
+        dh = np.sqrt(np.maximum(da**2 + db**2 - dc**2, 0))
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.sqrt(
+                (dl / kl)**2 + 
+                (dc / (kc * c1))**2 + 
+                (dh / kh)**2
+            )
+    
+    @staticmethod
+    def _skin_mask(region: np.ndarray) -> np.ndarray:
+        """Mask of well-exposed pixels in a BGR region"""
+        # Filter out extreme values (shadows and highlights)
+        # This helps avoid getting dark shadows or bright reflections
+        hsv = cv2.cvtColor(region, cv2.COLOR_BGR2HSV)
+        
+        # Create mask for skin-like colors (exclude pure black and white)
+        # Keep values between 30% and 90% brightness
+        lower_bound = np.array([0, 0, int(255 * 0.30)])
+        upper_bound = np.array([180, 255, int(255 * 0.95)])
+        mask = cv2.inRange(hsv, lower_bound, upper_bound)
+        
+        # Apply morphological operations to clean up the mask
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+        return cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+    
+    @staticmethod
+    def extract_dominant_colors(regions: List[np.ndarray], estimator: str = "kmeans") -> List[Tuple[int, int, int]]:
+        """
+        Dominant colors of several regions (e.g. every face in a group photo) in one pass
+        
+        The filtered pixels of all regions are stacked once and reduced per
+        region. One-cluster k-means converges to the mean of its input, so
+        "kmeans" uses that mean directly instead of running k-means per region.
+        """
+        pixels = []
+        for region in regions:
+            region_pixels = region.reshape((-1, 3))
+            if estimator != "mean":
+                filtered = region[ColorUtils._skin_mask(region) > 0]
+                if len(filtered) > 0:
+                    region_pixels = filtered
+            pixels.append(region_pixels)
+        
+        if estimator == "median":
+            colors = np.array([np.median(region_pixels, axis=0) for region_pixels in pixels])
+        else:
+            labels = np.repeat(np.arange(len(pixels)), [len(region_pixels) for region_pixels in pixels])
+            stacked = np.concatenate(pixels).astype(np.float64)
+            counts = np.bincount(labels, minlength=len(pixels))
+            colors = np.stack([
+                np.bincount(labels, weights=stacked[:, channel], minlength=len(pixels))
+                for channel in range(3)
+            ], axis=1) / counts[:, None]
+        
+        colors = np.clip(colors.astype(int), 0, 255)
+        return [(int(r), int(g), int(b)) for b, g, r in colors]
+    
+    @staticmethod
+    def extract_dominant_color(region: np.ndarray, estimator: str = "kmeans") -> Tuple[int, int, int]:
+        """
+        Extract dominant color from image region with improved accuracy
+        
+        estimator: "kmeans" (filtered pixels, k-means), "median" (filtered
+        pixels, per-channel median) or "mean" (plain region average, fastest)
+        """
         try:
-            import cv2
-            
-            # Filter out extreme values (shadows and highlights)
-            # This helps avoid getting dark shadows or bright reflections
-            hsv = cv2.cvtColor(region, cv2.COLOR_BGR2HSV)
-            
-            # Create mask for skin-like colors (exclude pure black and white)
-            # Keep values between 30% and 90% brightness
-            lower_bound = np.array([0, 0, int(255 * 0.30)])
-            upper_bound = np.array([180, 255, int(255 * 0.95)])
-            mask = cv2.inRange(hsv, lower_bound, upper_bound)
-            
-            # Apply morphological operations to clean up the mask
-            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+            if estimator == "mean":
+                b, g, r = (int(c) for c in np.mean(region.reshape((-1, 3)), axis=0))
+                return r, g, b
             
             # Filter pixels using the mask
-            filtered_pixels = region[mask > 0]
+            filtered_pixels = region[ColorUtils._skin_mask(region) > 0]
             
             if len(filtered_pixels) == 0:
                 # If no pixels pass the filter, use the original region
@@ -138,18 +326,21 @@ class ColorUtils:
             else:
                 filtered_pixels = filtered_pixels.astype(np.float32)
             
-            # K-means clustering to find dominant color
-            criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 0.2)
-            _, _, centers = cv2.kmeans(
-                filtered_pixels, 
-                1,  # One cluster for dominant color
-                None, 
-                criteria, 
-                10, 
-                cv2.KMEANS_RANDOM_CENTERS
-            )
-            
-            dominant_color = centers[0].astype(int)
+            if estimator == "median":
+                dominant_color = np.median(filtered_pixels, axis=0).astype(int)
+            else:
+                # K-means clustering to find dominant color
+                criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 0.2)
+                _, _, centers = cv2.kmeans(
+                    filtered_pixels, 
+                    1,  # One cluster for dominant color
+                    None, 
+                    criteria, 
+                    10, 
+                    cv2.KMEANS_RANDOM_CENTERS
+                )
+                
+                dominant_color = centers[0].astype(int)
             # OpenCV uses BGR, convert to RGB
             b, g, r = dominant_color[0], dominant_color[1], dominant_color[2]
             
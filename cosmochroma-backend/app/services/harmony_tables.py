@@ -0,0 +1,246 @@
+import os
+import time
+import numpy as np
+from pathlib import Path
+from typing import List, Optional, Tuple
+from app.schemas.response_models import SeasonEnum, UndertoneEnum
+from app.services.color_utils import ColorUtils
+from app.services.recommendation_grid import GRID_GAMUT, RecommendationGrid, candidate_width
+from app.services.shade_index import ShadeIndex
+from app.utils.logger import app_logger
+from config import settings
+
+SEASONS = [season.value for season in SeasonEnum]
+UNDERTONES = [undertone.value for undertone in UndertoneEnum]
+
+# Palettes of each accent category, in the order they take turns filling the top k
+HARMONY_PALETTES = {
+    'blush': ['analogous', 'contrast', 'complementary'],
+    'lipstick': ['contrast', 'analogous', 'complementary'],
+    'eyeshadow': ['complementary', 'analogous', 'contrast'],
+}
+PALETTES = ['analogous', 'complementary', 'contrast']
+
+# Per season: chroma scale of the targets and L* contrast with the skin
+SEASON_STYLE = {
+    'Spring': (1.2, 20.0),
+    'Summer': (0.8, 15.0),
+    'Autumn': (0.9, 25.0),
+    'Winter': (1.3, 35.0),
+}
+
+# Per undertone: hue shift in degrees (warm toward coral/gold, cool toward rose/berry)
+UNDERTONE_HUE_SHIFT = {
+    'warm_golden': 8.0,
+    'warm_olive': 4.0,
+    'neutral': 0.0,
+    'cool': -12.0,
+}
+
+# Per category: hue offset from the skin for analogous / contrast targets, chroma
+# added to the skin's, and the share of the season contrast taken off L*
+CATEGORY_STYLE = {
+    'blush': {'hue': -30.0, 'contrast_hue': -20.0, 'chroma': 12.0, 'depth': 0.5},
+    'lipstick': {'hue': -40.0, 'contrast_hue': -25.0, 'chroma': 25.0, 'depth': 1.0},
+    'eyeshadow': {'hue': -10.0, 'contrast_hue': 0.0, 'chroma': 5.0, 'depth': 0.8},
+}
+
+class HarmonyTables:
+    """
+    Accent shades (blush, lipstick, eyeshadow) chosen by color harmony with the skin
+    
+    For every season/undertone combination and every cell of a quantized skin
+    L*a*b* grid, the target colors of each palette (analogous, complementary
+    and contrast-matched, in LCh around the skin's hue) are precomputed along
+    with the catalog shades closest to them. A query re-ranks a cell's
+    candidates against the exact targets of the skin color and lets the
+    category's palettes take turns filling the top k. Rebuilt whenever the
+    catalog changes.
+    """
+    
+    def __init__(self, shade_index: ShadeIndex, targets: np.ndarray, candidates: np.ndarray, metadata: dict):
+        self.shade_index = shade_index
+        self.targets = targets  # (categories, combinations, cells, palettes, 3) target L*a*b*
+        self.candidates = candidates  # (categories, combinations, cells, palettes, k) shade index rows
+        self.metadata = metadata
+        self.origin = np.array([axis[0] for axis in metadata['gamut']])
+        self.step = metadata['step']
+        self.shape = np.array(metadata['shape'])
+        self.category_slots = {category: i for i, category in enumerate(metadata['categories'])}
+        self.app_logger = app_logger
+    
+    @property
+    def k(self) -> int:
+        return self.candidates.shape[-1]
+    
+    @staticmethod
+    def default_path() -> Path:
+        if settings.HARMONY_TABLES_PATH:
+            return Path(settings.HARMONY_TABLES_PATH)
+        return Path(__file__).parent.parent / "data" / "compiled" / "harmony_tables.npz"
+    
+    @staticmethod
+    def combination(season: str, undertone: str) -> int:
+        return SEASONS.index(season) * len(UNDERTONES) + UNDERTONES.index(undertone)
+    
+    @staticmethod
+    def palette_targets(skin_labs: np.ndarray, season: str, undertone: str, category: str) -> np.ndarray:
+        """(N, palettes, 3) target L*a*b* of a category's palettes (PALETTES order) for skin colors"""
+        skin_labs = np.asarray(skin_labs, dtype=np.float64).reshape((-1, 3))
+        lightness = skin_labs[:, 0]
+        chroma = np.hypot(skin_labs[:, 1], skin_labs[:, 2])
+        hue = np.degrees(np.arctan2(skin_labs[:, 2], skin_labs[:, 1]))
+        
+        chroma_scale, contrast = SEASON_STYLE[season]
+        shift = UNDERTONE_HUE_SHIFT[undertone]
+        style = CATEGORY_STYLE[category]
+        depth = contrast * style['depth']
+        
+        # (hue, L*, C*) of each palette
+        palettes = [
+            (hue + style['hue'] + shift, lightness - depth, (chroma + style['chroma']) * chroma_scale),
+            (hue + 180.0 + shift, lightness - depth, (0.6 * chroma + 0.5 * style['chroma']) * chroma_scale),
+            (hue + style['contrast_hue'] + shift, lightness - 1.5 * depth, (chroma + style['chroma']) * chroma_scale * 1.1),
+        ]
+        targets = np.empty((len(skin_labs), len(palettes), 3))
+        for i, (palette_hue, palette_lightness, palette_chroma) in enumerate(palettes):
+            palette_chroma = np.clip(palette_chroma, 1.0, 80.0)
+            targets[:, i, 0] = np.clip(palette_lightness, 15.0, 90.0)
+            targets[:, i, 1] = palette_chroma * np.cos(np.radians(palette_hue))
+            targets[:, i, 2] = palette_chroma * np.sin(np.radians(palette_hue))
+        return targets
+    
+    @classmethod
+    def build(cls, shade_index: ShadeIndex, step: float = None, k: int = None,
+              gamut: tuple = GRID_GAMUT) -> "HarmonyTables":
+        """Targets and closest shades for every category, combination and cell"""
+        step = step or settings.HARMONY_STEP
+        k = k or candidate_width(settings.HARMONY_CANDIDATES)
+        started = time.perf_counter()
+        
+        cells, shape = RecommendationGrid.cell_labs(gamut, step)
+        categories = [category for category in HARMONY_PALETTES if category in shade_index.category_rows]
+        combinations = [(season, undertone) for season in SEASONS for undertone in UNDERTONES]
+        dtype = np.int16 if len(shade_index) < np.iinfo(np.int16).max else np.int32
+        targets = np.zeros((len(categories), len(combinations), len(cells), len(PALETTES), 3), dtype=np.float32)
+        candidates = np.full(targets.shape[:-1] + (k,), -1, dtype=dtype)
+        
+        for slot, category in enumerate(categories):
+            rows = shade_index.category_rows[category]
+            width = min(k, len(rows))
+            for combination, (season, undertone) in enumerate(combinations):
+                category_targets = cls.palette_targets(cells, season, undertone, category)
+                targets[slot, combination] = category_targets
+                flat = category_targets.reshape((-1, 3))
+                distances = ColorUtils.round_array(ColorUtils.delta_e_cie94_matrix(flat, shade_index.labs[rows]))
+                order = np.argsort(distances, axis=1, kind='stable')[:, :width]
+                candidates[slot, combination, ..., :width] = rows[order].reshape(len(cells), len(PALETTES), width)
+        
+        metadata = {
+            'fingerprint': shade_index.fingerprint(),
+            'categories': categories,
+            'gamut': [list(axis) for axis in gamut],
+            'shape': list(shape),
+            'step': step,
+        }
+        app_logger.info(
+            f"Built harmony tables: {len(categories)} categories x {len(combinations)} season/undertone "
+            f"combinations x {len(cells)} cells in {time.perf_counter() - started:.2f}s"
+        )
+        return cls(shade_index, targets, candidates, metadata)
+    
+    def save(self, path: Path = None):
+        """Write the tables atomically, tagged with the catalog fingerprint"""
+        path = Path(path or self.default_path())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f".{path.stem}.{os.getpid()}.tmp.npz")
+        np.savez(temporary, targets=self.targets, candidates=self.candidates,
+                 fingerprint=np.array(self.metadata['fingerprint']), categories=np.array(self.metadata['categories']),
+                 gamut=np.array(self.metadata['gamut']), shape=np.array(self.metadata['shape']),
+                 step=np.array(self.metadata['step']))
+        os.replace(temporary, path)
+    
+    @classmethod
+    def load(cls, shade_index: ShadeIndex, path: Path = None) -> Optional["HarmonyTables"]:
+        """Saved tables, or None if missing, built for another catalog or step, or too narrow"""
+        path = Path(path or cls.default_path())
+        try:
+            with np.load(path) as saved:
+                if str(saved['fingerprint']) != shade_index.fingerprint() or float(saved['step']) != settings.HARMONY_STEP:
+                    return None
+                if saved['candidates'].shape[-1] < candidate_width(settings.HARMONY_CANDIDATES):
+                    return None
+                metadata = {
+                    'fingerprint': str(saved['fingerprint']),
+                    'categories': saved['categories'].tolist(),
+                    'gamut': saved['gamut'].tolist(),
+                    'shape': saved['shape'].tolist(),
+                    'step': float(saved['step']),
+                }
+                return cls(shade_index, saved['targets'], saved['candidates'], metadata)
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    @classmethod
+    def open(cls, shade_index: ShadeIndex, path: Path = None) -> "HarmonyTables":
+        """Load the tables for this catalog, building and saving them if missing or stale"""
+        tables = cls.load(shade_index, path)
+        if tables is not None:
+            return tables
+        tables = cls.build(shade_index)
+        try:
+            tables.save(path)
+        except OSError as e:
+            app_logger.warning(f"Could not save harmony tables, keeping them in memory: {str(e)}")
+        return tables
+    
+    def _palette_matches(self, target: np.ndarray, rows: Optional[np.ndarray], category: str,
+                         k: int) -> List[Tuple[int, float]]:
+        """(row, delta_e) closest to one target: the cell's candidates re-ranked, or the k-d tree"""
+        if rows is None or (k > len(rows) and len(rows) < len(self.shade_index.category_rows[category])):
+            target_lab = {'l': target[0], 'a': target[1], 'b': target[2]}
+            return self.shade_index.neighbors(target_lab, k, rows=self.shade_index.category_rows[category])
+        distances = ColorUtils.round_array(ColorUtils.delta_e_cie94_matrix(target[None, :], self.shade_index.labs[rows])[0])
+        order = np.lexsort((rows, distances))[:k]
+        return [(int(rows[i]), float(distances[i])) for i in order]
+    
+    def query_batch(self, skin_labs: np.ndarray, seasons: List[str], undertones: List[str], category: str,
+                    k: int) -> List[List[Tuple[dict, dict, float, str]]]:
+        """
+        Top k (product, shade, delta_e to its target, palette) of an accent category per skin color
+        
+        The category's palettes take turns contributing their closest shade
+        not already chosen.
+        """
+        skin_labs = np.asarray(skin_labs, dtype=np.float64).reshape((-1, 3))
+        slot = self.category_slots.get(category)
+        if slot is None:
+            return [[] for _ in skin_labs]
+        
+        cells = np.rint((skin_labs - self.origin) / self.step).astype(np.int64)
+        inside = np.all((cells >= 0) & (cells < self.shape), axis=1)
+        flat_cells = np.ravel_multi_index(np.where(inside[:, None], cells, 0).T, tuple(self.shape))
+        palette_order = [PALETTES.index(palette) for palette in HARMONY_PALETTES[category]]
+        
+        results = []
+        for skin_lab, season, undertone, cell, in_grid in zip(skin_labs, seasons, undertones, flat_cells, inside):
+            targets = self.palette_targets(skin_lab, season, undertone, category)[0]
+            combination = self.combination(season, undertone)
+            ranked = []
+            for palette in palette_order:
+                rows = None
+                if in_grid:
+                    rows = np.asarray(self.candidates[slot, combination, cell, palette])
+                    rows = rows[rows >= 0].astype(np.int64)
+                ranked.append(self._palette_matches(targets[palette], rows, category, k))
+            
+            # Round-robin over palettes, skipping shades another palette already chose
+            chosen = []
+            seen = set()
+            for rank in range(k):
+                for palette, matches in zip(palette_order, ranked):
+                    if rank < len(matches) and matches[rank][0] not in seen and len(chosen) < k:
+                        seen.add(matches[rank][0])
+                        chosen.append((*self.shade_index.match(matches[rank][0], matches[rank][1]), PALETTES[palette]))
+            results.append(chosen)
+        return results
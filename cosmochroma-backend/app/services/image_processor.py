@@ -1,10 +1,16 @@
-import cv2
 import numpy as np
 from PIL import Image
 from io import BytesIO
 import base64
+from typing import Callable, List
 from app.utils.logger import app_logger
-from app.utils.error_handlers import InvalidImageException, FaceDetectionException, ImageProcessingException
+from app.utils.lazy_import import lazy_import
+from app.utils.error_handlers import (
+    InvalidImageException, FaceDetectionException, ImageProcessingException, ImageTooLargeException
+)
+from config import settings
+
+cv2 = lazy_import("cv2")
 
 class ImageProcessor:
     """Handle image loading, face detection, and skin region extraction"""
@@ -28,14 +34,82 @@ class ImageProcessor:
             
             # Decode base64
             image_bytes = base64.b64decode(image_data)
+        
+        except Exception as e:
+            self.app_logger.error(f"Failed to decode base64 image: {str(e)}")
+            raise InvalidImageException(f"Failed to process image: {str(e)}")
+        
+        return self.load_image_from_bytes(image_bytes)
+    
+    def open_image(self, image_bytes: bytes, target_pixels: int = None) -> Image.Image:
+        """
+        Parse the image header and enforce the pixel budget before decoding
+        
+        Images over MAX_IMAGE_PIXELS are rejected, or with the "downscale"
+        policy, JPEGs are set up to decode at 1/2, 1/4 or 1/8 scale so the full
+        resolution bitmap is never materialized. target_pixels optionally asks
+        for a reduced-scale JPEG decode of images within the budget as well.
+        """
+        try:
             image = Image.open(BytesIO(image_bytes))
-            
+            width, height = image.size
+        except Image.DecompressionBombError as e:
+            raise ImageTooLargeException(str(e))
+        except Exception as e:
+            self.app_logger.error(f"Failed to read image header: {str(e)}")
+            raise InvalidImageException(f"Failed to process image: {str(e)}")
+        
+        pixels = width * height
+        if pixels <= settings.MAX_IMAGE_PIXELS:
+            if target_pixels and pixels > target_pixels:
+                self._draft(image, target_pixels)
+            return image
+        
+        if settings.PIXEL_BUDGET_POLICY == "downscale" and self._draft(image, settings.MAX_IMAGE_PIXELS):
+            return image
+        
+        raise ImageTooLargeException(
+            f"Image is {width}x{height} ({pixels / 1e6:.1f} megapixels); "
+            f"the limit is {settings.MAX_IMAGE_PIXELS / 1e6:.1f} megapixels"
+        )
+    
+    def _draft(self, image: Image.Image, max_pixels: int) -> bool:
+        """Set up a JPEG to decode at the smallest DCT scale that fits max_pixels"""
+        if image.format != "JPEG":
+            return False
+        
+        width, height = image.size
+        for scale in (2, 4, 8):
+            if width * height / (scale * scale) <= max_pixels:
+                image.draft('RGB', (-(-width // scale), -(-height // scale)))
+                self.app_logger.info(f"Decoding {width}x{height} image at 1/{scale} scale: {image.size}")
+                return True
+        return False
+    
+    @staticmethod
+    def estimate_decode_bytes(image: Image.Image) -> int:
+        """Peak bytes of decoding an opened image into a BGR array"""
+        width, height = image.size
+        decoded = width * height * len(image.getbands())
+        converted = width * height * 3 if image.mode != 'RGB' else 0
+        return decoded + converted + width * height * 3
+    
+    def decode_image(self, image: Image.Image, allocate: Callable = None) -> np.ndarray:
+        """
+        Decode an opened image into a BGR array for OpenCV
+        
+        allocate(shape) may return a uint8 array (e.g. in shared memory) that
+        the BGR image is written into instead of a fresh allocation
+        """
+        try:
             # Convert to RGB if necessary
             if image.mode != 'RGB':
                 image = image.convert('RGB')
             
             # Convert to numpy array and BGR for OpenCV
-            image_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+            rgb = np.asarray(image)
+            out = allocate(rgb.shape) if allocate is not None else None
+            image_cv = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=out)
             self.app_logger.info(f"Image loaded successfully. Shape: {image_cv.shape}")
             
             return image_cv
@@ -44,44 +118,74 @@ class ImageProcessor:
             self.app_logger.error(f"Failed to load image: {str(e)}")
             raise InvalidImageException(f"Failed to process image: {str(e)}")
     
-    def detect_face(self, image: np.ndarray) -> dict:
-        """Detect face in image with improved sensitivity"""
+    def load_image_from_bytes(self, image_bytes: bytes, allocate: Callable = None) -> np.ndarray:
+        """Load image from raw encoded (JPG/PNG) bytes within the pixel budget"""
+        return self.decode_image(self.open_image(image_bytes), allocate=allocate)
+    
+    def detect_face(self, image: np.ndarray, scale_factor: float = 1.05, min_neighbors: int = 4,
+                    max_side: int = None) -> dict:
+        """
+        Detect face in image with improved sensitivity
+        
+        max_side optionally runs the detector on a downscaled copy; the
+        returned box is always in full image coordinates
+        """
+        face = self.detect_faces(image, 1, scale_factor, min_neighbors, max_side)[0]
+        self.app_logger.info(f"Face detected at ({face['x']}, {face['y']}) with size ({face['width']}x{face['height']})")
+        return face
+    
+    def detect_faces(self, image: np.ndarray, max_faces: int = None, scale_factor: float = 1.05,
+                     min_neighbors: int = 4, max_side: int = None) -> List[dict]:
+        """
+        Detect every face in image (one detector pass), largest first
+        
+        max_faces keeps only the largest faces; boxes are padded and in full
+        image coordinates like detect_face
+        """
         try:
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             
+            scale = 1.0
+            if max_side and max(gray.shape) > max_side:
+                scale = max_side / max(gray.shape)
+                gray = self.make_thumbnail(gray, max_side)
+            min_size = max(20, int(50 * scale))
+            
             # Detect faces with improved parameters
             # Lower minNeighbors for better detection, but still avoid false positives
             faces = self.face_cascade.detectMultiScale(
                 gray,
-                scaleFactor=1.05,  # Finer scale steps for better detection
-                minNeighbors=4,     # Slightly lower to catch faces
-                minSize=(50, 50),   # Minimum face size
+                scaleFactor=scale_factor,  # Finer scale steps for better detection
+                minNeighbors=min_neighbors,  # Slightly lower to catch faces
+                minSize=(min_size, min_size),  # Minimum face size
                 maxSize=(min(gray.shape) // 2, min(gray.shape) // 2)  # Maximum face size
             )
             
             if len(faces) == 0:
                 raise FaceDetectionException("No face detected in the image")
             
-            # Use the largest face (most likely the main subject)
-            largest_face = max(faces, key=lambda x: x[2] * x[3])
-            x, y, w, h = largest_face
-            
-            # Add padding to face detection for better analysis
-            padding = int(w * 0.1)
-            x = max(0, x - padding)
-            y = max(0, y - padding)
-            w = min(image.shape[1] - x, w + 2 * padding)
-            h = min(image.shape[0] - y, h + 2 * padding)
-            
-            self.app_logger.info(f"Face detected at ({x}, {y}) with size ({w}x{h})")
-            
-            return {
-                'x': int(x),
-                'y': int(y),
-                'width': int(w),
-                'height': int(h),
-                'confidence': 0.85
-            }
+            # Largest faces first (the largest is most likely the main subject)
+            faces = sorted(faces, key=lambda x: x[2] * x[3], reverse=True)[:max_faces]
+            
+            boxes = []
+            for face in faces:
+                x, y, w, h = (int(round(v / scale)) for v in face)
+                
+                # Add padding to face detection for better analysis
+                padding = int(w * 0.1)
+                x = max(0, x - padding)
+                y = max(0, y - padding)
+                w = min(image.shape[1] - x, w + 2 * padding)
+                h = min(image.shape[0] - y, h + 2 * padding)
+                
+                boxes.append({
+                    'x': int(x),
+                    'y': int(y),
+                    'width': int(w),
+                    'height': int(h),
+                    'confidence': 0.85
+                })
+            return boxes
         
         except FaceDetectionException:
             raise
@@ -137,6 +241,15 @@ class ImageProcessor:
         except Exception as e:
             raise ImageProcessingException(f"Error resizing image: {str(e)}")
     
+    def make_thumbnail(self, image: np.ndarray, max_side: int) -> np.ndarray:
+        """Downscale an image so its longest side is at most max_side (area averaging)"""
+        height, width = image.shape[:2]
+        scale = max_side / max(height, width)
+        if scale >= 1:
+            return image
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    
     def validate_image(self, image: np.ndarray) -> bool:
         """Validate image format and content"""
         try:
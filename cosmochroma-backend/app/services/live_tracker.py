@@ -0,0 +1,97 @@
+import numpy as np
+from typing import Optional
+from app.services.image_processor import ImageProcessor
+from app.services.color_utils import ColorUtils
+from app.utils.logger import app_logger
+from app.utils.lazy_import import lazy_import
+from app.utils.error_handlers import FaceDetectionException
+from config import settings
+
+cv2 = lazy_import("cv2")
+
+class LiveFaceTracker:
+    """Track a face across live camera frames, re-detecting only on keyframes"""
+    
+    def __init__(self, image_processor: ImageProcessor, color_utils: ColorUtils):
+        self.image_processor = image_processor
+        self.color_utils = color_utils
+        self.keyframe_interval = max(1, settings.LIVE_KEYFRAME_INTERVAL)
+        self.min_track_score = settings.LIVE_TRACKING_MIN_SCORE
+        self.smoothing = settings.LIVE_COLOR_SMOOTHING
+        
+        self.face_coords = None
+        self.template = None
+        self.frames_since_keyframe = 0
+        self.smoothed_rgb = None
+        self.app_logger = app_logger
+    
+    def reset(self):
+        """Forget the tracked face and color history"""
+        self.face_coords = None
+        self.template = None
+        self.frames_since_keyframe = 0
+        self.smoothed_rgb = None
+    
+    def _track(self, gray: np.ndarray) -> Optional[dict]:
+        """Find the face template near its previous position"""
+        x, y, w, h = (self.face_coords[k] for k in ('x', 'y', 'width', 'height'))
+        
+        # Search a window around the last box instead of the whole frame
+        margin_x, margin_y = w // 2, h // 2
+        x0, y0 = max(0, x - margin_x), max(0, y - margin_y)
+        x1 = min(gray.shape[1], x + w + margin_x)
+        y1 = min(gray.shape[0], y + h + margin_y)
+        window = gray[y0:y1, x0:x1]
+        
+        if window.shape[0] < h or window.shape[1] < w:
+            return None
+        
+        scores = cv2.matchTemplate(window, self.template, cv2.TM_CCOEFF_NORMED)
+        _, best_score, _, best_loc = cv2.minMaxLoc(scores)
+        if best_score < self.min_track_score:
+            return None
+        
+        return {
+            'x': int(x0 + best_loc[0]),
+            'y': int(y0 + best_loc[1]),
+            'width': int(w),
+            'height': int(h),
+            'confidence': round(float(best_score), 2)
+        }
+    
+    def process_frame(self, image: np.ndarray) -> dict:
+        """Locate the face in a frame and update the smoothed skin color"""
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        
+        face_coords = None
+        keyframe = self.face_coords is None or self.frames_since_keyframe >= self.keyframe_interval
+        if not keyframe:
+            face_coords = self._track(gray)
+            keyframe = face_coords is None
+        
+        if keyframe:
+            try:
+                face_coords = self.image_processor.detect_face(image)
+            except FaceDetectionException:
+                self.reset()
+                return {'keyframe': True, 'face': None, 'rgb': None}
+            
+            # Keep the keyframe template to avoid drift between detections
+            x, y, w, h = (face_coords[k] for k in ('x', 'y', 'width', 'height'))
+            self.template = gray[y:y + h, x:x + w].copy()
+            self.frames_since_keyframe = 0
+        else:
+            self.frames_since_keyframe += 1
+        
+        self.face_coords = face_coords
+        
+        # Smooth the color estimate over time (exponential moving average)
+        skin_region = self.image_processor.extract_skin_region(image, face_coords)
+        rgb = np.array(self.color_utils.extract_dominant_color(skin_region), dtype=np.float64)
+        if self.smoothed_rgb is None:
+            self.smoothed_rgb = rgb
+        else:
+            self.smoothed_rgb = self.smoothing * rgb + (1 - self.smoothing) * self.smoothed_rgb
+        
+        r, g, b = (int(round(c)) for c in self.smoothed_rgb)
+        return {'keyframe': keyframe, 'face': face_coords, 'rgb': {'r': r, 'g': g, 'b': b}}
@@ -0,0 +1,155 @@
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+from app.models.skin_analyzer import SkinAnalyzer
+from app.schemas.response_models import ProductRecommendation
+from app.services.product_recommender import ProductRecommender
+from app.utils.deadline import RequestDeadline
+from app.utils.logger import app_logger
+from app.utils.metrics import metrics
+from config import settings
+
+class _BatchItem:
+    """One caller's skin color, the recommendations it wants and its results"""
+    
+    def __init__(self, rgb: Tuple[int, int, int], categories: List[str], top_k: int, deadline: RequestDeadline):
+        self.rgb = rgb
+        self.categories = categories
+        self.top_k = top_k
+        self.deadline = deadline
+        self.submitted = time.perf_counter()
+        self.analysis_data = None  # Set as soon as the batch is classified
+        self.done = False
+        self.result = None
+        self.error = None
+
+class MicroBatcher:
+    """
+    Coalesce the classification and recommendation stages of concurrent analyses
+    
+    The first waiting caller leads: it collects the pending callers (up to
+    MICRO_BATCH_MAX_SIZE), classifies all their colors in one
+    SkinAnalyzer.analyze_batch call and hands each caller its analysis, then
+    matches the batch against the shade index together and fills in the
+    recommendations while the others block. Callers get their analysis before
+    the matching runs, so they can stream it at once, and callers abandoned
+    by then are left out of the matching. A caller that finds no one else
+    waiting runs at once; the leader waits up to MICRO_BATCH_WINDOW_MS for
+    the batch to fill only when others are already queued, so an idle server
+    adds no delay.
+    """
+    
+    def __init__(self, skin_analyzer: SkinAnalyzer, product_recommender: ProductRecommender,
+                 window_ms: float = None, max_size: int = None):
+        self.skin_analyzer = skin_analyzer
+        self.product_recommender = product_recommender
+        self.window = (settings.MICRO_BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000
+        self.max_size = max_size or settings.MICRO_BATCH_MAX_SIZE
+        self._pending = []
+        self._leading = False
+        self._condition = threading.Condition()
+        self.app_logger = app_logger
+    
+    def submit(self, rgb: Tuple[int, int, int], categories: List[str], top_k: int,
+               deadline: RequestDeadline = None) -> _BatchItem:
+        """Queue a skin color for the next batch"""
+        item = _BatchItem(tuple(rgb), categories, top_k, deadline or RequestDeadline.unbounded())
+        with self._condition:
+            self._pending.append(item)
+            self._condition.notify_all()
+        return item
+    
+    def analysis(self, item: _BatchItem) -> dict:
+        """Skin analysis of a submitted color, as analyze_complete returns it"""
+        self._wait(item, lambda: item.analysis_data is not None)
+        if item.analysis_data is None:
+            raise item.error
+        return item.analysis_data
+    
+    def recommendations(self, item: _BatchItem) -> Dict[str, List[ProductRecommendation]]:
+        """Top top_k matches per requested category of a submitted color"""
+        self._wait(item, lambda: item.done)
+        if item.error is not None:
+            raise item.error
+        if item.result is None:
+            # Left out of the matching because the request was already abandoned
+            item.deadline.check('recommend')
+        return item.result
+    
+    def analyze(self, rgb: Tuple[int, int, int], categories: List[str],
+                top_k: int) -> Tuple[dict, Dict[str, List[ProductRecommendation]]]:
+        """Skin analysis and recommendations of one color, batched with concurrent callers"""
+        item = self.submit(rgb, categories, top_k)
+        return self.analysis(item), self.recommendations(item)
+    
+    def _wait(self, item: _BatchItem, ready: Callable[[], bool]):
+        """Block until ready() or the item fails, leading batches while no one else does"""
+        self._condition.acquire()
+        try:
+            while not ready() and not item.done:
+                if self._leading:
+                    self._condition.wait()
+                    continue
+                
+                # Lead the next batch; wait for it to fill only if others are queued
+                self._leading = True
+                if 1 < len(self._pending) < self.max_size and self.window > 0:
+                    self._condition.wait_for(lambda: len(self._pending) >= self.max_size, timeout=self.window)
+                batch = self._pending[:self.max_size]
+                del self._pending[:self.max_size]
+                
+                self._condition.release()
+                try:
+                    self._run(batch)
+                finally:
+                    self._condition.acquire()
+                    self._leading = False
+                    self._condition.notify_all()
+        finally:
+            self._condition.release()
+    
+    def _run(self, batch: List[_BatchItem]):
+        """Compute a batch and fill in every item's analysis and results (or error)"""
+        started = time.perf_counter()
+        metrics.inc("micro_batches_total")
+        metrics.observe("micro_batch_size", len(batch))
+        for item in batch:
+            metrics.observe("micro_batch_queue_delay_seconds", started - item.submitted)
+        
+        try:
+            analyses = self.skin_analyzer.analyze_batch([item.rgb for item in batch])
+            
+            # Callers can stream their skin analysis while the batch is matched
+            with self._condition:
+                for item, analysis_data in zip(batch, analyses):
+                    item.analysis_data = analysis_data
+                self._condition.notify_all()
+            
+            live = [
+                i for i, item in enumerate(batch)
+                if not item.deadline.cancelled and item.deadline.remaining() > 0
+            ]
+            recommendations = {i: {} for i in live}
+            
+            # One shade index query per category and top_k; the skin type
+            # re-ranking pool grows with top_k, so a longer list cut short
+            # would not always match what the item gets on its own
+            for category, top_k in dict.fromkeys((c, batch[i].top_k) for i in live for c in batch[i].categories):
+                members = [i for i in live if batch[i].top_k == top_k and category in batch[i].categories]
+                matches = self.product_recommender.recommend_batch(
+                    [analyses[i] for i in members], category, top_k
+                )
+                for i, products in zip(members, matches):
+                    recommendations[i][category] = products
+            
+            for i, item_recommendations in recommendations.items():
+                batch[i].result = item_recommendations
+        except Exception as e:
+            self.app_logger.error(f"Micro-batch of {len(batch)} analyses failed: {str(e)}")
+            for item in batch:
+                item.error = e
+        finally:
+            with self._condition:
+                for item in batch:
+                    item.done = True
+            metrics.observe("micro_batch_seconds", time.perf_counter() - started)
@@ -1,77 +1,185 @@
 import json
+import numpy as np
 from pathlib import Path
-from typing import List
-from app.schemas.response_models import ProductRecommendation
+from typing import List, Optional, Tuple
+from app.schemas.response_models import ProductRecommendation, ShadeMatch
+from app.services.catalog_compiler import load_compiled_catalog
 from app.services.color_utils import ColorUtils
+from app.services.harmony_tables import HARMONY_PALETTES, HarmonyTables
+from app.services.shade_clusters import ShadeClusters
+from app.services.shade_index import ShadeIndex
+from app.services.skin_type_ranker import SkinTypeRanker
+from app.services.recommendation_grid import RecommendationGrid
+from app.utils.error_handlers import ShadeNotFoundException
 from app.utils.logger import app_logger
+from app.utils.metrics import metrics
+from config import settings
 
 class ProductRecommender:
     """Match user's skin tone with makeup products"""
     
     def __init__(self):
-        self.color_utils = ColorUtils()
-        self.products = self._load_products()
         self.app_logger = app_logger
+        self.color_utils = ColorUtils()
+        self.products, shade_labs = self._load_products()
+        self.shade_index = ShadeIndex(self.products, shade_labs)
+        metrics.set_gauge("catalog_shades", len(self.shade_index))
+        
+        # Precomputed candidates per quantized color; exact scan when disabled
+        self.recommendation_grid = None
+        if settings.RECOMMENDATION_GRID_ENABLED:
+            self.recommendation_grid = RecommendationGrid.open(self.shade_index)
+        
+        # Near-duplicate groups, also needed to cap results per brand or group
+        self.max_per_brand = settings.RECOMMENDATION_MAX_PER_BRAND
+        self.max_per_cluster = settings.RECOMMENDATION_MAX_PER_CLUSTER
+        self.shade_clusters = None
+        if settings.SHADE_CLUSTERS_ENABLED or self.max_per_brand or self.max_per_cluster:
+            self.shade_clusters = ShadeClusters.open(self.shade_index)
+            metrics.set_gauge("catalog_distinct_colors", len(self.shade_clusters))
+        
+        # Accent categories matched against precomputed harmony targets
+        self.harmony_tables = None
+        if settings.HARMONY_ENABLED:
+            self.harmony_tables = HarmonyTables.open(self.shade_index)
+        
+        # Product attribute features, weighed per skin type to re-rank matches
+        self.skin_type_ranker = None
+        if settings.SKIN_TYPE_RANKING_ENABLED:
+            self.skin_type_ranker = SkinTypeRanker.open(self.shade_index)
     
-    def _load_products(self) -> list:
-        """Load product database from JSON"""
+    def _load_products(self) -> Tuple[list, Optional[np.ndarray]]:
+        """
+        Load the compiled catalog (products and shade L*a*b*), or the bundled
+        product JSON if none has been compiled or it cannot be read
+        """
         try:
-            products_path = Path(__file__).parent.parent / "data" / "indian_products.json"
-            with open(products_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            compiled = load_compiled_catalog()
+            if compiled is not None:
+                products, shade_labs = compiled
+                self.app_logger.info(f"Loaded compiled catalog: {len(products)} products, {len(shade_labs)} shades")
+                return products, shade_labs
         except Exception as e:
-            self.app_logger.error(f"Failed to load products database: {str(e)}")
-            return []
+            self.app_logger.error(f"Failed to load compiled catalog, using the bundled products: {str(e)}")
+        
+        # A missing or corrupt bundled database is a deployment error, not an empty catalog
+        products_path = Path(__file__).parent.parent / "data" / "indian_products.json"
+        with open(products_path, 'r', encoding='utf-8') as f:
+            return json.load(f), None
+    
+    def _matcher(self, count: int):
+        """The grid when it stores enough candidates for count shades, else the clusters or the index"""
+        if self.recommendation_grid is not None and count <= self.recommendation_grid.k:
+            return self.recommendation_grid
+        return self.shade_clusters or self.shade_index
+    
+    def _query_batch(self, user_labs: np.ndarray, category: str, count: int) -> List[List[Tuple[dict, dict, float]]]:
+        """Closest shades per color, diversified when per-brand or per-group caps are set"""
+        if self.max_per_brand or self.max_per_cluster:
+            return self.shade_clusters.query_batch(user_labs, category, count, self.max_per_brand, self.max_per_cluster)
+        return self._matcher(count).query_batch(user_labs, category, count)
+    
+    def _candidate_count(self, skin_types: Optional[List[str]], count: int) -> int:
+        """Matches to fetch so skin type re-ranking has a pool to choose from"""
+        if skin_types and self.skin_type_ranker is not None and self.skin_type_ranker.adjusts(skin_types):
+            return count * settings.SKIN_TYPE_CANDIDATE_POOL
+        return count
+    
+    def _rerank(self, matches: List[list], skin_types: Optional[List[str]], count: int) -> List[list]:
+        if not skin_types or self.skin_type_ranker is None:
+            return [candidates[:count] for candidates in matches]
+        return self.skin_type_ranker.rerank(matches, skin_types, count)
+    
+    def _recommendation(self, product: dict, shade: dict, delta_e: float,
+                        palette: str = None) -> ProductRecommendation:
+        return ProductRecommendation(
+            name=product['name'],
+            brand=product['brand'],
+            category=product['category'],
+            shade=shade['name'],
+            price_inr=product['price_inr'],
+            image_url=product['image_url'],
+            rating=product['rating'],
+            reviews_count=product['reviews_count'],
+            buy_link=product['buy_link'],
+            delta_e_distance=delta_e,
+            palette=palette
+        )
+    
+    def _shade_match(self, row: int, delta_e: Optional[float]) -> ShadeMatch:
+        product, shade, _ = self.shade_index.match(row, delta_e)
+        return ShadeMatch(
+            **self._recommendation(product, shade, delta_e).model_dump(),
+            shade_id=self.shade_index.shade_ids[row],
+            hex=shade.get('hex')
+        )
+    
+    def search_shades(self, user_rgb: dict = None, categories: List[str] = None, brands: List[str] = None,
+                      finishes: List[str] = None, min_price: float = None, max_price: float = None,
+                      min_rating: float = None, min_reviews: int = None,
+                      count: int = 10) -> Tuple[List[ShadeMatch], int]:
+        """
+        Faceted shade search: filter with the index, then rank only the survivors
+        
+        Returns the top count matches (by Delta-E to user_rgb, or by rating
+        without a color) and the number of shades that passed the filters
+        """
+        rows = self.shade_index.filter_rows(
+            categories, brands, finishes, min_price, max_price, min_rating, min_reviews
+        )
+        metrics.observe("shade_search_candidates", len(rows))
+        
+        user_lab = None
+        if user_rgb is not None:
+            user_lab = self.color_utils.rgb_to_lab(user_rgb['r'], user_rgb['g'], user_rgb['b'])
+        
+        matches = [self._shade_match(row, delta_e) for row, delta_e in self.shade_index.rank(rows, user_lab, count)]
+        return matches, len(rows)
+    
+    def shade_row(self, shade_id: str) -> int:
+        """Shade index row of a shade id"""
+        row = self.shade_index.rows_by_shade_id.get(shade_id)
+        if row is None:
+            raise ShadeNotFoundException(f"Shade '{shade_id}' not found")
+        return row
+    
+    def shade_neighborhood(self, user_lab: dict, k: int = None, radius: float = None,
+                           categories: List[str] = None, exclude: int = None, limit: int = 20,
+                           after: Tuple[float, int] = None) -> Tuple[List[ShadeMatch], int, Optional[Tuple[float, int]]]:
+        """
+        One page of the k nearest shades and/or the shades within radius of a color
+        
+        Pages are keyed by the (delta_e, row) of the last shade returned: pass
+        it back as after to get the next page. Returns the page, the size of
+        the whole result set and the key of the next page (None on the last).
+        """
+        rows = self.shade_index.filter_rows(categories) if categories else None
+        neighbors = self.shade_index.neighbors(user_lab, k, radius, rows, exclude)
+        metrics.observe("shade_neighborhood_results", len(neighbors))
+        
+        remaining = neighbors
+        if after is not None:
+            remaining = [(row, delta_e) for row, delta_e in neighbors if (delta_e, row) > after]
+        page = remaining[:limit]
+        next_key = (page[-1][1], page[-1][0]) if len(remaining) > limit else None
+        return [self._shade_match(row, delta_e) for row, delta_e in page], len(neighbors), next_key
     
-    def find_best_matches(self, user_rgb: dict, category: str, count: int = 5) -> List[ProductRecommendation]:
+    def find_best_matches(self, user_rgb: dict, category: str, count: int = 5,
+                          skin_type: str = None) -> List[ProductRecommendation]:
         """Find best matching products for given skin tone and category"""
         try:
             user_lab = self.color_utils.rgb_to_lab(user_rgb['r'], user_rgb['g'], user_rgb['b'])
+            skin_types = [skin_type] if skin_type else None
             
-            # Filter products by category and calculate distances
-            products_with_distances = []
-            
-            for product in self.products:
-                if product['category'] != category:
-                    continue
-                
-                # Check all shades of the product
-                for shade in product['shades']:
-                    shade_rgb = shade.get('rgb', {})
-                    if not shade_rgb or not all(k in shade_rgb for k in ['r', 'g', 'b']):
-                        continue
-                    
-                    shade_lab = self.color_utils.rgb_to_lab(shade_rgb['r'], shade_rgb['g'], shade_rgb['b'])
-                    delta_e = self.color_utils.delta_e_cie94(user_lab, shade_lab)
-                    
-                    products_with_distances.append({
-                        'product': product,
-                        'shade': shade,
-                        'delta_e': delta_e
-                    })
-            
-            # Sort by delta_e (lower is better match)
-            products_with_distances.sort(key=lambda x: x['delta_e'])
-            
-            # Create recommendations
-            recommendations = []
-            for item in products_with_distances[:count]:
-                product = item['product']
-                shade = item['shade']
-                
-                recommendation = ProductRecommendation(
-                    name=product['name'],
-                    brand=product['brand'],
-                    category=product['category'],
-                    shade=shade['name'],
-                    price_inr=product['price_inr'],
-                    image_url=product['image_url'],
-                    rating=product['rating'],
-                    reviews_count=product['reviews_count'],
-                    buy_link=product['buy_link'],
-                    delta_e_distance=item['delta_e']
-                )
-                recommendations.append(recommendation)
+            # Sorted by delta_e (lower is better match), adjusted for the skin type
+            matches = self._query_batch(
+                np.array([[user_lab['l'], user_lab['a'], user_lab['b']]]), category,
+                self._candidate_count(skin_types, count)
+            )
+            recommendations = [
+                self._recommendation(product, shade, delta_e)
+                for product, shade, delta_e in self._rerank(matches, skin_types, count)[0]
+            ]
             
             self.app_logger.info(f"Found {len(recommendations)} {category} recommendations")
             return recommendations
@@ -80,25 +188,81 @@ class ProductRecommender:
             self.app_logger.error(f"Error finding product matches: {str(e)}")
             return []
     
-    def get_recommendations_by_skin_type(self, user_rgb: dict, skin_type: str) -> dict:
-        """Get product recommendations based on skin type and tone"""
-        recommendations = {
-            'foundation': self.find_best_matches(user_rgb, 'foundation', 5),
-            'blush': self.find_best_matches(user_rgb, 'blush', 5),
-            'lipstick': self.find_best_matches(user_rgb, 'lipstick', 5),
-            'concealer': self.find_best_matches(user_rgb, 'concealer', 5),
-            'eyeshadow': self.find_best_matches(user_rgb, 'eyeshadow', 5),
-        }
+    def find_best_matches_batch(self, user_rgbs: List[dict], category: str, count: int = 5,
+                                skin_types: List[str] = None) -> List[List[ProductRecommendation]]:
+        """Best matching products for several skin tones with one index query"""
+        try:
+            user_labs = self.color_utils.skin_features(
+                np.array([[rgb['r'], rgb['g'], rgb['b']] for rgb in user_rgbs]).reshape((-1, 3))
+            )['lab']
+            
+            return [
+                [self._recommendation(product, shade, delta_e) for product, shade, delta_e in matches]
+                for matches in self._rerank(
+                    self._query_batch(user_labs, category, self._candidate_count(skin_types, count)), skin_types, count
+                )
+            ]
+        
+        except Exception as e:
+            self.app_logger.error(f"Error finding product matches: {str(e)}")
+            return [[] for _ in user_rgbs]
+    
+    def uses_harmony(self, category: str) -> bool:
+        return self.harmony_tables is not None and category in HARMONY_PALETTES
+    
+    def find_harmony_matches_batch(self, user_rgbs: List[dict], seasons: List[str], undertones: List[str],
+                                   category: str, count: int = 5,
+                                   skin_types: List[str] = None) -> List[List[ProductRecommendation]]:
+        """Accent shades in harmony with several skin tones, each tagged with its palette"""
+        try:
+            user_labs = self.color_utils.skin_features(
+                np.array([[rgb['r'], rgb['g'], rgb['b']] for rgb in user_rgbs]).reshape((-1, 3))
+            )['lab']
+            
+            return [
+                [self._recommendation(product, shade, delta_e, palette) for product, shade, delta_e, palette in matches]
+                for matches in self._rerank(
+                    self.harmony_tables.query_batch(
+                        user_labs, seasons, undertones, category, self._candidate_count(skin_types, count)
+                    ),
+                    skin_types,
+                    count
+                )
+            ]
+        
+        except Exception as e:
+            self.app_logger.error(f"Error finding harmony matches: {str(e)}")
+            return [[] for _ in user_rgbs]
+    
+    def recommend_batch(self, analyses: List[dict], category: str, count: int = 5) -> List[List[ProductRecommendation]]:
+        """Recommendations of a category for several skin analyses (harmony for accent categories)"""
+        user_rgbs = [analysis_data['skin_tone']['rgb'] for analysis_data in analyses]
+        skin_types = [analysis_data['skin_type'].value for analysis_data in analyses]
+        if self.uses_harmony(category):
+            return self.find_harmony_matches_batch(
+                user_rgbs,
+                [analysis_data['season'].value for analysis_data in analyses],
+                [analysis_data['undertone'].value for analysis_data in analyses],
+                category,
+                count,
+                skin_types
+            )
+        return self.find_best_matches_batch(user_rgbs, category, count, skin_types)
+    
+    def get_recommendations_by_skin_type(self, user_rgb: dict, skin_type: str,
+                                         categories: list = None, count: int = 5,
+                                         season: str = None, undertone: str = None) -> dict:
+        """Get product recommendations based on skin type and tone (and season/undertone for accents)"""
+        if categories is None:
+            categories = ['foundation', 'blush', 'lipstick', 'concealer', 'eyeshadow']
         
-        # Add skin type specific adjustments
-        if skin_type == 'oily':
-            # For oily skin, prioritize long-wearing products
-            self.app_logger.info("Adjusting recommendations for oily skin type")
-        elif skin_type == 'dry':
-            # For dry skin, prioritize hydrating products
-            self.app_logger.info("Adjusting recommendations for dry skin type")
-        elif skin_type == 'sensitive':
-            # For sensitive skin, suggest hypoallergenic products
-            self.app_logger.info("Adjusting recommendations for sensitive skin type")
+        recommendations = {}
+        for category in categories:
+            if season and undertone and self.uses_harmony(category):
+                recommendations[category] = self.find_harmony_matches_batch(
+                    [user_rgb], [season], [undertone], category, count, [skin_type]
+                )[0]
+            else:
+                recommendations[category] = self.find_best_matches(user_rgb, category, count, skin_type)
         
         return recommendations
@@ -0,0 +1,68 @@
+import time
+import numpy as np
+from app.services.image_processor import ImageProcessor
+from app.utils.logger import app_logger
+from app.utils.lazy_import import lazy_import
+from app.utils.metrics import metrics
+from app.utils.error_handlers import ImageQualityException
+from config import settings
+
+cv2 = lazy_import("cv2")
+
+# YCrCb chroma box commonly used for skin segmentation (all skin tones)
+SKIN_YCRCB_LOWER = (0, 133, 77)
+SKIN_YCRCB_UPPER = (255, 173, 127)
+
+# Luma at or above which a pixel counts as clipped
+CLIPPED_LEVEL = 250
+
+class QualityGate:
+    """Reject hopeless images on a thumbnail before running face detection"""
+    
+    def __init__(self, image_processor: ImageProcessor):
+        self.image_processor = image_processor
+        self.thumbnail_size = settings.QUALITY_THUMBNAIL_SIZE
+        self.app_logger = app_logger
+    
+    def thumbnail(self, image: np.ndarray) -> np.ndarray:
+        """The downscaled copy of a BGR image the checks run on"""
+        return self.image_processor.make_thumbnail(image, self.thumbnail_size)
+    
+    def measure(self, image: np.ndarray, thumbnail: np.ndarray = None) -> dict:
+        """Exposure, sharpness and skin ratio of a BGR image, computed on a thumbnail (made if not given)"""
+        if thumbnail is None:
+            thumbnail = self.thumbnail(image)
+        gray = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+        histogram = np.bincount(gray.ravel(), minlength=256)
+        
+        skin_mask = cv2.inRange(cv2.cvtColor(thumbnail, cv2.COLOR_BGR2YCrCb), SKIN_YCRCB_LOWER, SKIN_YCRCB_UPPER)
+        
+        return {
+            'brightness': float(np.dot(histogram, np.arange(256)) / gray.size),
+            'clipped_fraction': float(histogram[CLIPPED_LEVEL:].sum() / gray.size),
+            'sharpness': float(cv2.Laplacian(gray, cv2.CV_64F).var()),
+            'skin_ratio': float(cv2.countNonZero(skin_mask) / gray.size),
+        }
+    
+    def check(self, image: np.ndarray, thumbnail: np.ndarray = None) -> dict:
+        """Raise ImageQualityException for images that cannot yield a usable face"""
+        started = time.perf_counter()
+        quality = self.measure(image, thumbnail)
+        metrics.observe("quality_gate_seconds", time.perf_counter() - started)
+        
+        # Exposure first: a dark or blown-out image also looks blurry and skinless
+        if quality['brightness'] < settings.QUALITY_MIN_BRIGHTNESS:
+            self._reject("IMAGE_TOO_DARK", "Image is too dark; please retake the photo in better light", quality)
+        if quality['clipped_fraction'] > settings.QUALITY_MAX_CLIPPED_FRACTION:
+            self._reject("IMAGE_OVEREXPOSED", "Image is overexposed; please avoid direct light or flash", quality)
+        if quality['sharpness'] < settings.QUALITY_MIN_SHARPNESS:
+            self._reject("IMAGE_TOO_BLURRY", "Image is too blurry; please hold the camera steady", quality)
+        if quality['skin_ratio'] < settings.QUALITY_MIN_SKIN_RATIO:
+            self._reject("NO_SKIN_DETECTED", "No skin visible in the image; please take a clear selfie", quality)
+        
+        return quality
+    
+    def _reject(self, code: str, message: str, quality: dict):
+        metrics.inc("quality_rejects_total", reason=code)
+        self.app_logger.info(f"Quality gate rejected image ({code}): {quality}")
+        raise ImageQualityException(message, code)
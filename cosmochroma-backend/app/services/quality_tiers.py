@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
+from app.utils.logger import app_logger
+from app.utils.metrics import metrics
+from app.utils.resource_governor import resource_governor
+from config import settings
+
+class QualityTier:
+    """Pipeline parameters traded off between precision and speed"""
+    
+    def __init__(self, name: str, level: int, scale_factor: float, min_neighbors: int,
+                 detection_max_side: Optional[int], estimator: str, max_pixels: Optional[int],
+                 categories: Optional[list]):
+        self.name = name
+        self.level = level
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.detection_max_side = detection_max_side  # None = detect at full resolution
+        self.estimator = estimator  # Dominant color estimator, see ColorUtils.extract_dominant_color
+        self.max_pixels = max_pixels  # Reduced-scale decode target, None = MAX_IMAGE_PIXELS
+        self.categories = categories  # Recommendation categories computed, None = all requested
+    
+    def detector_params(self) -> dict:
+        return {
+            'scale_factor': self.scale_factor,
+            'min_neighbors': self.min_neighbors,
+            'max_side': self.detection_max_side,
+        }
+
+QUALITY_TIERS = {
+    'full': QualityTier('full', 0, scale_factor=1.05, min_neighbors=4, detection_max_side=None,
+                        estimator='kmeans', max_pixels=None, categories=None),
+    'fast': QualityTier('fast', 1, scale_factor=1.1, min_neighbors=4, detection_max_side=960,
+                        estimator='median', max_pixels=4_000_000,
+                        categories=['foundation', 'concealer', 'lipstick']),
+    'minimal': QualityTier('minimal', 2, scale_factor=1.2, min_neighbors=3, detection_max_side=480,
+                           estimator='mean', max_pixels=1_000_000, categories=['foundation']),
+}
+TIERS_BY_LEVEL = sorted(QUALITY_TIERS.values(), key=lambda tier: tier.level)
+
+class TierController:
+    """
+    Pick the quality tier from executor queue depth and recent p95 latency
+    
+    The p95 covers only analyses that finished within the last
+    TIER_LATENCY_WINDOW_SECONDS (at most TIER_LATENCY_MAX_SAMPLES of them),
+    so a slow burst stops counting once it is that old, however little
+    traffic follows it.
+    """
+    
+    def __init__(self):
+        self.in_flight = 0
+        self.current = QUALITY_TIERS.get(settings.QUALITY_TIER, QUALITY_TIERS['full'])
+        self._latencies = deque(maxlen=settings.TIER_LATENCY_MAX_SAMPLES)  # (finished at, seconds), oldest first
+        self._lock = threading.Lock()
+        self.app_logger = app_logger
+        self._export()
+    
+    def _queue_depth(self) -> int:
+        """Analyses waiting for an executor thread"""
+        return max(0, self.in_flight - resource_governor.executor_threads)
+    
+    def _recent_p95(self, now: float) -> float:
+        """p95 latency of the analyses finished within the window (0.0 if none)"""
+        while self._latencies and self._latencies[0][0] < now - settings.TIER_LATENCY_WINDOW_SECONDS:
+            self._latencies.popleft()
+        if not self._latencies:
+            return 0.0
+        samples = sorted(seconds for _, seconds in self._latencies)
+        return samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+    
+    def _level_for(self, queue_depth: int, p95: float, ratio: float = 1.0) -> int:
+        if (queue_depth >= settings.TIER_MINIMAL_QUEUE_DEPTH * ratio
+                or p95 >= settings.TIER_MINIMAL_P95_SECONDS * ratio):
+            return 2
+        if queue_depth >= settings.TIER_FAST_QUEUE_DEPTH * ratio or p95 >= settings.TIER_FAST_P95_SECONDS * ratio:
+            return 1
+        return 0
+    
+    def select(self) -> QualityTier:
+        """Tier for a new analysis (fixed unless QUALITY_TIER is "auto")"""
+        if settings.QUALITY_TIER != "auto":
+            return QUALITY_TIERS.get(settings.QUALITY_TIER, QUALITY_TIERS['full'])
+        
+        with self._lock:
+            queue_depth = self._queue_depth()
+            p95 = self._recent_p95(time.monotonic())
+            
+            # Degrade as soon as a threshold is crossed, but only recover once
+            # load is well below it, so the tier does not flap
+            level = self._level_for(queue_depth, p95)
+            if level < self.current.level:
+                recovery_level = self._level_for(queue_depth, p95, settings.TIER_RECOVERY_RATIO)
+                level = min(self.current.level, max(level, recovery_level))
+            
+            if level != self.current.level:
+                self.app_logger.warning(
+                    f"Switching quality tier {self.current.name} -> {TIERS_BY_LEVEL[level].name} "
+                    f"(queue depth {queue_depth}, p95 {p95:.2f}s)"
+                )
+                self.current = TIERS_BY_LEVEL[level]
+                metrics.inc("quality_tier_switches_total", tier=self.current.name)
+                self._export()
+            return self.current
+    
+    @contextmanager
+    def track(self, tier: QualityTier):
+        """Count an analysis as in flight and record its end-to-end latency"""
+        with self._lock:
+            self.in_flight += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            finished = time.monotonic()
+            metrics.observe("analysis_seconds", finished - started)
+            metrics.inc("analyses_total", tier=tier.name)
+            with self._lock:
+                self.in_flight -= 1
+                self._latencies.append((finished, finished - started))
+    
+    def _export(self):
+        metrics.set_gauge("quality_tier_level", self.current.level)
+        for tier in TIERS_BY_LEVEL:
+            metrics.set_gauge("quality_tier_active", int(tier is self.current), tier=tier.name)
+
+# Process-wide tier controller
+tier_controller = TierController()
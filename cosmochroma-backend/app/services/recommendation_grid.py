@@ -0,0 +1,235 @@
+import json
+import os
+import time
+import numpy as np
+from pathlib import Path
+from typing import List, Optional, Tuple
+from app.services.color_utils import ColorUtils
+from app.services.shade_index import ShadeIndex
+from app.utils.logger import app_logger
+from config import settings
+
+# Realistic skin gamut covered by the grid (L*, a*, b* ranges); colors outside
+# it are matched exactly. The a*/b* origins are odd so that, with the default
+# step, no cell center is colorless (CIE94 is undefined at zero chroma).
+GRID_GAMUT = ((10.0, 95.0), (-9.0, 41.0), (-9.0, 51.0))
+
+# Grid cells whose distances are computed together while building
+BUILD_CHUNK_CELLS = 4096
+
+def candidate_width(count: int) -> int:
+    """
+    Candidates to store per cell so that queries for up to count shades are
+    served from the table, including the wider pool skin type re-ranking asks for
+    """
+    if settings.SKIN_TYPE_RANKING_ENABLED:
+        return count * settings.SKIN_TYPE_CANDIDATE_POOL
+    return count
+
+class RecommendationGrid:
+    """
+    Top-k shade candidates per category, precomputed for every cell of a quantized L*a*b* grid
+    
+    Built from a ShadeIndex whenever the catalog is compiled or reloaded and
+    stored as a memory-mapped .npy array of shade index rows (-1 = no
+    candidate), with a JSON sidecar describing the grid. A query looks up the
+    cell nearest the color and ranks its candidates by exact Delta-E.
+    """
+    
+    def __init__(self, shade_index: ShadeIndex, candidates: np.ndarray, metadata: dict):
+        self.shade_index = shade_index
+        self.candidates = candidates  # (categories, L, a, b, k) shade index rows
+        self.metadata = metadata
+        self.origin = np.array([axis[0] for axis in metadata['gamut']])
+        self.step = metadata['step']
+        self.shape = np.array(candidates.shape[1:4])
+        self.category_slots = {category: i for i, category in enumerate(metadata['categories'])}
+        self.rerank = settings.RECOMMENDATION_GRID_RERANK
+        self.app_logger = app_logger
+    
+    @property
+    def k(self) -> int:
+        return self.candidates.shape[-1]
+    
+    @staticmethod
+    def default_path() -> Path:
+        if settings.RECOMMENDATION_GRID_PATH:
+            return Path(settings.RECOMMENDATION_GRID_PATH)
+        return Path(__file__).parent.parent / "data" / "compiled" / "recommendation_grid.npy"
+    
+    @staticmethod
+    def cell_labs(gamut: tuple, step: float) -> Tuple[np.ndarray, tuple]:
+        """(cells, 3) L*a*b* cell centers in C order, and the grid shape"""
+        axes = [np.arange(low, high + step / 2, step) for low, high in gamut]
+        shape = tuple(len(axis) for axis in axes)
+        mesh = np.meshgrid(*axes, indexing='ij')
+        return np.stack([m.ravel() for m in mesh], axis=1), shape
+    
+    @classmethod
+    def build(cls, shade_index: ShadeIndex, step: float = None, k: int = None,
+              gamut: tuple = GRID_GAMUT) -> "RecommendationGrid":
+        """Rank every category's shades for every grid cell center"""
+        step = step or settings.RECOMMENDATION_GRID_STEP
+        k = k or candidate_width(settings.RECOMMENDATION_GRID_CANDIDATES)
+        started = time.perf_counter()
+        
+        labs, shape = cls.cell_labs(gamut, step)
+        categories = list(shade_index.category_rows)
+        dtype = np.int16 if len(shade_index) < np.iinfo(np.int16).max else np.int32
+        candidates = np.full((len(categories),) + shape + (k,), -1, dtype=dtype)
+        flat = candidates.reshape((len(categories), -1, k))
+        colorless = np.hypot(labs[:, 1], labs[:, 2]) == 0
+        
+        for slot, category in enumerate(categories):
+            rows = shade_index.category_rows[category]
+            width = min(k, len(rows))
+            for start in range(0, len(labs), BUILD_CHUNK_CELLS):
+                chunk = labs[start:start + BUILD_CHUNK_CELLS]
+                distances = ColorUtils.round_array(ColorUtils.delta_e_cie94_matrix(chunk, shade_index.labs[rows]))
+                order = np.argsort(distances, axis=1, kind='stable')[:, :width]
+                flat[slot, start:start + len(chunk), :width] = rows[order]
+            # Colorless centers have no defined ranking; their colors are matched exactly
+            flat[slot, colorless] = -1
+        
+        metadata = {
+            'fingerprint': shade_index.fingerprint(),
+            'categories': categories,
+            'gamut': [list(axis) for axis in gamut],
+            'step': step,
+            'built_seconds': round(time.perf_counter() - started, 3),
+        }
+        app_logger.info(
+            f"Built recommendation grid: {int(np.prod(shape))} cells x {len(categories)} categories x {k} "
+            f"candidates ({candidates.nbytes / 1024 / 1024:.1f} MB) in {metadata['built_seconds']}s"
+        )
+        return cls(shade_index, candidates, metadata)
+    
+    def save(self, path: Path = None):
+        """Write the grid atomically (readers keep their existing mapping)"""
+        path = Path(path or self.default_path())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        array = np.lib.format.open_memmap(temporary, mode='w+', dtype=self.candidates.dtype, shape=self.candidates.shape)
+        array[:] = self.candidates
+        array.flush()
+        del array
+        with open(temporary.with_suffix('.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.metadata, f, indent=2)
+        os.replace(temporary, path)
+        os.replace(temporary.with_suffix('.json'), path.with_suffix('.json'))
+    
+    @classmethod
+    def load(cls, shade_index: ShadeIndex, path: Path = None) -> Optional["RecommendationGrid"]:
+        """Map a saved grid, or None if it is missing, was built for another catalog or is too narrow"""
+        path = Path(path or cls.default_path())
+        try:
+            with open(path.with_suffix('.json'), encoding='utf-8') as f:
+                metadata = json.load(f)
+            if metadata.get('fingerprint') != shade_index.fingerprint():
+                return None
+            candidates = np.load(path, mmap_mode='r')
+            if candidates.shape[-1] < candidate_width(settings.RECOMMENDATION_GRID_CANDIDATES):
+                return None
+            return cls(shade_index, candidates, metadata)
+        except (OSError, ValueError):
+            return None
+    
+    @classmethod
+    def open(cls, shade_index: ShadeIndex, path: Path = None) -> "RecommendationGrid":
+        """Load the grid for this catalog, building and saving it if it is missing or stale"""
+        grid = cls.load(shade_index, path)
+        if grid is not None:
+            return grid
+        grid = cls.build(shade_index)
+        try:
+            grid.save(path)
+        except OSError as e:
+            app_logger.warning(f"Could not save recommendation grid, keeping it in memory: {str(e)}")
+        return grid
+    
+    def _cells(self, user_labs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Nearest cell index of each color, and whether it lies inside the grid"""
+        cells = np.rint((user_labs - self.origin) / self.step).astype(np.int64)
+        inside = np.all((cells >= 0) & (cells < self.shape), axis=1)
+        return np.where(inside[:, None], cells, 0), inside
+    
+    def query(self, user_lab: dict, category: str, k: int) -> List[Tuple[dict, dict, float]]:
+        """Closest k (product, shade, delta_e) of a category to one L*a*b* color"""
+        return self.query_batch(np.array([[user_lab['l'], user_lab['a'], user_lab['b']]]), category, k)[0]
+    
+    def query_batch(self, user_labs: np.ndarray, category: str, k: int,
+                    rerank: bool = None) -> List[List[Tuple[dict, dict, float]]]:
+        """
+        Like ShadeIndex.query_batch, from the precomputed candidates
+        
+        Colorless colors, colors outside the grid or on colorless cells, and
+        queries for more than the stored candidates go to the shade index. Without
+        re-ranking, candidates keep the order computed for the cell center.
+        """
+        rerank = self.rerank if rerank is None else rerank
+        user_labs = np.asarray(user_labs, dtype=np.float64).reshape((-1, 3))
+        slot = self.category_slots.get(category)
+        if slot is None or k > self.k:
+            return self.shade_index.query_batch(user_labs, category, k)
+        
+        cells, inside = self._cells(user_labs)
+        candidates = np.asarray(self.candidates[slot, cells[:, 0], cells[:, 1], cells[:, 2]])
+        colorless = np.hypot(user_labs[:, 1], user_labs[:, 2]) == 0
+        exact = ~inside | colorless | (candidates[:, 0] < 0)
+        
+        results = [None] * len(user_labs)
+        if exact.any():
+            for i, matches in zip(np.flatnonzero(exact), self.shade_index.query_batch(user_labs[exact], category, k)):
+                results[i] = matches
+        
+        for i in np.flatnonzero(~exact):
+            rows = candidates[i][candidates[i] >= 0].astype(np.int64)
+            distances = ColorUtils.round_array(
+                ColorUtils.delta_e_cie94_matrix(user_labs[i:i + 1], self.shade_index.labs[rows])[0]
+            )
+            if rerank:
+                # Exact Delta-E order; ties keep catalog order like the full scan
+                order = np.lexsort((rows, distances))[:k]
+            else:
+                order = np.arange(min(k, len(rows)))
+            results[i] = [self.shade_index.match(rows[j], float(distances[j])) for j in order]
+        return results
+    
+    def error_report(self, k: int = 5, samples: int = 20000, seed: int = 0) -> dict:
+        """
+        Ranking error caused by quantization, per category
+        
+        Compares grid lookups against the exact scan for random colors in the
+        gamut plus the cell corners farthest from their centers. Reports how
+        often the top k differs (with and without re-ranking), the share of
+        exact top-k shades returned after re-ranking, and the worst Delta-E
+        increase of any returned rank without re-ranking.
+        """
+        rng = np.random.default_rng(seed)
+        low = self.origin
+        high = self.origin + (self.shape - 1) * self.step
+        corners = self.origin + (rng.integers(0, self.shape, (samples // 4, 3)) + rng.choice([-0.5, 0.5], (samples // 4, 3))) * self.step
+        labs = np.concatenate([rng.uniform(low, high, (samples - len(corners), 3)), np.clip(corners, low, high)])
+        labs = ColorUtils.round_array(labs)
+        
+        report = {}
+        for category in self.category_slots:
+            exact = self.shade_index.query_batch(labs, category, k)
+            reranked = self.query_batch(labs, category, k, rerank=True)
+            unranked = self.query_batch(labs, category, k, rerank=False)
+            
+            stats = {'samples': len(labs), 'reranked_mismatch': 0, 'unranked_mismatch': 0,
+                     'top_k_recall': 1.0, 'max_delta_e_regret': 0.0}
+            found = total = 0
+            for exact_matches, reranked_matches, unranked_matches in zip(exact, reranked, unranked):
+                exact_shades = [id(shade) for _, shade, _ in exact_matches]
+                stats['reranked_mismatch'] += [id(shade) for _, shade, _ in reranked_matches] != exact_shades
+                stats['unranked_mismatch'] += [id(shade) for _, shade, _ in unranked_matches] != exact_shades
+                found += len(set(exact_shades) & {id(shade) for _, shade, _ in reranked_matches})
+                total += len(exact_shades)
+                for (_, _, exact_e), (_, _, grid_e) in zip(exact_matches, unranked_matches):
+                    stats['max_delta_e_regret'] = max(stats['max_delta_e_regret'], round(grid_e - exact_e, 2))
+            if total:
+                stats['top_k_recall'] = round(found / total, 4)
+            report[category] = stats
+        return report
@@ -145,10 +145,12 @@ class RoutineBuilder:
             self.app_logger.error(f"Error building routine: {str(e)}")
             raise
     
-    def build_all_routines(self, skin_type: str) -> dict:
+    def build_all_routines(self, skin_type: str, routine_types: list = None) -> dict:
         """Build all routines (morning, evening, weekly) for a skin type"""
+        if routine_types is None:
+            routine_types = ['morning', 'evening', 'weekly']
+        
         return {
-            'morning': self.build_routine(skin_type, 'morning'),
-            'evening': self.build_routine(skin_type, 'evening'),
-            'weekly': self.build_routine(skin_type, 'weekly'),
+            routine_type: self.build_routine(skin_type, routine_type)
+            for routine_type in routine_types
         }
@@ -0,0 +1,193 @@
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+from app.utils.lazy_import import lazy_import
+from app.utils.logger import app_logger
+from app.utils.metrics import metrics
+from config import settings
+
+cv2 = lazy_import("cv2")
+
+# Bits in each perceptual hash
+HASH_BITS = 64
+
+# Side of the square the hashes and mean color are computed on
+HASH_SIZE = 32
+
+class ImageKey(NamedTuple):
+    """What a cached upload is recognized by"""
+    phash: int
+    dhash: int
+    lab: Tuple[float, float, float]  # Mean L*a*b* of the thumbnail
+
+class CachedFace(NamedTuple):
+    """What a near-duplicate upload reuses"""
+    box: Tuple[float, float, float, float]  # Face x, y, width, height as fractions of the frame size
+    rgb: Optional[Tuple[int, int, int]]  # None if the color has to be estimated again
+    
+    def face_coords(self, shape: tuple) -> dict:
+        """The face box in pixels of a frame of the given shape"""
+        height, width = shape[:2]
+        x, y, w, h = self.box
+        return {
+            'x': int(round(x * width)),
+            'y': int(round(y * height)),
+            'width': int(round(w * width)),
+            'height': int(round(h * height)),
+        }
+
+def _hash_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def _hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+class PerceptualHashCache:
+    """
+    Face boxes and skin colors of recent uploads, found again by perceptual hash
+    
+    Re-exported, recompressed or slightly cropped copies of a selfie keep
+    nearly the same pHash (signs of the low DCT frequencies of a 32x32
+    grayscale thumbnail) and dHash (signs of its horizontal gradients). A match
+    needs both within PERCEPTUAL_CACHE_MAX_DISTANCE bits and reuses the face
+    box. The hashes ignore color, so reusing the skin color also needs the
+    thumbnail's mean L*a*b* within PERCEPTUAL_CACHE_MAX_DELTA_E and an entry
+    computed at the same or a better quality tier: a white-balanced or
+    color-corrected copy keeps its face box but is estimated again. Entries
+    sit in a multi-index hash table: the pHash is split into max distance + 1
+    chunks, and any hash that close shares at least one chunk exactly, so a
+    lookup only compares the entries of a few buckets.
+    """
+    
+    def __init__(self, max_distance: int = None, max_delta_e: float = None, capacity: int = None):
+        self.max_distance = settings.PERCEPTUAL_CACHE_MAX_DISTANCE if max_distance is None else max_distance
+        self.max_delta_e = settings.PERCEPTUAL_CACHE_MAX_DELTA_E if max_delta_e is None else max_delta_e
+        self.capacity = capacity or settings.PERCEPTUAL_CACHE_SIZE
+        bounds = np.linspace(0, HASH_BITS, min(self.max_distance + 1, HASH_BITS) + 1).astype(int).tolist()
+        self.chunks = [(start, (1 << (end - start)) - 1) for start, end in zip(bounds[:-1], bounds[1:])]
+        self.tables = [{} for _ in self.chunks]  # Per chunk: chunk value -> entry ids
+        self.entries = OrderedDict()  # Entry id -> (ImageKey, tier level, face box, RGB), least recently used first
+        self.next_id = 0
+        self.lookups = 0
+        self.hits = 0  # Lookups that reused the skin color
+        self._lock = threading.Lock()
+        self.app_logger = app_logger
+    
+    @staticmethod
+    def image_key(thumbnail: np.ndarray) -> ImageKey:
+        """
+        Hashes and mean color of a BGR frame
+        
+        Pass the quality gate's thumbnail rather than the full frame; it is
+        only shrunk further to 32x32.
+        """
+        square = cv2.resize(thumbnail, (HASH_SIZE, HASH_SIZE), interpolation=cv2.INTER_AREA)
+        lab = cv2.cvtColor(square.astype(np.float32) / 255, cv2.COLOR_BGR2Lab).reshape((-1, 3)).mean(axis=0)
+        gray = cv2.cvtColor(square, cv2.COLOR_BGR2GRAY)
+        
+        low = cv2.dct(gray.astype(np.float32))[:8, :8].ravel()
+        phash = _hash_int(low > np.median(low[1:]))
+        gradients = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+        dhash = _hash_int((gradients[:, 1:] > gradients[:, :-1]).ravel())
+        return ImageKey(phash, dhash, tuple(float(v) for v in lab))
+    
+    def _keys(self, phash: int) -> list:
+        """Bucket of a pHash in each chunk table"""
+        return [(phash >> shift) & mask for shift, mask in self.chunks]
+    
+    @staticmethod
+    def face_box(face_coords: dict, shape: tuple) -> Tuple[float, float, float, float]:
+        """A face box in pixels as fractions of the frame size"""
+        height, width = shape[:2]
+        return (face_coords['x'] / width, face_coords['y'] / height,
+                face_coords['width'] / width, face_coords['height'] / height)
+    
+    def probe(self, tier_level: int) -> "CacheProbe":
+        """Lookup and store of one upload analyzed at a quality tier"""
+        return CacheProbe(self, tier_level)
+    
+    def lookup(self, image_key: ImageKey, tier_level: int) -> Optional[CachedFace]:
+        """
+        Face box and, if reusable, RGB of the closest cached upload, or None
+        
+        Only colors estimated at the requested quality tier or a better one
+        (lower level) are reused. Entries whose color is reusable are
+        preferred over closer ones whose color is not.
+        """
+        lab = np.array(image_key.lab)
+        with self._lock:
+            candidates = set()
+            for table, key in zip(self.tables, self._keys(image_key.phash)):
+                candidates.update(table.get(key, ()))
+            
+            best = None
+            for entry_id in candidates:
+                entry_key, level, box, rgb = self.entries[entry_id]
+                distance = _hamming(image_key.phash, entry_key.phash)
+                if distance > self.max_distance or _hamming(image_key.dhash, entry_key.dhash) > self.max_distance:
+                    continue
+                reusable = level <= tier_level and np.linalg.norm(lab - entry_key.lab) <= self.max_delta_e
+                rank = (not reusable, distance)
+                if best is None or rank < best[0]:
+                    best = (rank, entry_id, CachedFace(box, rgb if reusable else None))
+            
+            self.lookups += 1
+            if best is not None:
+                if best[2].rgb is not None:
+                    self.hits += 1
+                self.entries.move_to_end(best[1])
+            hit_ratio = self.hits / self.lookups
+        
+        if best is None:
+            result = "miss"
+        else:
+            result = "hit" if best[2].rgb is not None else "face"
+        metrics.inc("perceptual_cache_lookups_total", result=result)
+        metrics.set_gauge("perceptual_cache_hit_ratio", round(hit_ratio, 4))
+        if best is None:
+            return None
+        distance = best[0][1]
+        metrics.observe("perceptual_cache_hit_distance", distance)
+        reused = "skin color" if result == "hit" else "face box"
+        self.app_logger.info(f"Near-duplicate upload (pHash distance {distance}), reusing its {reused}")
+        return best[2]
+    
+    def store(self, image_key: ImageKey, tier_level: int, box: Tuple[float, float, float, float],
+              rgb: Tuple[int, int, int]):
+        """Remember the face box and skin color of an analyzed upload, evicting the least recently used"""
+        with self._lock:
+            entry_id = self.next_id
+            self.next_id += 1
+            self.entries[entry_id] = (image_key, tier_level, tuple(box), tuple(rgb))
+            for table, key in zip(self.tables, self._keys(image_key.phash)):
+                table.setdefault(key, set()).add(entry_id)
+            
+            while len(self.entries) > self.capacity:
+                old_id, (old_key, _, _, _) = self.entries.popitem(last=False)
+                for table, key in zip(self.tables, self._keys(old_key.phash)):
+                    bucket = table[key]
+                    bucket.discard(old_id)
+                    if not bucket:
+                        del table[key]
+            size = len(self.entries)
+        metrics.set_gauge("perceptual_cache_entries", size)
+
+class CacheProbe:
+    """
+    One upload's pass through the cache: a lookup on its thumbnail, then a
+    store once its face and color were found again
+    """
+    
+    def __init__(self, cache: PerceptualHashCache, tier_level: int):
+        self.cache = cache
+        self.tier_level = tier_level
+        self.image_key = None
+    
+    def lookup(self, thumbnail: np.ndarray) -> Optional[CachedFace]:
+        self.image_key = self.cache.image_key(thumbnail)
+        return self.cache.lookup(self.image_key, self.tier_level)
+    
+    def store(self, face_coords: dict, shape: tuple, rgb: Tuple[int, int, int]):
+        if self.image_key is not None:
+            self.cache.store(self.image_key, self.tier_level, self.cache.face_box(face_coords, shape), rgb)
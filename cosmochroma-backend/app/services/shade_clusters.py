@@ -0,0 +1,245 @@
+import os
+import time
+import numpy as np
+from pathlib import Path
+from scipy.spatial import cKDTree
+from typing import List, Optional, Tuple
+from app.services.color_utils import ColorUtils
+from app.services.shade_index import ShadeIndex
+from app.utils.logger import app_logger
+from config import settings
+
+class ShadeClusters:
+    """
+    Near-duplicate shades of each category grouped under representative shades
+    
+    Built offline from a ShadeIndex: walking shades in catalog order, each
+    shade not yet grouped becomes a representative and takes every ungrouped
+    shade of its category within SHADE_CLUSTER_DELTA_E (both in Euclidean
+    L*a*b* and in Delta-E from the representative). Queries score the
+    representatives, then expand only the groups that can still reach the
+    top k, so their cost follows the number of distinct colors. Results are
+    identical to the full scan, optionally capped per brand or per group.
+    """
+    
+    def __init__(self, shade_index: ShadeIndex, arrays: dict, threshold: float):
+        self.shade_index = shade_index
+        self.threshold = threshold
+        self.leaders = arrays['leaders']  # Representative row of each cluster
+        self.offsets = arrays['offsets']  # Cluster c's rows are members[offsets[c]:offsets[c + 1]]
+        self.members = arrays['members']
+        self.max_dl = arrays['max_dl']  # Largest |L*| and a*b* offsets of a member from its representative
+        self.max_dab = arrays['max_dab']
+        self.min_chroma = arrays['min_chroma']  # Lowest chroma between the representative and a member
+        self.sizes = np.diff(self.offsets)
+        self.cluster_of = np.empty(len(shade_index), dtype=np.int64)
+        self.cluster_of[self.members] = np.repeat(np.arange(len(self.leaders)), self.sizes)
+        self.category_clusters = {
+            category: np.unique(self.cluster_of[rows]) for category, rows in shade_index.category_rows.items()
+        }
+        self.app_logger = app_logger
+    
+    def __len__(self) -> int:
+        return len(self.leaders)
+    
+    @staticmethod
+    def default_path() -> Path:
+        if settings.SHADE_CLUSTERS_PATH:
+            return Path(settings.SHADE_CLUSTERS_PATH)
+        return Path(__file__).parent.parent / "data" / "compiled" / "shade_clusters.npz"
+    
+    @staticmethod
+    def _segment_min_chroma(ab1: np.ndarray, ab2: np.ndarray) -> np.ndarray:
+        """Distance from the neutral axis to each a*b* segment ab1 -> ab2"""
+        direction = ab2 - ab1
+        length = np.einsum('ij,ij->i', direction, direction)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.clip(np.where(length > 0, -np.einsum('ij,ij->i', ab1, direction) / length, 0), 0, 1)
+        return np.hypot(*(ab1 + t[:, None] * direction).T)
+    
+    @classmethod
+    def build(cls, shade_index: ShadeIndex, threshold: float = None) -> "ShadeClusters":
+        """Group each category's near-duplicate shades"""
+        threshold = threshold or settings.SHADE_CLUSTER_DELTA_E
+        started = time.perf_counter()
+        labs = shade_index.labs
+        assigned = np.full(len(shade_index), -1, dtype=np.int64)
+        leaders = []
+        
+        for rows in shade_index.category_rows.values():
+            tree = cKDTree(labs[rows])
+            for position, nearby in enumerate(tree.query_ball_point(labs[rows], threshold)):
+                row = rows[position]
+                if assigned[row] >= 0:
+                    continue
+                nearby = rows[np.array(nearby, dtype=np.int64)]
+                nearby = nearby[assigned[nearby] < 0]
+                distances = ColorUtils.delta_e_cie94_matrix(labs[row:row + 1], labs[nearby])[0]
+                assigned[nearby[distances < threshold]] = len(leaders)
+                assigned[row] = len(leaders)
+                leaders.append(row)
+        
+        leaders = np.array(leaders, dtype=np.int64)
+        members = np.lexsort((np.arange(len(assigned)), assigned))
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assigned, minlength=len(leaders)))])
+        
+        # Per-cluster spread around the representative, for query bounds
+        spread = labs[members] - labs[leaders[assigned[members]]]
+        segment_chroma = cls._segment_min_chroma(labs[leaders[assigned[members]], 1:], labs[members, 1:])
+        starts = offsets[:-1]
+        arrays = {
+            'leaders': leaders,
+            'offsets': offsets,
+            'members': members,
+            'max_dl': np.maximum.reduceat(np.abs(spread[:, 0]), starts) if len(leaders) else np.zeros(0),
+            'max_dab': np.maximum.reduceat(np.hypot(spread[:, 1], spread[:, 2]), starts) if len(leaders) else np.zeros(0),
+            'min_chroma': np.minimum.reduceat(segment_chroma, starts) if len(leaders) else np.zeros(0),
+        }
+        
+        clusters = cls(shade_index, arrays, threshold)
+        app_logger.info(
+            f"Clustered {len(shade_index)} shades into {len(clusters)} distinct colors "
+            f"(Delta-E < {threshold}) in {time.perf_counter() - started:.2f}s"
+        )
+        return clusters
+    
+    def save(self, path: Path = None):
+        """Write the clusters atomically, tagged with the catalog fingerprint"""
+        path = Path(path or self.default_path())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f".{path.stem}.{os.getpid()}.tmp.npz")
+        np.savez(
+            temporary, leaders=self.leaders, offsets=self.offsets, members=self.members,
+            max_dl=self.max_dl, max_dab=self.max_dab, min_chroma=self.min_chroma,
+            fingerprint=np.array(self.shade_index.fingerprint()), threshold=np.array(self.threshold)
+        )
+        os.replace(temporary, path)
+    
+    @classmethod
+    def load(cls, shade_index: ShadeIndex, path: Path = None,
+             threshold: float = None) -> Optional["ShadeClusters"]:
+        """Saved clusters, or None if missing or built for another catalog or threshold"""
+        path = Path(path or cls.default_path())
+        threshold = threshold or settings.SHADE_CLUSTER_DELTA_E
+        try:
+            with np.load(path) as saved:
+                if str(saved['fingerprint']) != shade_index.fingerprint() or float(saved['threshold']) != threshold:
+                    return None
+                return cls(shade_index, {name: saved[name] for name in saved.files}, threshold)
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    @classmethod
+    def open(cls, shade_index: ShadeIndex, path: Path = None) -> "ShadeClusters":
+        """Load the clusters for this catalog, building and saving them if missing or stale"""
+        clusters = cls.load(shade_index, path)
+        if clusters is not None:
+            return clusters
+        clusters = cls.build(shade_index)
+        try:
+            clusters.save(path)
+        except OSError as e:
+            app_logger.warning(f"Could not save shade clusters, keeping them in memory: {str(e)}")
+        return clusters
+    
+    def _slack(self, lab: np.ndarray, clusters: np.ndarray) -> np.ndarray:
+        """
+        Most any member's Delta-E from lab can differ from its representative's
+        
+        Bounds each term of the Delta-E along the segment between them: L*
+        moves 1:1, the chroma term by 1/C of the a*b* offset, and the hue term
+        by at most sqrt(C / chroma on the segment) of it.
+        """
+        chroma = np.hypot(lab[1], lab[2])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            hue_factor = np.where(self.min_chroma[clusters] > 0, chroma / self.min_chroma[clusters], np.inf)
+            dab_term = np.where(self.max_dab[clusters] > 0, self.max_dab[clusters] ** 2 * (1 / chroma ** 2 + hue_factor), 0.0)
+            slack = np.sqrt(self.max_dl[clusters] ** 2 + dab_term)
+        # Singletons are exact; tiny margin for floating point error
+        return np.where(self.sizes[clusters] > 1, slack, 0.0) + 1e-9
+    
+    def query(self, user_lab: dict, category: str, k: int, max_per_brand: int = 0,
+              max_per_cluster: int = 0) -> List[Tuple[dict, dict, float]]:
+        """Closest k (product, shade, delta_e) of a category to one L*a*b* color"""
+        return self.query_batch(
+            np.array([[user_lab['l'], user_lab['a'], user_lab['b']]]), category, k, max_per_brand, max_per_cluster
+        )[0]
+    
+    def query_batch(self, user_labs: np.ndarray, category: str, k: int, max_per_brand: int = 0,
+                    max_per_cluster: int = 0) -> List[List[Tuple[dict, dict, float]]]:
+        """
+        Like ShadeIndex.query_batch, searching representatives first
+        
+        max_per_brand / max_per_cluster (0 = no cap) skip shades once their
+        brand or near-duplicate group already fills that many places, and
+        later shades take their place.
+        """
+        user_labs = np.asarray(user_labs, dtype=np.float64).reshape((-1, 3))
+        clusters = self.category_clusters.get(category)
+        if clusters is None or len(clusters) == 0:
+            return [[] for _ in user_labs]
+        
+        rep_distances = ColorUtils.delta_e_cie94_matrix(user_labs, self.shade_index.labs[self.leaders[clusters]])
+        return [
+            self._query_one(user_lab, clusters, distances, k, max_per_brand, max_per_cluster)
+            for user_lab, distances in zip(user_labs, rep_distances)
+        ]
+    
+    def _select(self, rows: np.ndarray, distances: np.ndarray, k: int, max_per_brand: int,
+                max_per_cluster: int) -> np.ndarray:
+        """Positions of the first k candidates in (delta_e, row) order that respect the caps"""
+        order = np.lexsort((rows, distances))
+        if not max_per_brand and not max_per_cluster:
+            return order[:k]
+        
+        selected = []
+        brand_counts = {}
+        cluster_counts = {}
+        for position in order:
+            brand = self.shade_index.brand_codes[rows[position]]
+            cluster = self.cluster_of[rows[position]]
+            if max_per_brand and brand_counts.get(brand, 0) >= max_per_brand:
+                continue
+            if max_per_cluster and cluster_counts.get(cluster, 0) >= max_per_cluster:
+                continue
+            brand_counts[brand] = brand_counts.get(brand, 0) + 1
+            cluster_counts[cluster] = cluster_counts.get(cluster, 0) + 1
+            selected.append(position)
+            if len(selected) == k:
+                break
+        return np.array(selected, dtype=np.int64)
+    
+    def _query_one(self, user_lab: np.ndarray, clusters: np.ndarray, rep_distances: np.ndarray, k: int,
+                   max_per_brand: int, max_per_cluster: int) -> List[Tuple[dict, dict, float]]:
+        if k <= 0 or np.hypot(user_lab[1], user_lab[2]) == 0:
+            return []
+        
+        # Expand groups in order of their lowest possible Delta-E until no
+        # unexpanded group can beat the k-th result (rounded to 2 decimals)
+        lower = rep_distances - self._slack(user_lab, clusters)
+        order = np.argsort(lower, kind='stable')
+        sizes = np.cumsum(self.sizes[clusters[order]])
+        rows = np.zeros(0, dtype=np.int64)
+        distances = np.zeros(0)
+        expanded = 0
+        target = k
+        while True:
+            end = min(len(order), int(np.searchsorted(sizes, sizes[expanded - 1] + target if expanded else target)) + 1)
+            batch = clusters[order[expanded:end]]
+            expanded = end
+            
+            batch_rows = np.concatenate([self.members[self.offsets[c]:self.offsets[c + 1]] for c in batch])
+            batch_distances = ColorUtils.round_array(
+                ColorUtils.delta_e_cie94_matrix(user_lab[None, :], self.shade_index.labs[batch_rows])[0]
+            )
+            rows = np.concatenate([rows, batch_rows])
+            distances = np.concatenate([distances, batch_distances])
+            selected = self._select(rows, distances, k, max_per_brand, max_per_cluster)
+            
+            if expanded == len(order):
+                break
+            if len(selected) == k and lower[order[expanded]] > distances[selected[-1]] + 0.005:
+                break
+            target *= 2
+        
+        return [self.shade_index.match(rows[i], float(distances[i])) for i in selected]
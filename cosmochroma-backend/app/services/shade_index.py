@@ -0,0 +1,314 @@
+import hashlib
+import numpy as np
+from scipy.spatial import cKDTree
+from typing import List, Optional, Tuple
+from app.services.color_utils import ColorUtils
+
+class ShadeIndex:
+    """
+    Columnar L*a*b* index of every product shade for vectorized Delta-E queries
+    
+    shade_labs, when given (e.g. from a compiled catalog), holds the L*a*b* of
+    every shade in catalog order, and all shades are assumed valid.
+    """
+    
+    def __init__(self, products: list, shade_labs: np.ndarray = None):
+        self.products = products
+        
+        if shade_labs is not None:
+            counts = np.array([len(product['shades']) for product in products], dtype=np.int64)
+            labs = shade_labs
+            product_rows = np.repeat(np.arange(len(products)), counts)
+            shade_rows = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            categories = np.repeat(np.array([product['category'] for product in products], dtype=object), counts).tolist()
+        else:
+            labs = []
+            product_rows = []
+            shade_rows = []
+            categories = []
+            
+            for product_index, product in enumerate(products):
+                for shade_index, shade in enumerate(product['shades']):
+                    shade_rgb = shade.get('rgb', {})
+                    if not shade_rgb or not all(k in shade_rgb for k in ['r', 'g', 'b']):
+                        continue
+                    
+                    shade_lab = ColorUtils.rgb_to_lab(shade_rgb['r'], shade_rgb['g'], shade_rgb['b'])
+                    labs.append([shade_lab['l'], shade_lab['a'], shade_lab['b']])
+                    product_rows.append(product_index)
+                    shade_rows.append(shade_index)
+                    categories.append(product['category'])
+        
+        # One row per shade, in catalog order
+        self.labs = np.array(labs, dtype=np.float64).reshape((-1, 3))
+        self.product_rows = np.array(product_rows, dtype=np.int32)
+        self.shade_rows = np.array(shade_rows, dtype=np.int32)
+        self.categories = np.array(categories, dtype=object)
+        self.category_rows = {
+            category: np.flatnonzero(self.categories == category)
+            for category in dict.fromkeys(categories)
+        }
+        
+        # Stable public shade ids: "<product id>-<shade position>"
+        self.shade_ids = [
+            f"{products[p].get('id', p)}-{s}" for p, s in zip(self.product_rows.tolist(), self.shade_rows.tolist())
+        ]
+        self.rows_by_shade_id = {shade_id: row for row, shade_id in enumerate(self.shade_ids)}
+        
+        # Matches hand out the catalog's own shade dicts; map them back to rows
+        self.rows_by_shade = {
+            id(products[p]['shades'][s]): row
+            for row, (p, s) in enumerate(zip(self.product_rows.tolist(), self.shade_rows.tolist()))
+        }
+        self._build_facets()
+        
+        # k-d tree over L*a*b* for radius and nearest-neighbour queries
+        self.tree = cKDTree(self.labs) if len(self.labs) else None
+    
+    def __len__(self) -> int:
+        return len(self.labs)
+    
+    def _build_facets(self):
+        """Bitmap indexes for set filters and sorted columns for range filters"""
+        row_products = [self.products[p] for p in self.product_rows.tolist()]
+        row_shades = [product['shades'][s] for product, s in zip(row_products, self.shade_rows.tolist())]
+        
+        # Packed bitmaps (one bit per shade) for each value of each set facet
+        facets = {
+            'category': [product['category'] for product in row_products],
+            'brand': [product['brand'].casefold() for product in row_products],
+            'finish': [
+                (shade.get('finish') or product.get('finish') or '').casefold()
+                for product, shade in zip(row_products, row_shades)
+            ],
+        }
+        self.bitmaps = {}
+        for facet, values in facets.items():
+            values = np.array(values, dtype=object)
+            self.bitmaps[facet] = {
+                value: np.packbits(values == value) for value in dict.fromkeys(values.tolist()) if value
+            }
+        
+        # Row order and sorted values of each range facet, for binary-searched ranges
+        self.sorted_columns = {}
+        for column in ('price_inr', 'rating', 'reviews_count'):
+            values = np.array([product[column] for product in row_products], dtype=np.float64)
+            order = np.argsort(values, kind='stable')
+            self.sorted_columns[column] = (order, values[order])
+        
+        # Brand of each row as a small integer, for per-brand caps
+        self.brand_codes = np.unique(np.array(facets['brand'], dtype=object), return_inverse=True)[1].reshape(-1)
+        
+        self.ratings = np.array([product['rating'] for product in row_products], dtype=np.float64)
+        self.reviews = np.array([product['reviews_count'] for product in row_products], dtype=np.float64)
+    
+    def _rows_bitmap(self, rows: np.ndarray) -> np.ndarray:
+        mask = np.zeros(len(self), dtype=bool)
+        mask[rows] = True
+        return np.packbits(mask)
+    
+    def _facet_bitmap(self, facet: str, values: List[str]) -> np.ndarray:
+        """Shades matching any of the values"""
+        bitmap = np.zeros((len(self) + 7) // 8, dtype=np.uint8)
+        for value in values:
+            key = value if facet == 'category' else value.casefold()
+            if key in self.bitmaps[facet]:
+                bitmap |= self.bitmaps[facet][key]
+        return bitmap
+    
+    def _range_bitmap(self, column: str, low: float = None, high: float = None) -> np.ndarray:
+        """Shades with low <= column <= high"""
+        order, values = self.sorted_columns[column]
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        end = len(values) if high is None else np.searchsorted(values, high, side='right')
+        return self._rows_bitmap(order[start:end])
+    
+    def filter_rows(self, categories: List[str] = None, brands: List[str] = None, finishes: List[str] = None,
+                    min_price: float = None, max_price: float = None, min_rating: float = None,
+                    min_reviews: int = None) -> np.ndarray:
+        """
+        Index rows passing every given filter, in catalog order
+        
+        Set filters (category, brand, finish) match any listed value; brand and
+        finish ignore case. Filters are combined by AND-ing packed bitmaps.
+        """
+        bitmaps = []
+        if categories:
+            bitmaps.append(self._facet_bitmap('category', categories))
+        if brands:
+            bitmaps.append(self._facet_bitmap('brand', brands))
+        if finishes:
+            bitmaps.append(self._facet_bitmap('finish', finishes))
+        if min_price is not None or max_price is not None:
+            bitmaps.append(self._range_bitmap('price_inr', min_price, max_price))
+        if min_rating is not None:
+            bitmaps.append(self._range_bitmap('rating', min_rating))
+        if min_reviews is not None:
+            bitmaps.append(self._range_bitmap('reviews_count', min_reviews))
+        
+        if not bitmaps:
+            return np.arange(len(self))
+        combined = bitmaps[0]
+        for bitmap in bitmaps[1:]:
+            combined = combined & bitmap
+        return np.flatnonzero(np.unpackbits(combined, count=len(self)))
+    
+    def rank(self, rows: np.ndarray, user_lab: dict = None, k: int = 10,
+             offset: int = 0) -> List[Tuple[int, Optional[float]]]:
+        """
+        Order the given rows and return (row, delta_e) for ranks offset..offset+k
+        
+        With a color, rows are ranked by Delta-E (ties in catalog order) and
+        only these rows are scored. Without one they are ordered by rating,
+        then review count, and delta_e is None.
+        """
+        if len(rows) == 0:
+            return []
+        if user_lab is None:
+            order = np.lexsort((rows, -self.reviews[rows], -self.ratings[rows]))[offset:offset + k]
+            return [(int(rows[i]), None) for i in order]
+        
+        user_labs = np.array([[user_lab['l'], user_lab['a'], user_lab['b']]])
+        if np.hypot(user_labs[0, 1], user_labs[0, 2]) == 0:
+            return []
+        distances = ColorUtils.round_array(ColorUtils.delta_e_cie94_matrix(user_labs, self.labs[rows])[0])
+        order = np.argsort(distances, kind='stable')[offset:offset + k]
+        return [(int(rows[i]), float(distances[i])) for i in order]
+    
+    @staticmethod
+    def _search_balls(lab: np.ndarray, delta_e: float) -> Tuple[np.ndarray, float]:
+        """
+        Centers and radius of Euclidean L*a*b* balls covering every shade within a (rounded) Delta-E
+        
+        CIE94 here divides the chroma difference by the reference chroma c but
+        not the L* or hue differences, so Delta-E d allows a chroma change of
+        d * c and little else: the shades lie in a thin wedge along the ray from
+        the neutral axis through the color. Within d, |dL| <= d, the distance
+        off the ray is at most d * sqrt(1 + d), and the position along it lies
+        in [max(0, c * (1 - d)) - d^2 / 2c, c * (1 + d)]. The wedge is covered
+        by balls spaced along the ray, or by the single ball of radius
+        d * sqrt(1 + c^2) around the color when that is smaller.
+        """
+        d = delta_e + 0.005
+        chroma = np.hypot(lab[1], lab[2])
+        single = d * np.sqrt(1 + chroma ** 2)
+        
+        # Each ball covers half its spacing either side of its center
+        half_width = d * np.sqrt(2 + d)
+        radius = half_width * np.sqrt(2)
+        start = max(0.0, chroma * (1 - d)) - d ** 2 / (2 * chroma)
+        end = chroma * (1 + d)
+        count = max(1, int(np.ceil((end - start) / (2 * half_width))))
+        if count * radius ** 3 >= single ** 3:
+            return lab[None, :], single
+        
+        positions = start + 2 * half_width * (np.arange(count) + 0.5)
+        centers = np.empty((count, 3))
+        centers[:, 0] = lab[0]
+        centers[:, 1] = positions * lab[1] / chroma
+        centers[:, 2] = positions * lab[2] / chroma
+        return centers, radius
+    
+    def neighbors(self, user_lab: dict, k: int = None, radius: float = None, rows: np.ndarray = None,
+                  exclude: int = None) -> List[Tuple[int, float]]:
+        """
+        (row, delta_e) of the k nearest shades, the shades within radius, or both
+        
+        Candidates come from k-d tree balls guaranteed to hold every qualifying
+        shade, and only those are scored. rows limits the search (e.g. to
+        filter_rows output) and exclude drops one row, such as the reference
+        shade itself. Sorted by Delta-E, ties in catalog order; a colorless
+        color gets no matches.
+        """
+        lab = np.array([user_lab['l'], user_lab['a'], user_lab['b']], dtype=np.float64)
+        if self.tree is None or np.hypot(lab[1], lab[2]) == 0:
+            return []
+        
+        allowed = np.ones(len(self), dtype=bool)
+        if rows is not None:
+            allowed[:] = False
+            allowed[rows] = True
+        if exclude is not None:
+            allowed[exclude] = False
+        available = int(allowed.sum())
+        if available == 0 or k == 0:
+            return []
+        
+        if k is not None:
+            # Any k allowed shades bound the k-th smallest Delta-E; take the
+            # Euclidean nearest, widening until k of them are allowed
+            probe = min(k, len(self))
+            while True:
+                _, nearest = self.tree.query(lab, k=probe)
+                nearest = np.atleast_1d(nearest)
+                nearest = nearest[allowed[nearest]]
+                if len(nearest) >= min(k, available) or probe == len(self):
+                    break
+                probe = min(probe * 2, len(self))
+            bound = float(self._distances(lab, nearest[:k]).max())
+            radius = bound if radius is None else min(radius, bound)
+        
+        centers, search_radius = self._search_balls(lab, radius)
+        balls = self.tree.query_ball_point(centers, search_radius)
+        candidates = np.unique(np.concatenate([np.array(ball, dtype=np.int64) for ball in balls]))
+        candidates = candidates[allowed[candidates]]
+        distances = self._distances(lab, candidates)
+        within = distances <= radius
+        candidates, distances = candidates[within], distances[within]
+        order = np.lexsort((candidates, distances))[:k]
+        return [(int(candidates[i]), float(distances[i])) for i in order]
+    
+    def _distances(self, lab: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Rounded Delta-E from one L*a*b* color to the given rows"""
+        return ColorUtils.round_array(ColorUtils.delta_e_cie94_matrix(lab[None, :], self.labs[rows])[0])
+    
+    def lab(self, row: int) -> dict:
+        """L*a*b* of an index row"""
+        l, a, b = self.labs[row].tolist()
+        return {'l': l, 'a': a, 'b': b}
+    
+    def fingerprint(self) -> str:
+        """Digest of the indexed shades, to detect artifacts built for another catalog"""
+        digest = hashlib.sha256()
+        for column in (self.labs, self.product_rows, self.shade_rows):
+            digest.update(column.tobytes())
+        digest.update("\0".join(self.categories).encode('utf-8'))
+        return digest.hexdigest()[:16]
+    
+    def row_of(self, shade: dict) -> int:
+        """Index row of a shade returned by match"""
+        return self.rows_by_shade[id(shade)]
+    
+    def match(self, row: int, delta_e: Optional[float]) -> Tuple[dict, dict, Optional[float]]:
+        """(product, shade, delta_e) of an index row"""
+        product = self.products[self.product_rows[row]]
+        return product, product['shades'][self.shade_rows[row]], delta_e
+    
+    def query(self, user_lab: dict, category: str, k: int) -> List[Tuple[dict, dict, float]]:
+        """Closest k (product, shade, delta_e) of a category to one L*a*b* color"""
+        return self.query_batch(np.array([[user_lab['l'], user_lab['a'], user_lab['b']]]), category, k)[0]
+    
+    def query_batch(self, user_labs: np.ndarray, category: str, k: int) -> List[List[Tuple[dict, dict, float]]]:
+        """
+        Closest k (product, shade, delta_e) of a category for each row of an (N, 3) L*a*b* array
+        
+        All colors are scored against the category's shades in one matrix
+        operation. Ties keep catalog order. CIE94 is undefined for a colorless
+        (zero chroma) query, which gets no matches.
+        """
+        user_labs = np.asarray(user_labs, dtype=np.float64).reshape((-1, 3))
+        rows = self.category_rows.get(category)
+        if rows is None or len(rows) == 0:
+            return [[] for _ in user_labs]
+        
+        distances = ColorUtils.round_array(ColorUtils.delta_e_cie94_matrix(user_labs, self.labs[rows]))
+        order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        colorless = np.hypot(user_labs[:, 1], user_labs[:, 2]) == 0
+        
+        results = []
+        for user_row, columns in enumerate(order):
+            if colorless[user_row]:
+                results.append([])
+                continue
+            results.append([self.match(rows[column], float(distances[user_row, column])) for column in columns])
+        return results
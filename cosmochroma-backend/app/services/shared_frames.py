@@ -0,0 +1,289 @@
+import math
+import os
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional, Tuple
+import numpy as np
+from PIL import Image
+from app.services.image_processor import ImageProcessor
+from app.services.color_utils import ColorUtils
+from app.services.quality_gate import QualityGate
+from app.services.quality_tiers import QUALITY_TIERS, QualityTier
+from app.services.selfie_cache import CacheProbe
+from app.utils.deadline import RequestDeadline
+from app.utils.logger import app_logger
+from app.utils.lazy_import import lazy_import
+from app.utils.metrics import metrics
+from app.utils.error_handlers import DeadlineExceededException, InvalidImageException, ImageProcessingException
+from config import settings
+
+cv2 = lazy_import("cv2")
+
+# Where POSIX shared memory segments live on Linux (64MB by default in Docker)
+SHM_PATH = "/dev/shm"
+
+def shm_available_bytes() -> Optional[int]:
+    """Free space for shared memory segments, or None where it cannot be checked"""
+    try:
+        stats = os.statvfs(SHM_PATH)
+    except (OSError, AttributeError):
+        return None
+    return stats.f_bavail * stats.f_frsize
+
+class SharedFrameRing:
+    """Fixed set of reusable shared-memory slots for decoded frames"""
+    
+    def __init__(self, slots: int, slot_bytes: int):
+        self.slot_bytes = slot_bytes
+        self.segments = [shared_memory.SharedMemory(create=True, size=slot_bytes) for _ in range(slots)]
+        self.free = queue.Queue()
+        for index in range(slots):
+            self.free.put(index)
+    
+    def acquire(self, timeout: float = None) -> Optional[int]:
+        """Take a free slot, waiting up to timeout seconds for one if all are in use (None on timeout)"""
+        try:
+            return self.free.get(timeout=timeout)
+        except queue.Empty:
+            return None
+    
+    def release(self, slot: int):
+        self.free.put(slot)
+    
+    def view(self, slot: int, shape: tuple) -> Optional[np.ndarray]:
+        """uint8 array of the given shape backed by a slot (None if it does not fit)"""
+        if int(np.prod(shape)) > self.slot_bytes:
+            return None
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.segments[slot].buf)
+    
+    def name(self, slot: int) -> str:
+        return self.segments[slot].name
+    
+    def close(self):
+        """Close and unlink every segment"""
+        for segment in self.segments:
+            try:
+                segment.close()
+                segment.unlink()
+            except (FileNotFoundError, BufferError):
+                pass
+        self.segments = []
+
+# Per-process state of pool workers
+_worker_state = {}
+
+def _init_worker(opencv_threads: int):
+    """Build the image stages once per worker process"""
+    cv2.setNumThreads(opencv_threads)
+    _worker_state['image_processor'] = ImageProcessor()
+    _worker_state['color_utils'] = ColorUtils()
+    _worker_state['segments'] = {}
+
+def _attach_segment(name: str) -> shared_memory.SharedMemory:
+    """Attach to a parent-owned segment without registering it for cleanup here"""
+    segments = _worker_state['segments']
+    if name not in segments:
+        try:
+            segments[name] = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python < 3.13 registers attached segments with the (shared)
+            # resource tracker, which would unlink them when this worker exits
+            register = resource_tracker.register
+            resource_tracker.register = lambda *args, **kwargs: None
+            try:
+                segments[name] = shared_memory.SharedMemory(name=name)
+            finally:
+                resource_tracker.register = register
+    return segments[name]
+
+def _extract_from_shared(name: str, shape: tuple, tier_name: str,
+                         face_coords: dict = None) -> Tuple[dict, Tuple[int, int, int]]:
+    """Detect the face (unless given) and extract the skin color of a frame stored in shared memory"""
+    segment = _attach_segment(name)
+    image = np.ndarray(shape, dtype=np.uint8, buffer=segment.buf)
+    tier = QUALITY_TIERS[tier_name]
+    try:
+        image_processor = _worker_state['image_processor']
+        if face_coords is None:
+            face_coords = image_processor.detect_face(image, **tier.detector_params())
+        skin_region = image_processor.extract_skin_region(image, face_coords)
+        rgb = _worker_state['color_utils'].extract_dominant_color(skin_region, tier.estimator)
+        del skin_region
+        return face_coords, rgb
+    finally:
+        del image
+
+class SharedFrameProcessPool:
+    """Run detection and color extraction in worker processes via shared-memory frames"""
+    
+    def __init__(self, image_processor: ImageProcessor, workers: int, opencv_threads: int = 1,
+                 quality_gate: Optional[QualityGate] = None):
+        self.image_processor = image_processor
+        self.quality_gate = quality_gate
+        self.workers = workers
+        self.opencv_threads = opencv_threads
+        self.slots = settings.SHARED_FRAME_SLOTS or workers * 2
+        self.slot_bytes = settings.SHARED_FRAME_SLOT_PIXELS * 3
+        self.ring = None
+        self.pool = None
+        self.owner_pid = None
+        self._lock = threading.Lock()
+        self.app_logger = app_logger
+    
+    def start(self):
+        """Create the pool and segments for this process (idempotent)"""
+        with self._lock:
+            # A forked copy must not reuse its parent's pool or segments
+            if self.owner_pid == os.getpid() and self.pool is not None:
+                return
+            self.owner_pid = os.getpid()
+            self._fit_shm()
+            self.ring = SharedFrameRing(self.slots, self.slot_bytes)
+            self._start_pool()
+            self.app_logger.info(
+                f"Started {self.workers} analysis processes with {self.slots} shared frame slots "
+                f"of {self.slot_bytes / 1024 / 1024:.0f}MB"
+            )
+    
+    def _fit_shm(self):
+        """
+        Shrink the slots to the free shared memory
+        
+        Segments are sparse files, so creating more than /dev/shm holds
+        succeeds and the worker crashes (SIGBUS) when a frame is written.
+        Frames that do not fit the smaller slots are processed in the calling
+        thread instead.
+        """
+        available = shm_available_bytes()
+        if available is None or self.slots * self.slot_bytes <= available:
+            return
+        fitted = available // self.slots
+        self.app_logger.warning(
+            f"{SHM_PATH} has {available / 1024 / 1024:.0f}MB free, less than {self.slots} shared frame slots of "
+            f"{self.slot_bytes / 1024 / 1024:.0f}MB; shrinking slots to {fitted / 1024 / 1024:.0f}MB "
+            f"(raise shm_size or lower SHARED_FRAME_SLOT_PIXELS)"
+        )
+        self.slot_bytes = fitted
+    
+    def _start_pool(self):
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.opencv_threads,)
+        )
+    
+    def _restart_pool(self, broken_pool: ProcessPoolExecutor):
+        """Replace a pool whose worker died; the parent-owned segments survive"""
+        with self._lock:
+            if self.pool is broken_pool:
+                self.app_logger.error("Analysis worker process died; restarting process pool")
+                metrics.inc("process_pool_restarts_total")
+                broken_pool.shutdown(wait=False, cancel_futures=True)
+                self._start_pool()
+    
+    def extract_skin_color(self, image: Image.Image, tier: QualityTier, deadline: RequestDeadline = None,
+                           cache_probe: CacheProbe = None) -> Tuple[int, int, int]:
+        """
+        Decode an opened image into a shared slot and run the image stages in a worker process
+        
+        Waits for a slot and for the worker no longer than the deadline. A slot
+        whose worker is still busy when the deadline passes is only reused once
+        the worker lets go of it. cache_probe, if given, is looked up with the
+        frame's thumbnail and may supply the color or the face box.
+        """
+        if self.pool is None or self.owner_pid != os.getpid():
+            self.start()
+        deadline = deadline or RequestDeadline.unbounded()
+        
+        slot = self.ring.acquire(self._timeout(deadline))
+        if slot is None:
+            deadline.check('detect')
+            raise DeadlineExceededException("No shared frame slot became free before the deadline")
+        release = True
+        try:
+            shape = None
+            
+            def allocate(frame_shape):
+                nonlocal shape
+                view = self.ring.view(slot, frame_shape)
+                if view is not None:
+                    shape = frame_shape
+                return view
+            
+            image = self.image_processor.decode_image(image, allocate=allocate)
+            if not self.image_processor.validate_image(image):
+                raise InvalidImageException("Invalid image format or corrupted data")
+            
+            thumbnail = None
+            if self.quality_gate is not None or cache_probe is not None:
+                thumbnail = self.image_processor.make_thumbnail(image, settings.QUALITY_THUMBNAIL_SIZE)
+            
+            face_coords = None
+            if cache_probe is not None:
+                cached = cache_probe.lookup(thumbnail)
+                if cached is not None:
+                    if cached.rgb is not None:
+                        return cached.rgb
+                    face_coords = cached.face_coords(image.shape)
+            
+            # Cheap enough to run here, saving a round trip for rejected images
+            if self.quality_gate is not None:
+                self.quality_gate.check(image, thumbnail)
+            
+            frame_shape = image.shape
+            if shape is None:
+                # Larger than a slot: process in this thread instead
+                metrics.inc("shared_frame_overflows_total")
+                if face_coords is None:
+                    face_coords = self.image_processor.detect_face(image, **tier.detector_params())
+                skin_region = self.image_processor.extract_skin_region(image, face_coords)
+                rgb = ColorUtils.extract_dominant_color(skin_region, tier.estimator)
+                if cache_probe is not None:
+                    cache_probe.store(face_coords, frame_shape, rgb)
+                return rgb
+            del image
+            
+            pool = self.pool
+            deadline.check('detect')
+            future = pool.submit(_extract_from_shared, self.ring.name(slot), shape, tier.name, face_coords)
+            try:
+                face_coords, rgb = future.result(timeout=self._timeout(deadline))
+            except BrokenProcessPool:
+                self._restart_pool(pool)
+                raise ImageProcessingException("Analysis worker failed; please retry")
+            except FutureTimeoutError:
+                if not future.cancel():
+                    # The worker still reads the slot; hand it back when it is done
+                    release = False
+                    future.add_done_callback(lambda _: self.ring.release(slot))
+                metrics.inc("shared_frame_timeouts_total")
+                deadline.check('estimate')
+                raise DeadlineExceededException("Analysis worker did not finish before the deadline")
+            if cache_probe is not None:
+                cache_probe.store(face_coords, frame_shape, rgb)
+            return rgb
+        finally:
+            if release:
+                self.ring.release(slot)
+    
+    @staticmethod
+    def _timeout(deadline: RequestDeadline) -> Optional[float]:
+        remaining = deadline.remaining()
+        return None if math.isinf(remaining) else remaining
+    
+    def shutdown(self):
+        """Stop the workers and unlink all segments"""
+        with self._lock:
+            if self.owner_pid != os.getpid():
+                return
+            if self.pool is not None:
+                self.pool.shutdown(wait=True, cancel_futures=True)
+                self.pool = None
+            if self.ring is not None:
+                self.ring.close()
+                self.ring = None
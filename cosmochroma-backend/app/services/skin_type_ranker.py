@@ -0,0 +1,133 @@
+import json
+import numpy as np
+from pathlib import Path
+from typing import List
+from app.schemas.response_models import SkinTypeEnum
+from app.services.shade_index import ShadeIndex
+from app.utils.logger import app_logger
+from config import settings
+
+# Columns of the feature matrix: product flags, one-hot finish, and SPF
+FLAG_FEATURES = ['long_wear', 'hydrating', 'hypoallergenic']
+FINISH_FEATURES = ['matte', 'dewy', 'satin']
+FEATURES = FLAG_FEATURES + FINISH_FEATURES + ['spf']
+
+# SPF at which the spf feature saturates to 1
+SPF_SCALE = 50.0
+
+class SkinTypeRanker:
+    """
+    Re-ranks matched shades by the product attributes that suit a skin type
+    
+    Product attributes are compiled into one numeric row per catalog shade at
+    load. They come from the ingested retailer feeds only; an attribute a
+    product does not carry is left at 0, so it neither helps nor hurts. A
+    skin type's weights (in Delta-E units, read from a JSON file) turn the
+    attributes into a bonus, and candidates are ordered by Delta-E minus that
+    bonus in one vectorized pass.
+    """
+    
+    def __init__(self, shade_index: ShadeIndex, weights: dict):
+        self.shade_index = shade_index
+        self.features = self.feature_matrix(shade_index)
+        self.weights = weights  # Skin type -> weight vector over FEATURES
+        self.zero_weights = np.zeros(len(FEATURES), dtype=np.float32)
+        self.app_logger = app_logger
+    
+    @staticmethod
+    def default_path() -> Path:
+        if settings.SKIN_TYPE_WEIGHTS_PATH:
+            return Path(settings.SKIN_TYPE_WEIGHTS_PATH)
+        return Path(__file__).parent.parent / "data" / "skin_type_weights.json"
+    
+    @staticmethod
+    def feature_matrix(shade_index: ShadeIndex) -> np.ndarray:
+        """(shades, FEATURES) attribute values of every indexed shade"""
+        products = shade_index.products
+        product_features = np.zeros((len(products), len(FEATURES)), dtype=np.float32)
+        for p, product in enumerate(products):
+            for i, flag in enumerate(FLAG_FEATURES):
+                product_features[p, i] = 1.0 if product.get(flag) else 0.0
+            product_features[p, -1] = min(float(product.get('spf') or 0) / SPF_SCALE, 1.0)
+        
+        features = product_features[shade_index.product_rows]
+        for row, (p, s) in enumerate(zip(shade_index.product_rows.tolist(), shade_index.shade_rows.tolist())):
+            product = products[p]
+            finish = (product['shades'][s].get('finish') or product.get('finish') or '').casefold()
+            if finish in FINISH_FEATURES:
+                features[row, len(FLAG_FEATURES) + FINISH_FEATURES.index(finish)] = 1.0
+        return features
+    
+    @staticmethod
+    def load_weights(path: Path = None) -> dict:
+        """Weight vectors per skin type from a {skin type: {feature: weight}} JSON file"""
+        path = Path(path or SkinTypeRanker.default_path())
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        
+        skin_types = [skin_type.value for skin_type in SkinTypeEnum]
+        weights = {}
+        for skin_type, feature_weights in data.items():
+            if skin_type not in skin_types:
+                raise ValueError(f"{path}: unknown skin type '{skin_type}'")
+            vector = np.zeros(len(FEATURES), dtype=np.float32)
+            for feature, weight in feature_weights.items():
+                if feature not in FEATURES:
+                    raise ValueError(f"{path}: unknown feature '{feature}' for {skin_type} (expected one of {FEATURES})")
+                if isinstance(weight, bool) or not isinstance(weight, (int, float)):
+                    raise ValueError(f"{path}: weight of {skin_type}.{feature} must be a number")
+                vector[FEATURES.index(feature)] = weight
+            weights[skin_type] = vector
+        return weights
+    
+    @classmethod
+    def open(cls, shade_index: ShadeIndex, path: Path = None) -> "SkinTypeRanker":
+        ranker = cls(shade_index, cls.load_weights(path))
+        app_logger.info(f"Loaded skin type weights for {sorted(ranker.weights)} over {len(FEATURES)} features")
+        return ranker
+    
+    def adjusts(self, skin_types: List[str]) -> bool:
+        """Whether any of the skin types has a non-zero weight"""
+        return any(np.any(self.weights.get(skin_type, self.zero_weights)) for skin_type in skin_types)
+    
+    def rerank(self, matches: List[list], skin_types: List[str], count: int) -> List[list]:
+        """
+        Top count of each match list by Delta-E minus its skin type's attribute bonus
+        
+        Each list holds (product, shade, delta_e[, palette]) tuples, closest
+        first. Harmony palettes keep the places they held: each place goes to
+        the best scored shade of the same palette.
+        """
+        flat = [match for candidates in matches for match in candidates]
+        if not flat:
+            return [[] for _ in matches]
+        
+        # One scoring pass over every candidate of every list
+        lengths = [len(candidates) for candidates in matches]
+        rows = np.array([self.shade_index.row_of(match[1]) for match in flat], dtype=np.int64)
+        delta_e = np.array([match[2] for match in flat], dtype=np.float64)
+        weights = np.stack([self.weights.get(skin_type, self.zero_weights) for skin_type in skin_types])
+        owners = np.repeat(np.arange(len(matches)), lengths)
+        scores = delta_e - np.einsum('ij,ij->i', self.features[rows], weights[owners])
+        
+        # Rank within each (list, palette) group, ties kept in the original order
+        group_keys = [(owner, match[3] if len(match) > 3 else None) for owner, match in zip(owners.tolist(), flat)]
+        groups = {key: i for i, key in enumerate(dict.fromkeys(group_keys))}
+        group_ids = np.array([groups[key] for key in group_keys], dtype=np.int64)
+        order = np.lexsort((np.arange(len(flat)), scores, group_ids))
+        ranked = {}
+        for position in order.tolist():
+            ranked.setdefault(group_ids[position], []).append(flat[position])
+        
+        results = []
+        start = 0
+        for length in lengths:
+            taken = {}
+            chosen = []
+            for position in range(start, start + min(count, length)):
+                group = group_ids[position]
+                chosen.append(ranked[group][taken.get(group, 0)])
+                taken[group] = taken.get(group, 0) + 1
+            results.append(chosen)
+            start += length
+        return results
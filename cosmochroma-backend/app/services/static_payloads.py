@@ -0,0 +1,169 @@
+import gzip
+import hashlib
+import json
+import threading
+from typing import Dict, List, Optional
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from app.schemas.response_models import SkinTypeEnum
+from app.services.product_recommender import ProductRecommender
+from app.services.routine_builder import RoutineBuilder
+from app.utils.error_handlers import ResourceNotFoundException
+from app.utils.logger import app_logger
+from app.utils.metrics import metrics
+from config import settings
+
+# brotli is optional; without it payloads are precompressed with gzip only
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preferred order when a client accepts several encodings
+ENCODING_PREFERENCE = ['br', 'gzip', 'identity']
+
+class StaticPayload:
+    """
+    A JSON body serialized and compressed once, served with strong ETags
+    
+    Every encoding is a separate representation with its own ETag
+    ("<digest>", "<digest>-gzip", "<digest>-br"). All of them validate
+    If-None-Match, since they carry the same content.
+    """
+    
+    def __init__(self, content):
+        body = json.dumps(jsonable_encoder(content), separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        self.digest = hashlib.sha256(body).hexdigest()[:32]
+        self.bodies = {'identity': body}
+        
+        # Keep an encoding only if it actually shrinks the body
+        compressed = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressed['br'] = brotli.compress(body, quality=settings.STATIC_PAYLOAD_BROTLI_QUALITY)
+        for encoding, data in compressed.items():
+            if len(data) < len(body):
+                self.bodies[encoding] = data
+        
+        self.etags = {
+            encoding: f'"{self.digest}"' if encoding == 'identity' else f'"{self.digest}-{encoding}"'
+            for encoding in self.bodies
+        }
+    
+    @property
+    def etag(self) -> str:
+        return self.etags['identity']
+    
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Whether an If-None-Match header names any representation (weak comparison)"""
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        if '*' in tags:
+            return True
+        tags = {tag[2:] if tag.startswith('W/') else tag for tag in tags}
+        return any(etag in tags for etag in self.etags.values())
+    
+    def negotiate(self, accept_encoding: Optional[str]) -> str:
+        """Most preferred encoding the client accepts (identity unless refused)"""
+        accepted = {}
+        for item in (accept_encoding or '').split(','):
+            coding, _, params = item.strip().partition(';')
+            if not coding:
+                continue
+            quality = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            accepted[coding.strip().lower()] = quality
+        
+        wildcard = accepted.get('*')
+        for encoding in ENCODING_PREFERENCE:
+            if encoding not in self.bodies:
+                continue
+            quality = accepted.get(encoding, wildcard)
+            if encoding == 'identity' and quality is None:
+                quality = 1.0
+            if quality:
+                return encoding
+        return 'identity'
+    
+    def response(self, if_none_match: Optional[str], accept_encoding: Optional[str]) -> Response:
+        """200 with the negotiated body, or 304 if the client's copy is current"""
+        encoding = self.negotiate(accept_encoding)
+        headers = {
+            'ETag': self.etags[encoding],
+            'Cache-Control': f"public, max-age={settings.STATIC_PAYLOAD_MAX_AGE}",
+            'Vary': 'Accept-Encoding',
+        }
+        if self.matches(if_none_match):
+            metrics.inc("static_payload_responses_total", status="304")
+            return Response(status_code=304, headers=headers)
+        
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        metrics.inc("static_payload_responses_total", status="200", encoding=encoding)
+        return Response(content=self.bodies[encoding], media_type="application/json", headers=headers)
+
+class StaticPayloads:
+    """
+    Pre-serialized routine and catalog bodies
+    
+    Routines depend only on the skin type and the catalog only on what was
+    loaded at startup, so each payload is built once, on first request.
+    """
+    
+    def __init__(self, routine_builder: RoutineBuilder, product_recommender: ProductRecommender):
+        self.routine_builder = routine_builder
+        self.product_recommender = product_recommender
+        self.categories = list(dict.fromkeys(product['category'] for product in product_recommender.products))
+        self._payloads: Dict[str, StaticPayload] = {}
+        self._lock = threading.Lock()
+        self.app_logger = app_logger
+    
+    def _payload(self, key: str, build) -> StaticPayload:
+        payload = self._payloads.get(key)
+        if payload is None:
+            with self._lock:
+                payload = self._payloads.get(key)
+                if payload is None:
+                    payload = StaticPayload(build())
+                    self._payloads[key] = payload
+                    self.app_logger.info(
+                        f"Built static payload {key}: " +
+                        ", ".join(f"{encoding} {len(body)} bytes" for encoding, body in payload.bodies.items())
+                    )
+        return payload
+    
+    def routines(self, skin_type: str) -> StaticPayload:
+        """Morning, evening and weekly routines of a skin type"""
+        if skin_type not in [value.value for value in SkinTypeEnum]:
+            raise ResourceNotFoundException(f"Unknown skin type '{skin_type}'")
+        return self._payload(f"routines/{skin_type}", lambda: {
+            'skin_type': skin_type,
+            **{
+                f'{routine_type}_routine': routine
+                for routine_type, routine in self.routine_builder.build_all_routines(skin_type).items()
+            }
+        })
+    
+    def catalog(self, category: str = None) -> StaticPayload:
+        """Every product, or the products of one category"""
+        if category is not None and category not in self.categories:
+            raise ResourceNotFoundException(f"Unknown product category '{category}'")
+        return self._payload(f"products/{category or ''}", lambda: self._catalog_content(category))
+    
+    def warm_up(self):
+        """Build every routine payload and the full catalog ahead of the first request"""
+        for skin_type in SkinTypeEnum:
+            self.routines(skin_type.value)
+        self.catalog()
+    
+    def _catalog_content(self, category: Optional[str]) -> dict:
+        products: List[dict] = [
+            product for product in self.product_recommender.products
+            if category is None or product['category'] == category
+        ]
+        return {'categories': [category] if category else self.categories, 'products': products, 'total': len(products)}
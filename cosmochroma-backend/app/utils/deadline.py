@@ -0,0 +1,67 @@
+import math
+import threading
+import time
+from typing import Optional
+from app.utils.metrics import metrics
+from app.utils.error_handlers import (
+    DeadlineExceededException, InvalidParameterException, RequestCancelledException
+)
+from config import settings
+
+# Pipeline stages in execution order; deadlines are checked before each one
+ANALYSIS_STAGES = ['decode', 'detect', 'extract', 'estimate', 'classify', 'recommend', 'routines']
+
+class RequestDeadline:
+    """Time limit and cancellation flag carried by one analysis request"""
+    
+    def __init__(self, timeout: float = None):
+        self.timeout = settings.REQUEST_DEFAULT_TIMEOUT if timeout is None else timeout
+        self.started = time.monotonic()
+        self.expires_at = self.started + self.timeout
+        self._cancelled = threading.Event()
+    
+    @classmethod
+    def from_header(cls, value: Optional[str]) -> "RequestDeadline":
+        """Build a deadline from the client's timeout header (seconds), capped at REQUEST_MAX_TIMEOUT"""
+        if not value:
+            return cls()
+        try:
+            timeout = float(value)
+        except ValueError:
+            timeout = -1
+        if not timeout > 0:
+            raise InvalidParameterException(f"{settings.REQUEST_TIMEOUT_HEADER} must be a positive number of seconds")
+        return cls(min(timeout, settings.REQUEST_MAX_TIMEOUT))
+    
+    @classmethod
+    def unbounded(cls) -> "RequestDeadline":
+        """A deadline that never expires (internal callers, warm-up)"""
+        return cls(math.inf)
+    
+    def cancel(self):
+        """Mark the request as no longer wanted (e.g. the client disconnected)"""
+        self._cancelled.set()
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+    
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+    
+    def check(self, stage: str):
+        """Abandon the request before a stage if it can no longer be delivered"""
+        if self.cancelled:
+            self._abandon("disconnect", stage)
+            raise RequestCancelledException(f"Client went away before the {stage} stage")
+        if time.monotonic() >= self.expires_at:
+            self._abandon("deadline", stage)
+            raise DeadlineExceededException(
+                f"Analysis did not finish within {self.timeout:g}s (abandoned before the {stage} stage)"
+            )
+    
+    def _abandon(self, reason: str, stage: str):
+        skipped = len(ANALYSIS_STAGES) - ANALYSIS_STAGES.index(stage) if stage in ANALYSIS_STAGES else 0
+        metrics.inc("analyses_abandoned_total", reason=reason, stage=stage)
+        metrics.inc("analysis_stages_skipped_total", skipped, reason=reason)
+        metrics.observe("analysis_abandoned_after_seconds", time.monotonic() - self.started, reason=reason)
@@ -18,6 +18,11 @@ class FaceDetectionException(CosmoChromaException):
     def __init__(self, message: str = "Could not detect face in image"):
         super().__init__(message, "FACE_NOT_DETECTED")
 
+class ImageQualityException(CosmoChromaException):
+    """Raised when an image is too poor to analyze (code names the reason)"""
+    def __init__(self, message: str = "Image quality is too low for analysis", code: str = "IMAGE_QUALITY_TOO_LOW"):
+        super().__init__(message, code)
+
 class SkinAnalysisException(CosmoChromaException):
     """Raised when skin analysis fails"""
     def __init__(self, message: str = "Error during skin analysis"):
@@ -28,16 +33,69 @@ class ImageProcessingException(CosmoChromaException):
     def __init__(self, message: str = "Error processing image"):
         super().__init__(message, "IMAGE_PROCESSING_FAILED")
 
+class InvalidColorException(CosmoChromaException):
+    """Raised when a supplied color value is invalid"""
+    def __init__(self, message: str = "Invalid color value"):
+        super().__init__(message, "INVALID_COLOR")
+
+class InvalidParameterException(CosmoChromaException):
+    """Raised when a request parameter is invalid"""
+    def __init__(self, message: str = "Invalid request parameter"):
+        super().__init__(message, "INVALID_PARAMETER")
+
+class ShadeNotFoundException(CosmoChromaException):
+    """Raised when a shade id is not in the catalog"""
+    def __init__(self, message: str = "Shade not found"):
+        super().__init__(message, "SHADE_NOT_FOUND")
+
+class ResourceNotFoundException(CosmoChromaException):
+    """Raised when a requested skin type or product category does not exist"""
+    def __init__(self, message: str = "Resource not found"):
+        super().__init__(message, "NOT_FOUND")
+
+class ImageTooLargeException(CosmoChromaException):
+    """Raised when an image decodes to more pixels than allowed"""
+    def __init__(self, message: str = "Image dimensions exceed the pixel limit"):
+        super().__init__(message, "IMAGE_TOO_LARGE")
+
+class ServerBusyException(CosmoChromaException):
+    """Raised when the server cannot admit more work right now"""
+    def __init__(self, message: str = "Server is busy, please retry shortly"):
+        super().__init__(message, "SERVER_BUSY")
+
+class DeadlineExceededException(CosmoChromaException):
+    """Raised when a request's deadline passes before analysis completes"""
+    def __init__(self, message: str = "Analysis did not finish in time"):
+        super().__init__(message, "DEADLINE_EXCEEDED")
+
+class RequestCancelledException(CosmoChromaException):
+    """Raised when the client goes away before analysis completes"""
+    def __init__(self, message: str = "Request cancelled by client"):
+        super().__init__(message, "REQUEST_CANCELLED")
+
 def exception_handler(exc: CosmoChromaException):
     """Handle custom exceptions and return HTTP response"""
     app_logger.error(f"{exc.code}: {exc.message}")
     
     status_map = {
         "INVALID_IMAGE": status.HTTP_400_BAD_REQUEST,
-        "FACE_NOT_DETECTED": status.HTTP_422_UNPROCESSABLE_ENTITY,
+        "INVALID_COLOR": status.HTTP_400_BAD_REQUEST,
+        "INVALID_PARAMETER": status.HTTP_400_BAD_REQUEST,
+        "SHADE_NOT_FOUND": status.HTTP_404_NOT_FOUND,
+        "NOT_FOUND": status.HTTP_404_NOT_FOUND,
+        "IMAGE_TOO_LARGE": 413,  # Literal codes: the 413/422 constant names are deprecated
+        "FACE_NOT_DETECTED": 422,
+        "IMAGE_TOO_DARK": 422,
+        "IMAGE_OVEREXPOSED": 422,
+        "IMAGE_TOO_BLURRY": 422,
+        "NO_SKIN_DETECTED": 422,
+        "IMAGE_QUALITY_TOO_LOW": 422,
         "ANALYSIS_FAILED": status.HTTP_500_INTERNAL_SERVER_ERROR,
         "IMAGE_PROCESSING_FAILED": status.HTTP_500_INTERNAL_SERVER_ERROR,
         "INTERNAL_ERROR": status.HTTP_500_INTERNAL_SERVER_ERROR,
+        "SERVER_BUSY": status.HTTP_503_SERVICE_UNAVAILABLE,
+        "DEADLINE_EXCEEDED": status.HTTP_504_GATEWAY_TIMEOUT,
+        "REQUEST_CANCELLED": 499,  # Client closed request (nginx convention)
     }
     
     http_status = status_map.get(exc.code, status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,59 @@
+import threading
+import time
+from contextlib import contextmanager
+from app.utils.logger import app_logger
+from app.utils.metrics import metrics
+from app.utils.error_handlers import ServerBusyException
+from config import settings
+
+class ImageMemoryBudget:
+    """Admit image decodes only while resident image memory stays under a cap"""
+    
+    def __init__(self, budget_bytes: int = None, wait_timeout: float = None):
+        self.budget_bytes = budget_bytes or settings.IMAGE_MEMORY_BUDGET
+        self.wait_timeout = settings.IMAGE_MEMORY_WAIT_TIMEOUT if wait_timeout is None else wait_timeout
+        self.resident_bytes = 0
+        self.peak_bytes = 0
+        self._condition = threading.Condition()
+        self.app_logger = app_logger
+    
+    def _fits(self, nbytes: int) -> bool:
+        # An image larger than the whole budget is still admitted on its own
+        return self.resident_bytes == 0 or self.resident_bytes + nbytes <= self.budget_bytes
+    
+    @contextmanager
+    def reserve(self, nbytes: int, timeout: float = None):
+        """Hold nbytes of the budget while decoding, waiting (at most timeout) if it is exhausted"""
+        timeout = self.wait_timeout if timeout is None else min(timeout, self.wait_timeout)
+        with self._condition:
+            if not self._fits(nbytes):
+                metrics.inc("image_memory_deferrals_total")
+                started = time.perf_counter()
+                if not self._condition.wait_for(lambda: self._fits(nbytes), timeout=timeout):
+                    metrics.inc("image_memory_rejections_total")
+                    self.app_logger.warning(
+                        f"Image memory budget exhausted ({self.resident_bytes} of {self.budget_bytes} bytes), "
+                        f"rejecting a {nbytes} byte decode"
+                    )
+                    raise ServerBusyException("Server is busy processing other images, please retry shortly")
+                metrics.observe("image_memory_wait_seconds", time.perf_counter() - started)
+            
+            self.resident_bytes += nbytes
+            self.peak_bytes = max(self.peak_bytes, self.resident_bytes)
+            self._export()
+        
+        metrics.observe("image_request_peak_bytes", nbytes)
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.resident_bytes -= nbytes
+                self._export()
+                self._condition.notify_all()
+    
+    def _export(self):
+        metrics.set_gauge("image_memory_resident_bytes", self.resident_bytes)
+        metrics.set_gauge("image_memory_peak_bytes", self.peak_bytes)
+
+# Per-process image memory budget
+image_memory = ImageMemoryBudget()
@@ -0,0 +1,32 @@
+import importlib
+import threading
+
+class LazyModule:
+    """Module proxy that defers the real import until first attribute access"""
+    
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+    
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                self._module = importlib.import_module(self._name)
+        return self._module
+    
+    @property
+    def is_loaded(self) -> bool:
+        return self._module is not None
+    
+    def __getattr__(self, attr):
+        module = self._module if self._module is not None else self._load()
+        return getattr(module, attr)
+    
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+def lazy_import(name: str) -> LazyModule:
+    """Return a proxy for a heavy module (e.g. cv2) that is imported on first use"""
+    return LazyModule(name)
@@ -0,0 +1,83 @@
+import threading
+from collections import deque
+from typing import Dict, Tuple
+
+class MetricsRegistry:
+    """Thread-safe in-process counters, gauges and timing summaries"""
+    
+    def __init__(self, sample_window: int = 1024):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._summaries = {}
+        self._sample_window = sample_window
+    
+    @staticmethod
+    def _key(name: str, labels: dict) -> Tuple[str, tuple]:
+        return name, tuple(sorted(labels.items()))
+    
+    def inc(self, name: str, value: float = 1, **labels):
+        """Increment a counter"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def set_gauge(self, name: str, value: float, **labels):
+        """Set a gauge to its current value"""
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+    
+    def observe(self, name: str, value: float, **labels):
+        """Record one sample of a summary (latency, size, ...)"""
+        key = self._key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = {'count': 0, 'sum': 0.0, 'max': value, 'samples': deque(maxlen=self._sample_window)}
+                self._summaries[key] = summary
+            summary['count'] += 1
+            summary['sum'] += value
+            summary['max'] = max(summary['max'], value)
+            summary['samples'].append(value)
+    
+    def snapshot(self) -> Dict[str, list]:
+        """Return all metrics as JSON-serializable data"""
+        def fmt(key):
+            name, labels = key
+            return {'name': name, 'labels': dict(labels)}
+        
+        with self._lock:
+            counters = [{**fmt(k), 'value': v} for k, v in self._counters.items()]
+            gauges = [{**fmt(k), 'value': v} for k, v in self._gauges.items()]
+            summaries = []
+            for k, s in self._summaries.items():
+                samples = sorted(s['samples'])
+                summaries.append({
+                    **fmt(k),
+                    'count': s['count'],
+                    'sum': round(s['sum'], 6),
+                    'max': s['max'],
+                    'p50': samples[int(0.50 * (len(samples) - 1))],
+                    'p95': samples[int(0.95 * (len(samples) - 1))],
+                })
+        return {'counters': counters, 'gauges': gauges, 'summaries': summaries}
+    
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        def series(name, labels, suffix=''):
+            if not labels:
+                return f"cosmochroma_{name}{suffix}"
+            label_str = ','.join(f'{k}="{v}"' for k, v in labels.items())
+            return f"cosmochroma_{name}{suffix}{{{label_str}}}"
+        
+        snapshot = self.snapshot()
+        lines = []
+        for metric in snapshot['counters'] + snapshot['gauges']:
+            lines.append(f"{series(metric['name'], metric['labels'])} {metric['value']}")
+        for metric in snapshot['summaries']:
+            for field in ('count', 'sum', 'max', 'p50', 'p95'):
+                lines.append(f"{series(metric['name'], metric['labels'], '_' + field)} {metric[field]}")
+        return '\n'.join(lines) + '\n'
+
+# Process-wide metrics registry
+metrics = MetricsRegistry()
@@ -0,0 +1,99 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.utils.logger import app_logger
+from app.utils.lazy_import import lazy_import
+from app.utils.metrics import metrics
+from config import settings
+
+cv2 = lazy_import("cv2")
+
+# Environment variables read by the common BLAS/OpenMP runtimes at import time
+BLAS_THREAD_ENV_VARS = [
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+]
+
+def detect_cpu_cores() -> int:
+    """Number of cores this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+class ResourceGovernor:
+    """Split the host's cores into one consistent thread budget per worker process"""
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+        self.app_logger = app_logger
+        self.configure()
+
+    def configure(self, workers: int = None):
+        """Compute the per-worker budget (call before the executor is first used)"""
+        self.cpu_cores = settings.CPU_CORES or detect_cpu_cores()
+        self.workers = workers or settings.SERVER_WORKERS or self.cpu_cores
+        self.thread_budget = settings.THREADS_PER_WORKER or max(1, self.cpu_cores // self.workers)
+
+        # Executor threads share the budget; each gets an equal slice for
+        # OpenCV/BLAS so the total never exceeds it
+        self.executor_threads = settings.PIPELINE_MAX_WORKERS or self.thread_budget
+        inner_threads = max(1, self.thread_budget // self.executor_threads)
+        self.opencv_threads = settings.OPENCV_THREADS or inner_threads
+        self.blas_threads = inner_threads
+
+    def apply_environment(self):
+        """Limit BLAS/OpenMP pools; only effective before numpy is imported"""
+        for var in BLAS_THREAD_ENV_VARS:
+            os.environ.setdefault(var, str(self.blas_threads))
+
+    def apply_runtime(self):
+        """Apply the budget to already-loaded libraries in this process"""
+        cv2.setNumThreads(self.opencv_threads)
+
+        # BLAS pools already started ignore the environment limits; threadpoolctl resizes them
+        try:
+            from threadpoolctl import threadpool_limits
+        except ImportError:
+            self.app_logger.warning(
+                "threadpoolctl is not installed; BLAS/OpenMP pools are only limited through the environment, "
+                "which does not reach pools started before it was set (pip install threadpoolctl)"
+            )
+            return
+        threadpool_limits(self.blas_threads)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """The pipeline executor, sized to this worker's budget"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.executor_threads,
+                        thread_name_prefix="analysis"
+                    )
+        return self._executor
+
+    def report(self) -> dict:
+        """Effective thread configuration"""
+        return {
+            'cpu_cores': self.cpu_cores,
+            'workers': self.workers,
+            'thread_budget': self.thread_budget,
+            'executor_threads': self.executor_threads,
+            'opencv_threads': self.opencv_threads,
+            'blas_threads': self.blas_threads,
+        }
+
+    def log_and_export(self):
+        """Log the effective configuration and publish it as metrics"""
+        config = self.report()
+        for name, value in config.items():
+            metrics.set_gauge(f"resource_{name}", value)
+        self.app_logger.info(f"Resource budget: {config}")
+
+# Process-wide resource governor
+resource_governor = ResourceGovernor()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+"""Precompute the recommendation grid for the current catalog and report its quantization error"""
+import json
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import settings
+from app.services.product_recommender import ProductRecommender
+from app.services.recommendation_grid import RecommendationGrid, candidate_width
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Build the precomputed recommendation grid")
+    parser.add_argument("--output", default=None, help="Grid .npy path (default: RECOMMENDATION_GRID_PATH)")
+    parser.add_argument("--step", type=float, default=settings.RECOMMENDATION_GRID_STEP, help="Cell size in L*a*b* units")
+    parser.add_argument("--candidates", type=int, default=candidate_width(settings.RECOMMENDATION_GRID_CANDIDATES),
+                        help="Shades stored per cell and category (default: RECOMMENDATION_GRID_CANDIDATES "
+                             "x SKIN_TYPE_CANDIDATE_POOL with skin type ranking)")
+    parser.add_argument("--top-k", type=int, default=5, help="Ranking depth the error report checks")
+    parser.add_argument("--samples", type=int, default=20000, help="Colors sampled for the error report")
+    args = parser.parse_args()
+    if args.top_k > args.candidates:
+        parser.error("--top-k cannot exceed --candidates (larger queries bypass the grid)")
+    
+    # Index the catalog without loading (or building) the current grid
+    settings.RECOMMENDATION_GRID_ENABLED = False
+    shade_index = ProductRecommender().shade_index
+    grid = RecommendationGrid.build(shade_index, step=args.step, k=args.candidates)
+    grid.save(args.output)
+    
+    report = grid.error_report(k=args.top_k, samples=args.samples)
+    print(json.dumps(report, indent=2))
+    
+    # Non-zero exit if re-ranking cannot recover the exact top k everywhere
+    sys.exit(1 if any(stats['reranked_mismatch'] for stats in report.values()) else 0)
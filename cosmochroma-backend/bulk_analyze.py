@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+"""Offline bulk analysis: analyze a directory of images on all cores into a resumable CSV/Parquet file"""
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import settings
+from app.utils.resource_governor import resource_governor
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Output columns in file order, with fixed types so every Parquet part shares one schema
+COLUMNS = {
+    'path': 'string', 'status': 'string', 'error': 'string', 'seconds': 'float64',
+    'face_x': 'Int64', 'face_y': 'Int64', 'face_width': 'Int64', 'face_height': 'Int64',
+    'r': 'Int64', 'g': 'Int64', 'b': 'Int64', 'hex': 'string',
+    'h': 'float64', 's': 'float64', 'v': 'float64', 'l': 'float64', 'lab_a': 'float64', 'lab_b': 'float64',
+    'brightness': 'float64', 'saturation': 'float64', 'warm_score': 'float64', 'olive_score': 'float64',
+    'undertone': 'string', 'undertone_confidence': 'float64', 'season': 'string', 'season_confidence': 'float64',
+    'skin_type': 'string', 'skin_type_confidence': 'float64',
+}
+
+# Per-process analysis stages, built once by _init_worker
+_worker_state = {}
+
+def _init_worker(tier_name: str, workers: int):
+    """Build the analysis stages once per worker process"""
+    from app.services.image_processor import ImageProcessor
+    from app.services.color_utils import ColorUtils
+    from app.services.quality_gate import QualityGate
+    from app.services.quality_tiers import QUALITY_TIERS
+    from app.models.skin_analyzer import SkinAnalyzer
+    from app.utils.logger import app_logger
+    
+    # Per-image info logs would dominate the run time
+    app_logger.setLevel("WARNING")
+    resource_governor.configure(workers=workers)
+    resource_governor.apply_runtime()
+    
+    image_processor = ImageProcessor()
+    _worker_state['image_processor'] = image_processor
+    _worker_state['color_utils'] = ColorUtils()
+    _worker_state['skin_analyzer'] = SkinAnalyzer()
+    _worker_state['quality_gate'] = QualityGate(image_processor) if settings.QUALITY_GATE_ENABLED else None
+    _worker_state['tier'] = QUALITY_TIERS[tier_name]
+
+def _analyze_file(task: tuple) -> dict:
+    """Analyze one (relative path, bytes) task into an output row"""
+    from app.utils.error_handlers import CosmoChromaException
+    
+    path, content = task
+    row = {'path': path, 'status': 'ok', 'error': None}
+    started = time.perf_counter()
+    try:
+        if content is None:
+            raise OSError("File could not be read")
+        
+        image_processor = _worker_state['image_processor']
+        tier = _worker_state['tier']
+        image = image_processor.decode_image(image_processor.open_image(content, target_pixels=tier.max_pixels))
+        if _worker_state['quality_gate'] is not None:
+            _worker_state['quality_gate'].check(image)
+        
+        face = image_processor.detect_face(image, **tier.detector_params())
+        skin_region = image_processor.extract_skin_region(image, face)
+        r, g, b = _worker_state['color_utils'].extract_dominant_color(skin_region, tier.estimator)
+        analysis = _worker_state['skin_analyzer'].analyze_complete(r, g, b)
+        
+        tone = analysis['skin_tone']
+        row.update({
+            'face_x': face['x'], 'face_y': face['y'], 'face_width': face['width'], 'face_height': face['height'],
+            'r': r, 'g': g, 'b': b, 'hex': tone['hex'],
+            'h': tone['hsv']['h'], 's': tone['hsv']['s'], 'v': tone['hsv']['v'],
+            'l': tone['lab']['l'], 'lab_a': tone['lab']['a'], 'lab_b': tone['lab']['b'],
+            'brightness': tone['brightness'], 'saturation': tone['saturation'],
+            'warm_score': tone['warm_score'], 'olive_score': tone['olive_score'],
+            'undertone': analysis['undertone'].value, 'undertone_confidence': analysis['undertone_confidence'],
+            'season': analysis['season'].value, 'season_confidence': analysis['season_confidence'],
+            'skin_type': analysis['skin_type'].value, 'skin_type_confidence': analysis['skin_type_confidence'],
+        })
+    except CosmoChromaException as e:
+        row.update(status='error', error=e.code)
+    except OSError:
+        row.update(status='error', error='READ_FAILED')
+    except Exception:
+        row.update(status='error', error='ANALYSIS_FAILED')
+    
+    row['seconds'] = round(time.perf_counter() - started, 4)
+    return row
+
+def iter_image_paths(input_dir: str):
+    """Image files under input_dir (relative paths) in a stable, sorted walk order"""
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.relpath(os.path.join(root, name), input_dir)
+
+class PrefetchReader:
+    """Read image files on a background thread, keeping up to depth files buffered ahead of the workers"""
+    
+    _END = object()
+    
+    def __init__(self, input_dir: str, paths, depth: int):
+        self.input_dir = input_dir
+        self.paths = paths
+        self.queue = queue.Queue(maxsize=depth)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._read, name="prefetch-reader", daemon=True)
+    
+    def _read(self):
+        for path in self.paths:
+            if self.stopped.is_set():
+                break
+            try:
+                with open(os.path.join(self.input_dir, path), 'rb') as f:
+                    content = f.read()
+            except OSError:
+                content = None
+            self.queue.put((path, content))
+        self.queue.put(self._END)
+    
+    def __iter__(self):
+        self.thread.start()
+        while True:
+            item = self.queue.get()
+            if item is self._END:
+                return
+            yield item
+    
+    def stop(self):
+        self.stopped.set()
+
+class ResultWriter:
+    """
+    Append result rows to a CSV file or a Parquet dataset directory
+    
+    Rows are written in chunks and each chunk lands atomically (one CSV
+    write, or one Parquet part file renamed into place), so the rows already
+    in the output double as the checkpoint for resuming an interrupted run.
+    """
+    
+    def __init__(self, output: str):
+        self.output = output
+        self.parquet = output.lower().endswith('.parquet')
+    
+    def completed_paths(self) -> set:
+        """Paths already present in the output"""
+        import pandas as pd
+        
+        if not os.path.exists(self.output):
+            return set()
+        if self.parquet:
+            parts = [name for name in os.listdir(self.output) if name.endswith('.parquet')]
+            if not parts:
+                return set()
+            return set(pd.read_parquet(self.output, columns=['path'])['path'])
+        self._truncate_partial_line()
+        return set(pd.read_csv(self.output, usecols=['path'])['path'])
+    
+    def _truncate_partial_line(self):
+        """Drop a line left incomplete by a run killed mid-write, so that image is redone"""
+        with open(self.output, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b'\n':
+                return
+            f.seek(0)
+            content = f.read()
+            f.truncate(content.rfind(b'\n') + 1)
+    
+    def clear(self):
+        if self.parquet and os.path.isdir(self.output):
+            for name in os.listdir(self.output):
+                os.remove(os.path.join(self.output, name))
+        elif os.path.exists(self.output):
+            os.remove(self.output)
+    
+    def write(self, rows: list):
+        import pandas as pd
+        
+        if not rows:
+            return
+        frame = pd.DataFrame(rows, columns=list(COLUMNS)).astype(COLUMNS)
+        if self.parquet:
+            os.makedirs(self.output, exist_ok=True)
+            part = f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet"
+            temporary = os.path.join(self.output, f".{part}.tmp")
+            frame.to_parquet(temporary, index=False)
+            os.replace(temporary, os.path.join(self.output, part))
+        else:
+            header = not os.path.exists(self.output) or os.path.getsize(self.output) == 0
+            with open(self.output, 'a', encoding='utf-8', newline='') as f:
+                f.write(frame.to_csv(index=False, header=header))
+                f.flush()
+                os.fsync(f.fileno())
+
+def run(input_dir: str, output: str, workers: int, tier_name: str = 'full', prefetch: int = None,
+        flush_every: int = 1000, report_interval: float = 10.0, overwrite: bool = False) -> dict:
+    """Analyze every image under input_dir that is not in output yet; returns run totals"""
+    import multiprocessing
+    from app.utils.logger import app_logger
+    
+    writer = ResultWriter(output)
+    if overwrite:
+        writer.clear()
+    completed = writer.completed_paths()
+    if completed:
+        app_logger.info(f"Resuming: {len(completed)} images already in {output}")
+    
+    paths = (path for path in iter_image_paths(input_dir) if path not in completed)
+    reader = PrefetchReader(input_dir, paths, prefetch or workers * 4)
+    
+    totals = {'ok': 0, 'error': 0, 'skipped': len(completed)}
+    pending = []
+    started = last_report = time.perf_counter()
+    
+    pool = multiprocessing.get_context("spawn").Pool(workers, initializer=_init_worker, initargs=(tier_name, workers))
+    try:
+        for row in pool.imap_unordered(_analyze_file, reader, chunksize=4):
+            pending.append(row)
+            totals[row['status']] += 1
+            if len(pending) >= flush_every:
+                writer.write(pending)
+                pending = []
+            
+            now = time.perf_counter()
+            if now - last_report >= report_interval:
+                done = totals['ok'] + totals['error']
+                app_logger.info(f"{done} images analyzed, {done / (now - started):.1f} images/s")
+                last_report = now
+        pool.close()
+    except KeyboardInterrupt:
+        app_logger.warning("Interrupted; saving completed results (rerun to resume)")
+        pool.terminate()
+        raise
+    finally:
+        reader.stop()
+        writer.write(pending)
+        pool.join()
+    
+    elapsed = time.perf_counter() - started
+    done = totals['ok'] + totals['error']
+    totals['seconds'] = round(elapsed, 2)
+    totals['images_per_second'] = round(done / elapsed, 2) if elapsed > 0 else 0.0
+    app_logger.info(
+        f"Analyzed {done} images ({totals['ok']} ok, {totals['error']} failed, {totals['skipped']} already done) "
+        f"in {elapsed:.1f}s: {totals['images_per_second']} images/s"
+    )
+    return totals
+
+if __name__ == "__main__":
+    import argparse
+    from app.services.quality_tiers import QUALITY_TIERS
+    
+    parser = argparse.ArgumentParser(description="Analyze a directory of selfies offline")
+    parser.add_argument("input_dir", help="Directory searched recursively for JPG/PNG images")
+    parser.add_argument("--output", default="bulk_results.csv",
+                        help="Output .csv file or .parquet dataset directory (default: bulk_results.csv)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--tier", default="full", choices=list(QUALITY_TIERS), help="Quality tier parameters to use")
+    parser.add_argument("--prefetch", type=int, default=None, help="Files read ahead of the workers (default: 4 per worker)")
+    parser.add_argument("--flush-every", type=int, default=1000, help="Rows per output write (the resume granularity)")
+    parser.add_argument("--report-interval", type=float, default=10.0, help="Seconds between throughput reports")
+    parser.add_argument("--overwrite", action="store_true", help="Discard existing output instead of resuming")
+    args = parser.parse_args()
+    
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"{args.input_dir} is not a directory")
+    if args.output.lower().endswith('.parquet'):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("Parquet output requires pyarrow; install it or write a .csv file")
+    
+    # One analysis per core, each limited to a single OpenCV/BLAS thread
+    workers = args.workers or resource_governor.cpu_cores
+    resource_governor.configure(workers=workers)
+    resource_governor.apply_environment()
+    
+    try:
+        run(args.input_dir, args.output, workers, args.tier, args.prefetch,
+            args.flush_every, args.report_interval, args.overwrite)
+    except KeyboardInterrupt:
+        sys.exit(130)
@@ -9,12 +9,18 @@ class Settings(BaseSettings):
     API_TITLE: str = "CosmoChroma API"
     API_VERSION: str = "1.0.0"
     API_DESCRIPTION: str = "AI-powered skin analysis and beauty recommendation engine"
-    DEBUG: bool = True
+    DEBUG: bool = False  # Auto-reload on code changes when started with python main.py (development only)
     
     # Server Configuration
     HOST: str = "0.0.0.0"
     PORT: int = 8000
     
+    # Production (pre-fork) Serving Configuration
+    SERVER_WORKERS: int = 1  # 0 = one worker per CPU core
+    SERVER_PIN_WORKERS: bool = True  # Pin each worker to its own core (Linux)
+    SERVER_GRACEFUL_TIMEOUT: int = 30  # Seconds to drain in-flight requests on shutdown
+    SERVER_RSS_CHECK_TOLERANCE: float = 0.25  # Allowed growth of per-worker private memory
+    
     # CORS Configuration
     CORS_ORIGINS: list = [
         "http://localhost:3000",
@@ -31,11 +37,86 @@ class Settings(BaseSettings):
     # File Upload Configuration
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_IMAGE_TYPES: list = ["image/jpeg", "image/png", "image/jpg"]
+    MAX_IMAGE_PIXELS: int = 24_000_000  # Checked from the image header before decoding
+    PIXEL_BUDGET_POLICY: str = "downscale"  # "downscale" (JPEG reduced-scale decode) or "reject"
+    IMAGE_MEMORY_BUDGET: int = 512 * 1024 * 1024  # Decoded image memory per worker process
+    IMAGE_MEMORY_WAIT_TIMEOUT: float = 10.0  # Seconds an analysis may wait for memory before 503
     
     # Image Processing Configuration
     FACE_DETECTION_MIN_CONFIDENCE: float = 0.5
     TARGET_IMAGE_SIZE: tuple = (640, 480)
     
+    # Pre-detection Quality Gate (evaluated on a small thumbnail)
+    QUALITY_GATE_ENABLED: bool = True
+    QUALITY_THUMBNAIL_SIZE: int = 160  # Longest side in pixels
+    QUALITY_MIN_BRIGHTNESS: float = 35.0  # Mean luma (0-255) below which an image is too dark
+    QUALITY_MAX_CLIPPED_FRACTION: float = 0.5  # Share of near-white pixels above which it is overexposed
+    QUALITY_MIN_SHARPNESS: float = 20.0  # Laplacian variance of the thumbnail below which it is too blurry
+    QUALITY_MIN_SKIN_RATIO: float = 0.02  # Share of skin-colored pixels below which no face can be present
+    
+    # CPU Thread Budget Configuration (0 = derive automatically)
+    CPU_CORES: int = 0  # Cores available to the whole server
+    THREADS_PER_WORKER: int = 0  # Default: CPU_CORES // SERVER_WORKERS
+    PIPELINE_MAX_WORKERS: int = 0  # Pipeline executor threads, default: the worker's thread budget
+    OPENCV_THREADS: int = 0  # Default: thread budget // executor threads
+    
+    # Analysis Pipeline Configuration
+    PIPELINE_EXECUTION_MODE: str = "thread"  # "thread" or "process" (shared-memory process pool)
+    SHARED_FRAME_SLOTS: int = 0  # Shared-memory frame slots, default: 2 per analysis process
+    SHARED_FRAME_SLOT_PIXELS: int = 12_000_000  # Largest decoded frame a slot can hold (36MB of /dev/shm per slot)
+    BATCH_MAX_FILES: int = 50
+    MULTI_FACE_MAX_FACES: int = 20  # Most faces analyzed per group photo
+    MICRO_BATCH_ENABLED: bool = True  # Classify and match concurrent analyses together
+    MICRO_BATCH_WINDOW_MS: float = 2.0  # How long a batch waits to fill when others are already queued
+    MICRO_BATCH_MAX_SIZE: int = 32  # Analyses per batch
+    CATALOG_PATH: str = ""  # Compiled catalog; default app/data/compiled/catalog.json (bundled JSON if absent)
+    RECOMMENDATION_GRID_ENABLED: bool = True  # Look up precomputed shade candidates per quantized color
+    RECOMMENDATION_GRID_PATH: str = ""  # Default: app/data/compiled/recommendation_grid.npy
+    RECOMMENDATION_GRID_STEP: float = 2.0  # Cell size in L*a*b* units
+    RECOMMENDATION_GRID_CANDIDATES: int = 10  # Shades a query can take per cell and category (x SKIN_TYPE_CANDIDATE_POOL stored)
+    RECOMMENDATION_GRID_RERANK: bool = True  # Re-rank candidates by exact Delta-E
+    SHADE_CLUSTERS_ENABLED: bool = True  # Group near-duplicate shades and search representatives first
+    SHADE_CLUSTERS_PATH: str = ""  # Default: app/data/compiled/shade_clusters.npz
+    SHADE_CLUSTER_DELTA_E: float = 1.0  # Shades closer than this are near-duplicates
+    RECOMMENDATION_MAX_PER_BRAND: int = 0  # Most recommended shades per brand and category (0 = no cap)
+    RECOMMENDATION_MAX_PER_CLUSTER: int = 0  # Most recommended shades per near-duplicate group (0 = no cap)
+    SKIN_TYPE_RANKING_ENABLED: bool = True  # Re-rank recommendations by product attributes suited to the skin type
+    SKIN_TYPE_WEIGHTS_PATH: str = ""  # Default: app/data/skin_type_weights.json
+    SKIN_TYPE_CANDIDATE_POOL: int = 3  # Closest shades considered per recommendation, as a multiple of the count
+    HARMONY_ENABLED: bool = True  # Pick blush, lipstick and eyeshadow by color harmony instead of closeness
+    HARMONY_TABLES_PATH: str = ""  # Default: app/data/compiled/harmony_tables.npz
+    HARMONY_STEP: float = 5.0  # Skin color cell size in L*a*b* units
+    HARMONY_CANDIDATES: int = 10  # Shades a query can take per cell, combination and palette (x SKIN_TYPE_CANDIDATE_POOL stored)
+    SHADE_NEIGHBORS_MAX_K: int = 500  # Most nearest shades a neighbourhood query may ask for
+    SHADE_PAGE_MAX_SIZE: int = 100  # Most shades per page of /api/shades results
+    STATIC_PAYLOAD_MAX_AGE: int = 3600  # Cache-Control max-age (seconds) of /api/routines and /api/products
+    STATIC_PAYLOAD_BROTLI_QUALITY: int = 11  # Brotli level for precompressed payloads (if brotli is installed)
+    PERCEPTUAL_CACHE_ENABLED: bool = True  # Reuse the face box and skin color of near-duplicate re-uploads
+    PERCEPTUAL_CACHE_MAX_DISTANCE: int = 6  # Most differing bits (of 64) in both pHash and dHash for a match
+    PERCEPTUAL_CACHE_MAX_DELTA_E: float = 2.0  # Largest difference (CIE76) in mean L*a*b* for a match
+    PERCEPTUAL_CACHE_SIZE: int = 4096  # Recent uploads remembered (least recently used evicted)
+    REQUEST_DEFAULT_TIMEOUT: float = 30.0  # Seconds an analysis may take before it is abandoned
+    REQUEST_MAX_TIMEOUT: float = 120.0  # Upper bound for client-supplied timeouts
+    REQUEST_TIMEOUT_HEADER: str = "X-Request-Timeout"  # Client timeout in seconds
+    DISCONNECT_POLL_INTERVAL: float = 0.1  # Seconds between client-disconnect checks
+    
+    # Load-adaptive Quality Tiers
+    QUALITY_TIER: str = "auto"  # "auto", or pin one of "full", "fast", "minimal"
+    TIER_FAST_QUEUE_DEPTH: int = 4  # Waiting analyses at which "fast" is used
+    TIER_MINIMAL_QUEUE_DEPTH: int = 16  # Waiting analyses at which "minimal" is used
+    TIER_FAST_P95_SECONDS: float = 2.0  # Recent p95 latency at which "fast" is used
+    TIER_MINIMAL_P95_SECONDS: float = 5.0  # Recent p95 latency at which "minimal" is used
+    TIER_RECOVERY_RATIO: float = 0.5  # Load must fall below threshold * ratio to step back up
+    TIER_LATENCY_WINDOW_SECONDS: float = 30.0  # Only analyses finished this recently count toward the p95
+    TIER_LATENCY_MAX_SAMPLES: int = 2048  # Most recent latencies kept for the p95
+    
+    # Live Camera Configuration
+    LIVE_KEYFRAME_INTERVAL: int = 10  # Run full face detection every N frames
+    LIVE_TRACKING_MIN_SCORE: float = 0.6  # Template match score below which tracking is lost
+    LIVE_COLOR_SMOOTHING: float = 0.3  # EMA weight of the newest color estimate
+    LIVE_CPU_BUDGET: float = 0.25  # Fraction of one core each connection may use
+    LIVE_MAX_FRAME_SIZE: int = 512 * 1024
+    
     # Color Analysis Configuration
     LAB_DELTA_E_THRESHOLD: float = 50.0
     
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+"""Compile retailer product feeds (CSV/JSONL) into the catalog artifact the recommender loads"""
+import json
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.catalog_compiler import CatalogCompiler, LAB_CHUNK_ROWS
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Validate, de-duplicate and compile product feeds into the catalog")
+    parser.add_argument("feeds", nargs="+", help="CSV, JSONL or JSON feed files, ingested in order")
+    parser.add_argument("--output", default=None, help="Compiled catalog .json path (default: CATALOG_PATH)")
+    parser.add_argument("--trust", choices=["rgb", "hex"], default="rgb",
+                        help="Color kept when a shade's hex and RGB disagree (default: rgb, which matching uses)")
+    parser.add_argument("--chunk-rows", type=int, default=LAB_CHUNK_ROWS, help="Shades per vectorized L*a*b* chunk")
+    parser.add_argument("--report", default=None, help="Also write the JSON report to this file")
+    parser.add_argument("--dry-run", action="store_true", help="Validate and report without writing the catalog")
+    args = parser.parse_args()
+    
+    compiler = CatalogCompiler(trust=args.trust, chunk_rows=args.chunk_rows)
+    for feed in args.feeds:
+        if not os.path.isfile(feed):
+            parser.error(f"{feed} is not a file")
+        try:
+            compiler.ingest(feed)
+        except ValueError as e:
+            parser.error(str(e))
+    
+    if not args.dry_run:
+        if not compiler.products:
+            parser.error("No valid shades in the feeds; the catalog was not written")
+        compiler.write(args.output)
+    
+    report = compiler.report()
+    print(json.dumps(report, indent=2))
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    
+    # Non-zero exit if any row was rejected
+    sys.exit(1 if report['rejected'] else 0)
@@ -1,8 +1,15 @@
+import asyncio
+from config import settings
+from app.utils.resource_governor import resource_governor
+
+# Thread limits for BLAS/OpenMP must be in place before numpy is imported
+resource_governor.apply_environment()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import analysis, health
-from config import settings
+from app.api.routes import analysis, health, products, routines, shades
 from app.utils.logger import app_logger
+from app.services.lifecycle import components
 
 # Create FastAPI application
 app = FastAPI(
@@ -26,6 +33,9 @@ app.add_middleware(
 # Include routers
 app.include_router(health.router)
 app.include_router(analysis.router)
+app.include_router(products.router)
+app.include_router(shades.router)
+app.include_router(routines.router)
 
 @app.on_event("startup")
 async def startup_event():
@@ -33,11 +43,21 @@ async def startup_event():
     app_logger.info(f"Starting {settings.API_TITLE} v{settings.API_VERSION}")
     app_logger.info(f"Debug mode: {settings.DEBUG}")
     app_logger.info(f"CORS origins: {settings.CORS_ORIGINS}")
+    resource_governor.apply_runtime()
+    resource_governor.log_and_export()
+    components.mark_started()
+    
+    # Warm up in the background so /api/health answers immediately;
+    # /api/ready reports ready once this has finished
+    loop = asyncio.get_running_loop()
+    loop.run_in_executor(resource_governor.executor, components.warm_up)
+    loop.run_in_executor(resource_governor.executor, components.start_workers)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Application shutdown event"""
     app_logger.info(f"Shutting down {settings.API_TITLE}")
+    components.shutdown()
 
 @app.get("/")
 async def root():
@@ -46,7 +66,8 @@ async def root():
         "message": "Welcome to CosmoChroma API",
         "version": settings.API_VERSION,
         "docs": "/docs",
-        "health": "/api/health"
+        "health": "/api/health",
+        "ready": "/api/ready"
     }
 
 if __name__ == "__main__":
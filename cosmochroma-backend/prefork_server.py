@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+"""Production serving mode: pre-load shared state, fork and supervise workers"""
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import urllib.request
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import settings
+from app.utils.resource_governor import resource_governor
+
+# Thread limits for BLAS/OpenMP must be in place before numpy is imported
+resource_governor.apply_environment()
+
+import uvicorn
+from app.utils.logger import app_logger
+from app.utils.lazy_import import lazy_import
+from app.services.lifecycle import components
+
+cv2 = lazy_import("cv2")
+
+def read_memory_usage(pid: int) -> dict:
+    """Read RSS, PSS and private (unshared) memory of a process in KB (Linux)"""
+    usage = {'rss': 0, 'pss': 0, 'private': 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key == 'Rss':
+                    usage['rss'] = int(value.split()[0])
+                elif key == 'Pss':
+                    usage['pss'] = int(value.split()[0])
+                elif key in ('Private_Clean', 'Private_Dirty'):
+                    usage['private'] += int(value.split()[0])
+    except OSError:
+        pass
+    return usage
+
+class PreforkServer:
+    """Pre-load the pipeline in a parent process and fork uvicorn workers that share it"""
+    
+    def __init__(self, app, host: str = settings.HOST, port: int = settings.PORT, workers: int = None):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers or settings.SERVER_WORKERS or os.cpu_count() or 1
+        self.graceful_timeout = settings.SERVER_GRACEFUL_TIMEOUT
+        self.pin_workers = settings.SERVER_PIN_WORKERS and hasattr(os, "sched_setaffinity")
+        self.children = {}  # pid -> worker slot
+        self.stopping = False
+        self.sock = None
+        self.app_logger = app_logger
+        
+        # Each worker gets cores // workers threads in total
+        resource_governor.configure(workers=self.workers)
+    
+    def preload(self):
+        """Build and warm up shared state once, before any worker is forked"""
+        # No OpenCV worker threads may exist at fork time; workers apply
+        # their own thread budget after forking
+        cv2.setNumThreads(0)
+        
+        components.warm_up()
+        if not components.is_ready:
+            raise RuntimeError("Warm-up failed; refusing to fork workers")
+        
+        # Move preloaded objects out of the GC's reach so collections in the
+        # workers do not touch (and un-share) their pages
+        gc.collect()
+        gc.freeze()
+    
+    def bind(self):
+        """Open the listening socket shared by all workers"""
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(2048)
+        self.sock.set_inheritable(True)
+    
+    def _run_worker(self, slot: int):
+        """Worker process body: pin to cores and serve (startup applies the thread budget)"""
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        
+        # Startup time of this worker, not of the parent
+        components.created_at = time.perf_counter()
+        
+        if self.pin_workers:
+            cores = sorted(os.sched_getaffinity(0))
+            budget = resource_governor.thread_budget
+            os.sched_setaffinity(0, {cores[(slot * budget + i) % len(cores)] for i in range(budget)})
+        
+        config = uvicorn.Config(
+            self.app,
+            host=self.host,
+            port=self.port,
+            timeout_graceful_shutdown=self.graceful_timeout,
+            log_level="info"
+        )
+        uvicorn.Server(config).run(sockets=[self.sock])
+    
+    def spawn(self, slot: int):
+        """Fork one worker for a slot"""
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                self._run_worker(slot)
+            except Exception as e:
+                self.app_logger.error(f"Worker {slot} crashed: {str(e)}")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        
+        self.children[pid] = slot
+        self.app_logger.info(f"Started worker {slot} (pid {pid})")
+    
+    def _handle_stop(self, signum, frame):
+        self.stopping = True
+    
+    def _drain(self):
+        """Ask workers to finish in-flight requests, then kill stragglers"""
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.children.pop(pid, None)
+        
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self.children and time.monotonic() < deadline:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+            if pid:
+                self.children.pop(pid, None)
+            else:
+                time.sleep(0.1)
+        
+        for pid in list(self.children):
+            self.app_logger.warning(f"Worker pid {pid} did not drain in time, killing it")
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.children.clear()
+    
+    def start(self):
+        """Preload, bind and fork all workers"""
+        self.preload()
+        self.bind()
+        for slot in range(self.workers):
+            self.spawn(slot)
+    
+    def supervise(self):
+        """Restart crashed workers until asked to stop, then drain"""
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        
+        while not self.stopping:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid, status = 0, 0
+            if not pid:
+                time.sleep(0.5)
+                continue
+            
+            slot = self.children.pop(pid, None)
+            if slot is None or self.stopping:
+                continue
+            self.app_logger.error(f"Worker {slot} (pid {pid}) exited with status {status}; restarting")
+            time.sleep(1)
+            self.spawn(slot)
+        
+        self.app_logger.info("Shutting down workers")
+        self._drain()
+        self.sock.close()
+    
+    def run(self):
+        """Serve until SIGTERM/SIGINT"""
+        self.app_logger.info(f"Starting pre-fork server with {self.workers} workers on {self.host}:{self.port}")
+        self.start()
+        self.supervise()
+    
+    def exercise(self, requests_per_worker: int = 10, timeout: float = 30) -> int:
+        """Send color analyses until workers respond, touching their working set"""
+        host = "127.0.0.1" if self.host in ("0.0.0.0", "") else self.host
+        body = b'{"hex": "#D2AA96"}'
+        deadline = time.monotonic() + timeout
+        completed = 0
+        while time.monotonic() < deadline and completed < self.workers * requests_per_worker:
+            request = urllib.request.Request(
+                f"http://{host}:{self.port}/api/analyze/color",
+                data=body,
+                headers={"Content-Type": "application/json"}
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=5) as response:
+                    completed += response.status == 200
+            except OSError:
+                time.sleep(0.2)
+        return completed
+    
+    def memory_report(self) -> dict:
+        """Memory usage of the parent and each worker"""
+        return {
+            'parent': read_memory_usage(os.getpid()),
+            'workers': {slot: read_memory_usage(pid) for pid, slot in self.children.items()},
+        }
+
+def check_worker_memory(app, workers: int, port: int = settings.PORT) -> bool:
+    """
+    Verify that per-worker private memory stays flat as the worker count grows
+    
+    Starts the server with one worker and then with the requested number, and
+    compares the average private (unshared) memory per worker. Copy-on-write
+    sharing of preloaded state is working if it does not grow by more than
+    SERVER_RSS_CHECK_TOLERANCE.
+    """
+    averages = {}
+    for count in sorted({1, workers}):
+        server = PreforkServer(app, host="127.0.0.1", port=port, workers=count)
+        server.start()
+        try:
+            server.exercise()
+            report = server.memory_report()
+        finally:
+            server.stopping = True
+            server._drain()
+            server.sock.close()
+        
+        private = [usage['private'] for usage in report['workers'].values()]
+        averages[count] = sum(private) / max(1, len(private))
+        app_logger.info(
+            f"{count} worker(s): parent RSS {report['parent']['rss']} KB, "
+            f"per-worker private {averages[count]:.0f} KB, "
+            f"per-worker PSS {sum(u['pss'] for u in report['workers'].values()) / max(1, count):.0f} KB"
+        )
+    
+    growth = averages[workers] / averages[1] - 1 if averages[1] else 0.0
+    passed = growth <= settings.SERVER_RSS_CHECK_TOLERANCE
+    app_logger.info(f"Per-worker private memory growth from 1 to {workers} workers: {growth:+.1%} "
+                    f"({'OK' if passed else 'FAILED'})")
+    return passed
+
+if __name__ == "__main__":
+    import argparse
+    from main import app
+    
+    parser = argparse.ArgumentParser(description="Run CosmoChroma API with pre-forked workers")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--host", default=settings.HOST)
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    parser.add_argument("--check-rss", action="store_true",
+                        help="Check that per-worker memory stays flat as workers are added, then exit")
+    args = parser.parse_args()
+    
+    if not hasattr(os, "fork"):
+        app_logger.warning("os.fork is unavailable on this platform; starting a single worker")
+        uvicorn.run(app, host=args.host, port=args.port)
+    elif args.check_rss:
+        workers = args.workers or settings.SERVER_WORKERS or os.cpu_count() or 1
+        sys.exit(0 if check_worker_memory(app, workers, args.port) else 1)
+    else:
+        PreforkServer(app, host=args.host, port=args.port, workers=args.workers).run()
@@ -7,7 +7,13 @@ import os
 sys.path.insert(0, os.path.dirname(__file__))
 
 from main import app
+from config import settings
 import uvicorn
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if settings.SERVER_WORKERS != 1 and hasattr(os, "fork"):
+        # Production mode: pre-forked workers sharing the warmed-up pipeline
+        from prefork_server import PreforkServer
+        PreforkServer(app, host=settings.HOST, port=settings.PORT).run()
+    else:
+        uvicorn.run(app, host=settings.HOST, port=settings.PORT)
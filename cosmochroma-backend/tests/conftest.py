@@ -0,0 +1,34 @@
+import time
+import cv2
+import pytest
+from fastapi.testclient import TestClient
+from skimage import data
+from app.services.analysis_pipeline import AnalysisPipeline
+from app.services.product_recommender import ProductRecommender
+
+@pytest.fixture(scope="session")
+def product_recommender():
+    """Recommender over the bundled catalog (grid, clusters and harmony tables built on first use)"""
+    return ProductRecommender()
+
+@pytest.fixture(scope="session")
+def pipeline():
+    """Analysis pipeline in thread execution mode"""
+    return AnalysisPipeline()
+
+@pytest.fixture(scope="session")
+def client():
+    """Test client over the application, started once and warmed up"""
+    from main import app
+    with TestClient(app) as test_client:
+        # Let the background warm-up finish before any test (and before teardown)
+        deadline = time.monotonic() + 60
+        while test_client.get("/api/ready").status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        yield test_client
+
+@pytest.fixture(scope="session")
+def selfie_jpeg() -> bytes:
+    """JPEG of a portrait with one clearly detectable face"""
+    _, encoded = cv2.imencode('.jpg', cv2.cvtColor(data.astronaut(), cv2.COLOR_RGB2BGR))
+    return encoded.tobytes()
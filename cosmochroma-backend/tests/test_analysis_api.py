@@ -0,0 +1,140 @@
+import json
+from config import settings
+
+def upload(content: bytes, name: str = "selfie.jpg", content_type: str = "image/jpeg"):
+    return (name, content, content_type)
+
+def ndjson(response) -> list:
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+def test_batch_streams_one_line_per_file(client, selfie_jpeg):
+    files = [
+        ("files", upload(selfie_jpeg, "a.jpg")),
+        ("files", upload(b"not an image", "b.jpg")),
+        ("files", upload(b"plain text", "c.txt", "text/plain")),
+        ("files", upload(selfie_jpeg, "d.jpg")),
+    ]
+    response = client.post("/api/analyze/batch?include=skin_analysis,foundation&top_k=2", files=files)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    
+    items = sorted(ndjson(response), key=lambda item: item["index"])
+    assert [item["index"] for item in items] == [0, 1, 2, 3]
+    assert [item["filename"] for item in items] == ["a.jpg", "b.jpg", "c.txt", "d.jpg"]
+    assert [item["status"] for item in items] == ["ok", "error", "error", "ok"]
+    assert items[1]["error"]["error"] == "INVALID_IMAGE"
+    assert items[2]["error"]["error"] == "INVALID_IMAGE"
+    
+    result = items[0]["result"]
+    assert set(result) >= {"skin_analysis", "foundation_recommendations"}
+    assert "blush_recommendations" not in result
+    assert len(result["foundation_recommendations"]) <= 2
+    assert result == items[3]["result"] | {"analysis_timestamp": result["analysis_timestamp"]}
+
+def test_batch_rejects_too_many_files(client, selfie_jpeg, monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_MAX_FILES", 2)
+    files = [("files", upload(selfie_jpeg)) for _ in range(3)]
+    response = client.post("/api/analyze/batch", files=files)
+    assert response.status_code == 400
+    assert response.json()["detail"]["error"] == "BATCH_TOO_LARGE"
+
+def test_color_analysis_matches_image_analysis(client, selfie_jpeg):
+    image = client.post("/api/analyze?include=skin_analysis,recommendations", files={"file": upload(selfie_jpeg)}).json()
+    rgb = image["skin_analysis"]["skin_tone_rgb"]
+    
+    for body in ({"rgb": rgb}, {"hex": image["skin_analysis"]["skin_tone_hex"]}):
+        response = client.post("/api/analyze/color?include=skin_analysis,recommendations", json=body)
+        assert response.status_code == 200
+        color = response.json()
+        assert color["skin_analysis"] == image["skin_analysis"]
+        assert color["foundation_recommendations"] == image["foundation_recommendations"]
+        assert color["lipstick_recommendations"] == image["lipstick_recommendations"]
+
+def test_color_analysis_accepts_lab(client):
+    response = client.post("/api/analyze/color?include=skin_analysis", json={"lab": {"l": 70.0, "a": 12.0, "b": 18.0}})
+    assert response.status_code == 200
+    assert set(response.json()) >= {"skin_analysis", "analysis_timestamp"}
+
+def test_color_analysis_rejects_invalid_colors(client):
+    for body in ({}, {"hex": "#GGGGGG"}, {"rgb": {"r": 300, "g": 0, "b": 0}}, {"rgb": {"r": 1}},
+                 {"hex": "#E6BEAA", "rgb": {"r": 230, "g": 190, "b": 170}}, {"lab": {"l": 120, "a": 0, "b": 0}}):
+        response = client.post("/api/analyze/color", json=body)
+        assert response.status_code == 400
+        assert response.json()["detail"]["error"] == "INVALID_COLOR"
+
+def test_color_analysis_times_out(client):
+    response = client.post("/api/analyze/color", json={"hex": "#E6BEAA"}, headers={"X-Request-Timeout": "0.000001"})
+    assert response.status_code == 504
+    assert response.json()["detail"]["error"] == "DEADLINE_EXCEEDED"
+
+def test_analysis_returns_only_included_sections(client):
+    color = {"hex": "#D2A288"}
+    full = client.post("/api/analyze/color?top_k=5", json=color).json()
+    
+    response = client.post("/api/analyze/color?include=lipstick,morning_routine&top_k=3", json=color)
+    assert response.status_code == 200
+    selected = response.json()
+    assert set(selected) == {"lipstick_recommendations", "morning_routine", "quality_tier", "analysis_timestamp"}
+    assert selected["lipstick_recommendations"] == full["lipstick_recommendations"][:3]
+    assert selected["morning_routine"] == full["morning_routine"]
+
+def test_analysis_links_routines_on_request(client):
+    response = client.post("/api/analyze/color?include=skin_analysis,routines&routine_refs=true", json={"hex": "#D2A288"})
+    results = response.json()
+    assert "morning_routine" not in results
+    assert results["routines_ref"]["url"] == f"/api/routines/{results['skin_analysis']['skin_type']}"
+    assert results["routines_ref"]["routine_types"] == ["morning", "evening", "weekly"]
+
+def test_analysis_rejects_unknown_sections(client):
+    response = client.post("/api/analyze/color?include=skin_analysis,mascara", json={"hex": "#D2A288"})
+    assert response.status_code == 400
+    assert response.json()["detail"]["error"] == "INVALID_PARAMETER"
+
+def test_stream_emits_sections_in_order(client, selfie_jpeg):
+    response = client.post("/api/analyze/stream", files={"file": upload(selfie_jpeg)})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    
+    events = ndjson(response)
+    assert [event["section"] for event in events] == [
+        "skin_analysis", "foundation_recommendations", "blush_recommendations", "lipstick_recommendations",
+        "concealer_recommendations", "eyeshadow_recommendations", "morning_routine", "evening_routine",
+        "weekly_routine", "done"
+    ]
+    assert events[-1]["quality_tier"] == "full"
+    
+    # Same results as the buffered endpoint
+    buffered = client.post("/api/analyze", files={"file": upload(selfie_jpeg)}).json()
+    for event in events[:-1]:
+        assert event["data"] == buffered[event["section"]]
+
+def test_stream_speaks_sse_when_accepted(client, selfie_jpeg):
+    response = client.post(
+        "/api/analyze/stream?include=skin_analysis,blush", files={"file": upload(selfie_jpeg)},
+        headers={"Accept": "text/event-stream"}
+    )
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    assert [lines[0] for lines in events] == ["event: skin_analysis", "event: blush_recommendations", "event: done"]
+    assert all(lines[1].startswith("data: ") for lines in events)
+
+def test_stream_reports_image_errors_before_streaming(client):
+    response = client.post("/api/analyze/stream", files={"file": upload(b"not an image")})
+    assert response.status_code == 400
+    assert response.json()["detail"]["error"] == "INVALID_IMAGE"
+
+def test_live_session_answers_each_frame(client, selfie_jpeg):
+    with client.websocket_connect("/api/analyze/live?top_k=2") as websocket:
+        websocket.send_bytes(selfie_jpeg)
+        first = websocket.receive_json()
+        assert first["keyframe"] and first["frame"] == 1
+        assert set(first["face"]) == {"x", "y", "width", "height", "confidence"}
+        assert len(first["foundation_recommendations"]) == 2
+        
+        websocket.send_bytes(selfie_jpeg)
+        second = websocket.receive_json()
+        assert not second["keyframe"]
+        assert second["skin_tone_hex"] == first["skin_tone_hex"]
+        
+        websocket.send_bytes(b"not an image")
+        assert websocket.receive_json()["error"]["error"] == "INVALID_IMAGE"
@@ -0,0 +1,31 @@
+import pytest
+from app.services.analysis_pipeline import RECOMMENDATION_CATEGORIES, ROUTINE_TYPES, AnalysisOptions
+from app.utils.error_handlers import InvalidParameterException
+
+def test_no_include_selects_everything():
+    options = AnalysisOptions.from_include(None, top_k=7)
+    assert options.include_skin_analysis
+    assert options.categories == RECOMMENDATION_CATEGORIES
+    assert options.routine_types == ROUTINE_TYPES
+    assert options.top_k == 7
+
+def test_include_accepts_sections_fields_and_groups():
+    options = AnalysisOptions.from_include("lipstick_recommendations, foundation,evening_routine,,foundation")
+    assert not options.include_skin_analysis
+    assert options.categories == ['foundation', 'lipstick']
+    assert options.routine_types == ['evening']
+    
+    options = AnalysisOptions.from_include("routines,skin_analysis,recommendations")
+    assert options.include_skin_analysis
+    assert options.categories == RECOMMENDATION_CATEGORIES
+    assert options.routine_types == ROUTINE_TYPES
+
+def test_include_rejects_unknown_sections():
+    with pytest.raises(InvalidParameterException):
+        AnalysisOptions.from_include("skin_analysis,mascara")
+
+def test_restricting_reports_omitted_categories():
+    options = AnalysisOptions.from_include("foundation,blush,lipstick")
+    assert options.restricted_to(['foundation']).categories == ['foundation']
+    assert options.omitted_by(['foundation']) == ['blush_recommendations', 'lipstick_recommendations']
+    assert options.omitted_by(None) == []
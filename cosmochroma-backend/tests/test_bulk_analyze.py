@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+import bulk_analyze
+from bulk_analyze import ResultWriter, iter_image_paths, run
+
+@pytest.fixture
+def image_dir(tmp_path, selfie_jpeg):
+    """Two selfies in nested folders, one corrupt image and one non-image file"""
+    images = tmp_path / "images"
+    (images / "b").mkdir(parents=True)
+    (images / "a.jpg").write_bytes(selfie_jpeg)
+    (images / "b" / "c.JPG").write_bytes(selfie_jpeg)
+    (images / "b" / "broken.png").write_bytes(b"not an image")
+    (images / "notes.txt").write_text("ignored")
+    return images
+
+def test_images_are_walked_in_stable_order(image_dir):
+    assert list(iter_image_paths(str(image_dir))) == ["a.jpg", "b/broken.png", "b/c.JPG"]
+
+def test_run_writes_one_row_per_image(image_dir, tmp_path):
+    output = str(tmp_path / "results.csv")
+    totals = run(str(image_dir), output, workers=2, flush_every=2)
+    assert (totals['ok'], totals['error'], totals['skipped']) == (2, 1, 0)
+    
+    rows = pd.read_csv(output).set_index('path')
+    assert list(rows.columns) == list(bulk_analyze.COLUMNS)[1:]
+    assert rows.loc['b/broken.png', 'status'] == 'error'
+    assert rows.loc['a.jpg', 'hex'] == rows.loc['b/c.JPG', 'hex']
+    assert rows.loc['a.jpg', 'skin_type'] in ('normal', 'oily', 'dry', 'combination', 'sensitive')
+
+def test_rerun_resumes_after_a_partial_write(image_dir, tmp_path):
+    output = tmp_path / "results.csv"
+    run(str(image_dir), str(output), workers=1)
+    
+    # Simulate a run killed halfway through writing its last row
+    content = output.read_bytes()
+    output.write_bytes(content[:-10])
+    totals = run(str(image_dir), str(output), workers=1)
+    assert (totals['ok'] + totals['error'], totals['skipped']) == (1, 2)
+    
+    rows = pd.read_csv(output)
+    assert sorted(rows['path']) == ["a.jpg", "b/broken.png", "b/c.JPG"]
+    assert run(str(image_dir), str(output), workers=1)['skipped'] == 3
+
+def test_parquet_output_resumes(image_dir, tmp_path):
+    pytest.importorskip("pyarrow")
+    output = str(tmp_path / "results.parquet")
+    run(str(image_dir), output, workers=1, flush_every=1)
+    assert ResultWriter(output).completed_paths() == {"a.jpg", "b/broken.png", "b/c.JPG"}
+    assert run(str(image_dir), output, workers=1)['skipped'] == 3
+    assert len(pd.read_parquet(output)) == 3
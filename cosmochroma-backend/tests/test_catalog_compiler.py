@@ -0,0 +1,92 @@
+import csv
+import json
+from pathlib import Path
+import numpy as np
+import pytest
+from app.services.catalog_compiler import CatalogCompiler, load_compiled_catalog
+from app.services.color_utils import ColorUtils
+
+BUNDLED_CATALOG = Path(__file__).resolve().parent.parent / "app" / "data" / "indian_products.json"
+
+FIELDS = ['product_id', 'name', 'brand', 'category', 'price_inr', 'rating', 'reviews_count',
+          'shade_name', 'r', 'g', 'b', 'hex', 'finish', 'long_wear', 'spf']
+
+ROWS = [
+    ['p1', 'Silk Foundation', 'Lakme', 'Foundation', '499', '4.2', '120', 'Ivory', '240', '214', '190', '', 'matte', 'yes', '15'],
+    ['p1', 'Silk Foundation', 'Lakme', 'foundation', '499', '4.2', '120', 'Beige', '', '', '', '#D2A288', '', '', ''],
+    ['p1', 'Silk Foundation', 'Lakme', 'foundation', '499', '4.2', '120', 'ivory', '240', '214', '190', '', '', '', ''],
+    ['p1', 'Silk Foundation', 'Lakme', 'foundation', '499', '4.2', '120', 'BEIGE', '1', '2', '3', '', '', '', ''],
+    ['p2', 'Rose Blush', 'Sugar', 'blush', '350', '4.6', '80', 'Rose', '200', '100', '120', '#C86478', 'satin', '', ''],
+    ['p2', 'Rose Blush', 'Sugar', 'blush', '350', '4.6', '80', 'Coral', '250', '128', '114', '#000000', '', '', ''],
+    ['p3', 'Broken Rating', 'Sugar', 'blush', '350', '7', '80', 'Rose', '200', '100', '120', '', '', '', ''],
+    ['p4', 'No Color', 'Sugar', 'lipstick', '350', '4', '80', 'Red', '', '', '', '', '', '', ''],
+    ['p5', 'Bad Flag', 'Sugar', 'lipstick', '350', '4', '80', 'Red', '200', '0', '0', '', '', 'maybe', ''],
+    ['', '', 'Sugar', 'lipstick', '350', '4', '80', 'Red', '200', '0', '0', '', '', '', ''],
+]
+
+@pytest.fixture
+def feed(tmp_path) -> str:
+    path = tmp_path / "feed.csv"
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        writer.writerows(ROWS)
+    return str(path)
+
+def test_rows_are_validated_and_deduplicated(feed):
+    compiler = CatalogCompiler()
+    compiler.ingest(feed)
+    report = compiler.report()
+    assert (report['rows'], report['rejected'], report['products'], report['shades']) == (10, 4, 2, 4)
+    assert report['errors'] == {'invalid_number': 1, 'missing_color': 1, 'invalid_attribute': 1, 'missing_field': 1}
+    assert report['warnings'] == {'duplicate_shade': 1, 'conflicting_duplicate_shade': 1, 'hex_rgb_mismatch': 1}
+    
+    foundation, blush = compiler.products
+    assert foundation['category'] == 'foundation' and foundation['long_wear'] is True and foundation['spf'] == 15
+    assert [shade[0] for shade in compiler.shades[0].values()] == ['Ivory', 'Beige']
+    assert compiler.shades[0]['beige'][1] == ColorUtils.hex_to_rgb('#D2A288')
+    assert compiler.shades[1]['coral'][1] == (250, 128, 114)
+
+def test_hex_can_be_trusted_over_rgb(feed):
+    compiler = CatalogCompiler(trust='hex')
+    compiler.ingest(feed)
+    assert compiler.shades[1]['coral'][1] == (0, 0, 0)
+
+def test_chunked_lab_conversion_matches_one_pass(feed):
+    whole, chunked = CatalogCompiler(), CatalogCompiler(chunk_rows=1)
+    whole.ingest(feed)
+    chunked.ingest(feed)
+    assert np.array_equal(whole.shade_labs(), chunked.shade_labs())
+
+def test_written_catalog_loads_with_matching_labs(feed, tmp_path):
+    compiler = CatalogCompiler()
+    compiler.ingest(feed)
+    path = compiler.write(tmp_path / "catalog.json")
+    
+    products, labs = load_compiled_catalog(path)
+    shades = [shade for product in products for shade in product['shades']]
+    assert len(shades) == len(labs) == 4
+    for shade, lab in zip(shades, labs):
+        expected = ColorUtils.rgb_to_lab(shade['rgb']['r'], shade['rgb']['g'], shade['rgb']['b'])
+        assert lab == pytest.approx([expected['l'], expected['a'], expected['b']], abs=0.01)
+    assert products[0]['shades'][0]['finish'] == 'matte'
+
+def test_bundled_catalog_compiles_without_losing_shades(tmp_path):
+    bundled = json.loads(BUNDLED_CATALOG.read_text(encoding='utf-8'))
+    jsonl = tmp_path / "bundled.jsonl"
+    jsonl.write_text("\n".join(json.dumps(product) for product in bundled), encoding='utf-8')
+    
+    compiler = CatalogCompiler()
+    compiler.ingest(str(jsonl))
+    assert compiler.report()['rejected'] == 0
+    assert len(compiler.products) == len(bundled)
+    assert compiler.counts['shades'] == sum(len(product['shades']) for product in bundled)
+
+def test_unreadable_catalogs(tmp_path):
+    assert load_compiled_catalog(tmp_path / "missing.json") is None
+    (tmp_path / "old.json").write_text('{"version": 0, "products": []}')
+    with pytest.raises(ValueError):
+        load_compiled_catalog(tmp_path / "old.json")
+    (tmp_path / "feed.xml").write_text("<products/>")
+    with pytest.raises(ValueError):
+        CatalogCompiler().ingest(str(tmp_path / "feed.xml"))
@@ -0,0 +1,55 @@
+import math
+import pytest
+from app.utils.deadline import RequestDeadline
+from app.utils.error_handlers import (
+    DeadlineExceededException, InvalidParameterException, RequestCancelledException
+)
+from config import settings
+
+def test_header_sets_the_timeout_within_bounds():
+    assert RequestDeadline.from_header(None).timeout == settings.REQUEST_DEFAULT_TIMEOUT
+    assert RequestDeadline.from_header("2.5").timeout == 2.5
+    assert RequestDeadline.from_header("100000").timeout == settings.REQUEST_MAX_TIMEOUT
+
+@pytest.mark.parametrize("value", ["0", "-1", "soon", "nan"])
+def test_invalid_headers_are_rejected(value):
+    with pytest.raises(InvalidParameterException):
+        RequestDeadline.from_header(value)
+
+def test_expired_deadline_stops_at_the_next_stage():
+    deadline = RequestDeadline(1e-9)
+    with pytest.raises(DeadlineExceededException) as error:
+        deadline.check('detect')
+    assert "detect" in error.value.message
+    assert deadline.remaining() == 0.0
+
+def test_cancelled_request_stops_at_the_next_stage():
+    deadline = RequestDeadline.unbounded()
+    deadline.check('decode')
+    assert math.isinf(deadline.remaining())
+    
+    deadline.cancel()
+    with pytest.raises(RequestCancelledException):
+        deadline.check('classify')
+
+def test_cancelling_stops_the_remaining_sections(pipeline):
+    deadline = RequestDeadline.unbounded()
+    sections = pipeline.iter_sections(198, 142, 106, deadline=deadline)
+    assert next(sections)[0] == 'skin_analysis'
+    deadline.cancel()
+    with pytest.raises(RequestCancelledException):
+        list(sections)
+
+def test_expired_image_analysis_gets_504(client, selfie_jpeg):
+    response = client.post(
+        "/api/analyze", files={"file": ("a.jpg", selfie_jpeg, "image/jpeg")}, headers={"X-Request-Timeout": "0.000001"}
+    )
+    assert response.status_code == 504
+    assert response.json()["detail"]["error"] == "DEADLINE_EXCEEDED"
+
+def test_invalid_timeout_header_gets_400(client, selfie_jpeg):
+    response = client.post(
+        "/api/analyze", files={"file": ("a.jpg", selfie_jpeg, "image/jpeg")}, headers={"X-Request-Timeout": "soon"}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"]["error"] == "INVALID_PARAMETER"
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+from app.services.harmony_tables import HARMONY_PALETTES, PALETTES, SEASONS, UNDERTONES, HarmonyTables
+from app.services.shade_index import ShadeIndex
+from config import settings
+
+def exact_harmony(tables, skin_lab, season, undertone, category, k):
+    """Reference: each palette's target matched against the whole category, then round-robin"""
+    targets = tables.palette_targets(skin_lab, season, undertone, category)[0]
+    ranked = [tables._palette_matches(targets[PALETTES.index(palette)], None, category, k)
+              for palette in HARMONY_PALETTES[category]]
+    chosen, seen = [], set()
+    for rank in range(k):
+        for matches in ranked:
+            if rank < len(matches) and matches[rank][0] not in seen and len(chosen) < k:
+                seen.add(matches[rank][0])
+                chosen.append(matches[rank][0])
+    return chosen
+
+def rows(shade_index, matches):
+    return [shade_index.row_of(shade) for _, shade, _, _ in matches]
+
+@pytest.fixture(scope="module")
+def shade_index():
+    """Synthetic accent catalog, large enough that a cell's candidates are a small share of it"""
+    rng = np.random.default_rng(10)
+    labs = np.column_stack([rng.uniform(20, 85, 2400), rng.uniform(-20, 60, 2400), rng.uniform(-30, 50, 2400)])
+    products = [
+        {'id': i, 'name': f"Product {i}", 'brand': f"Brand {i % 9}", 'category': list(HARMONY_PALETTES)[i % 3],
+         'price_inr': 200 + i % 800, 'rating': 4, 'reviews_count': i, 'shades': [{'name': f"Shade {i}"}]}
+        for i in range(len(labs))
+    ]
+    return ShadeIndex(products, labs)
+
+@pytest.fixture(scope="module")
+def tables(shade_index):
+    """Coarse cells, so each cell's candidates must cover a wide neighbourhood"""
+    return HarmonyTables.build(shade_index, step=8.0, k=30)
+
+@pytest.mark.parametrize("season", SEASONS)
+def test_cell_centers_match_the_exact_harmony_query(tables, shade_index, season):
+    cells = np.random.default_rng(11).integers(0, tables.shape, (20, 3))
+    labs = tables.origin + cells * tables.step
+    for category in HARMONY_PALETTES:
+        for undertone in UNDERTONES:
+            results = tables.query_batch(labs, [season] * len(labs), [undertone] * len(labs), category, 6)
+            for lab, matches in zip(labs, results):
+                assert rows(shade_index, matches) == exact_harmony(tables, lab, season, undertone, category, 6)
+
+def test_quantization_keeps_most_of_the_exact_top_k(tables, shade_index):
+    labs = np.random.default_rng(12).uniform((35, 0, 0), (85, 30, 40), (30, 3))
+    found = total = 0
+    for category in HARMONY_PALETTES:
+        for season in SEASONS:
+            for undertone in UNDERTONES:
+                results = tables.query_batch(labs, [season] * len(labs), [undertone] * len(labs), category, 6)
+                for lab, matches in zip(labs, results):
+                    exact = exact_harmony(tables, lab, season, undertone, category, 6)
+                    found += len(set(rows(shade_index, matches)) & set(exact))
+                    total += len(exact)
+    assert found / total > 0.9
+
+def test_skin_colors_outside_the_grid_use_the_shade_index(tables, shade_index):
+    labs = np.array([[99.0, 70.0, -50.0], [3.0, 1.0, 2.0]])
+    results = tables.query_batch(labs, ['Winter', 'Autumn'], ['cool', 'warm_golden'], 'lipstick', 5)
+    for lab, season, undertone, matches in zip(labs, ['Winter', 'Autumn'], ['cool', 'warm_golden'], results):
+        assert rows(shade_index, matches) == exact_harmony(tables, lab, season, undertone, 'lipstick', 5)
+
+def test_palettes_take_turns_without_repeating_a_shade(tables, shade_index):
+    labs = np.random.default_rng(13).uniform((40, 5, 5), (80, 25, 35), (40, 3))
+    for category, palettes in HARMONY_PALETTES.items():
+        for matches in tables.query_batch(labs, ['Spring'] * len(labs), ['neutral'] * len(labs), category, 6):
+            chosen = rows(shade_index, matches)
+            assert len(chosen) == len(set(chosen)) == 6
+            assert [palette for *_, palette in matches[:3]] == palettes
+
+def test_unknown_category_has_no_matches(tables):
+    assert tables.query_batch(np.array([[60.0, 12.0, 18.0]]), ['Spring'], ['neutral'], 'concealer', 5) == [[]]
+
+def test_saved_tables_are_reloaded_only_for_the_same_step(tables, shade_index, tmp_path, monkeypatch):
+    path = tmp_path / "harmony_tables.npz"
+    tables.save(path)
+    monkeypatch.setattr(settings, "HARMONY_STEP", tables.step)
+    loaded = HarmonyTables.load(shade_index, path)
+    assert loaded is not None and np.array_equal(loaded.candidates, tables.candidates)
+    
+    monkeypatch.setattr(settings, "HARMONY_STEP", tables.step + 1)
+    assert HarmonyTables.load(shade_index, path) is None
+    monkeypatch.setattr(settings, "HARMONY_STEP", tables.step)
+    monkeypatch.setattr(settings, "HARMONY_CANDIDATES", tables.k + 1)
+    assert HarmonyTables.load(shade_index, path) is None
@@ -0,0 +1,67 @@
+import threading
+import time
+from io import BytesIO
+import pytest
+from PIL import Image
+from app.services.image_processor import ImageProcessor
+from app.utils.error_handlers import ImageTooLargeException, ServerBusyException
+from app.utils.image_memory import ImageMemoryBudget
+from config import settings
+
+def encode(size, format):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 160, 140)).save(buffer, format=format)
+    return buffer.getvalue()
+
+def test_oversized_jpeg_is_decoded_at_reduced_scale(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_IMAGE_PIXELS", 100_000)
+    monkeypatch.setattr(settings, "PIXEL_BUDGET_POLICY", "downscale")
+    processor = ImageProcessor()
+    image = processor.open_image(encode((1200, 800), "JPEG"))
+    assert image.size[0] * image.size[1] <= 100_000
+    assert processor.decode_image(image).shape[:2] == (image.size[1], image.size[0])
+
+@pytest.mark.parametrize("format, policy", [("PNG", "downscale"), ("JPEG", "reject")])
+def test_oversized_image_is_rejected_before_decoding(monkeypatch, format, policy):
+    monkeypatch.setattr(settings, "MAX_IMAGE_PIXELS", 100_000)
+    monkeypatch.setattr(settings, "PIXEL_BUDGET_POLICY", policy)
+    with pytest.raises(ImageTooLargeException):
+        ImageProcessor().open_image(encode((1200, 800), format))
+
+def test_oversized_upload_gets_413(client, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_IMAGE_PIXELS", 100_000)
+    response = client.post("/api/analyze", files={"file": ("big.png", encode((1200, 800), "PNG"), "image/png")})
+    assert response.status_code == 413
+    assert response.json()["detail"]["error"] == "IMAGE_TOO_LARGE"
+
+def test_decode_estimate_covers_the_bgr_frame():
+    image = ImageProcessor().open_image(encode((300, 200), "PNG"))
+    assert ImageProcessor.estimate_decode_bytes(image) >= 300 * 200 * 3
+
+def test_decodes_wait_for_memory_and_time_out():
+    budget = ImageMemoryBudget(budget_bytes=100, wait_timeout=5)
+    with budget.reserve(80):
+        with pytest.raises(ServerBusyException):
+            with budget.reserve(40, timeout=0.05):
+                pass
+        
+        # Admitted as soon as the first decode releases its memory
+        admitted = threading.Event()
+        
+        def second():
+            with budget.reserve(40):
+                admitted.set()
+        
+        waiter = threading.Thread(target=second)
+        waiter.start()
+        time.sleep(0.05)
+        assert not admitted.is_set()
+    
+    waiter.join(timeout=2)
+    assert admitted.is_set()
+    assert budget.resident_bytes == 0 and budget.peak_bytes == 80
+
+def test_image_larger_than_the_budget_is_admitted_alone():
+    budget = ImageMemoryBudget(budget_bytes=100, wait_timeout=0)
+    with budget.reserve(500):
+        assert budget.resident_bytes == 500
@@ -0,0 +1,44 @@
+from app.services.lifecycle import ComponentManager
+from app.utils.lazy_import import lazy_import
+
+def test_lazy_module_imports_on_first_use():
+    module = lazy_import("json")
+    assert not module.is_loaded
+    assert module.dumps([1]) == "[1]"
+    assert module.is_loaded
+
+def test_pipeline_is_built_on_first_use():
+    manager = ComponentManager()
+    assert manager._pipeline is None
+    assert manager.state == "starting" and not manager.is_ready
+    assert manager.pipeline is manager.pipeline
+
+def test_warm_up_makes_components_ready():
+    manager = ComponentManager()
+    manager.mark_started()
+    manager.warm_up()
+    assert manager.is_ready
+    assert manager.startup_seconds >= 0 and manager.warmup_seconds > 0
+    
+    # Idempotent: a second warm-up does nothing
+    warmup_seconds = manager.warmup_seconds
+    manager.warm_up()
+    assert manager.warmup_seconds == warmup_seconds
+
+def test_warm_up_failure_is_reported(monkeypatch):
+    manager = ComponentManager()
+    monkeypatch.setattr(manager, "_synthetic_selfie", lambda: b"not an image")
+    manager.warm_up()
+    assert manager.state == "failed" and not manager.is_ready
+
+def test_readiness_probe_follows_warm_up(client, monkeypatch):
+    from app.services.lifecycle import components
+    readiness = client.get("/api/ready").json()
+    assert readiness["ready"] and readiness["status"] == "ready"
+    assert readiness["warmup_seconds"] > 0
+    
+    monkeypatch.setattr(components, "state", "warming_up")
+    response = client.get("/api/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "warming_up"
+    assert client.get("/api/health").status_code == 200
@@ -0,0 +1,44 @@
+import cv2
+import numpy as np
+import pytest
+from skimage import data
+from app.services.color_utils import ColorUtils
+from app.services.image_processor import ImageProcessor
+from app.services.live_tracker import LiveFaceTracker
+
+@pytest.fixture
+def tracker():
+    return LiveFaceTracker(ImageProcessor(), ColorUtils())
+
+@pytest.fixture(scope="module")
+def frame():
+    return cv2.cvtColor(data.astronaut(), cv2.COLOR_RGB2BGR)
+
+def test_face_is_tracked_between_keyframes(tracker, frame):
+    first = tracker.process_frame(frame)
+    assert first['keyframe']
+    
+    for shift in range(1, tracker.keyframe_interval + 1):
+        result = tracker.process_frame(np.roll(frame, 2 * shift, axis=1))
+        assert not result['keyframe']
+        assert result['face']['x'] == first['face']['x'] + 2 * shift
+        assert result['face']['y'] == first['face']['y']
+    
+    # Re-detected after LIVE_KEYFRAME_INTERVAL tracked frames
+    assert tracker.process_frame(frame)['keyframe']
+
+def test_color_is_smoothed_over_frames(tracker, frame):
+    tracker.process_frame(frame)
+    warm = np.clip(frame * np.array([0.8, 1.0, 1.2]), 0, 255).astype(np.uint8)
+    target = ColorUtils.extract_dominant_color(
+        ImageProcessor().extract_skin_region(warm, tracker.face_coords)
+    )
+    
+    reds = [tracker.process_frame(warm)['rgb']['r'] for _ in range(4)]
+    assert reds[0] < reds[1] < reds[2] <= target[0]
+
+def test_losing_the_face_resets_the_track(tracker, frame):
+    tracker.process_frame(frame)
+    result = tracker.process_frame(np.full_like(frame, 128))
+    assert result == {'keyframe': True, 'face': None, 'rgb': None}
+    assert tracker.face_coords is None and tracker.smoothed_rgb is None
@@ -0,0 +1,106 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from app.models.skin_analyzer import SkinAnalyzer
+from app.services.micro_batcher import MicroBatcher
+from app.utils.deadline import RequestDeadline
+from app.utils.error_handlers import RequestCancelledException
+
+@pytest.fixture(scope="module")
+def skin_analyzer():
+    return SkinAnalyzer()
+
+@pytest.fixture(scope="module")
+def rgbs():
+    return [tuple(int(c) for c in rgb) for rgb in np.random.default_rng(5).integers(90, 245, (48, 3))]
+
+def unbatched(skin_analyzer, product_recommender, rgb, categories, top_k):
+    analysis_data = skin_analyzer.analyze_complete(*rgb)
+    return analysis_data, {c: product_recommender.recommend_batch([analysis_data], c, top_k)[0] for c in categories}
+
+def test_concurrent_callers_get_their_own_results(skin_analyzer, product_recommender, rgbs, monkeypatch):
+    batcher = MicroBatcher(skin_analyzer, product_recommender, window_ms=5, max_size=16)
+    batch_sizes = []
+    analyze_batch = skin_analyzer.analyze_batch
+    
+    def counted_analyze_batch(colors):
+        batch_sizes.append(len(colors))
+        return analyze_batch(colors)
+    monkeypatch.setattr(skin_analyzer, "analyze_batch", counted_analyze_batch)
+    requests = [
+        (rgb, [['foundation'], ['lipstick', 'foundation'], ['blush', 'eyeshadow']][i % 3], 1 + i % 4)
+        for i, rgb in enumerate(rgbs)
+    ]
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(lambda request: batcher.analyze(*request), requests))
+    
+    for (rgb, categories, top_k), (analysis_data, recommendations) in zip(requests, results):
+        assert set(recommendations) == set(categories)
+        assert (analysis_data, recommendations) == unbatched(skin_analyzer, product_recommender, rgb, categories, top_k)
+    
+    # Colors are classified a batch at a time
+    assert sum(batch_sizes) == len(rgbs) and len(batch_sizes) < len(rgbs)
+
+def test_idle_caller_does_not_wait_for_the_window(skin_analyzer, product_recommender, rgbs):
+    batcher = MicroBatcher(skin_analyzer, product_recommender, window_ms=1000)
+    started = time.perf_counter()
+    batcher.analyze(rgbs[0], ['foundation'], 5)
+    assert time.perf_counter() - started < 0.5
+
+def test_analysis_is_handed_out_before_matching(skin_analyzer, product_recommender, rgbs, monkeypatch):
+    batcher = MicroBatcher(skin_analyzer, product_recommender, window_ms=0)
+    matching, release = threading.Event(), threading.Event()
+    recommend_batch = product_recommender.recommend_batch
+    
+    def slow_recommend_batch(*args):
+        matching.set()
+        release.wait(timeout=5)
+        return recommend_batch(*args)
+    monkeypatch.setattr(product_recommender, "recommend_batch", slow_recommend_batch)
+    
+    leader = batcher.submit(rgbs[0], ['foundation'], 5)
+    follower = batcher.submit(rgbs[1], ['foundation'], 5)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        led = executor.submit(batcher.recommendations, leader)
+        assert matching.wait(timeout=5)
+        
+        # The follower's analysis is ready while the batch is still being matched
+        assert batcher.analysis(follower) == skin_analyzer.analyze_complete(*rgbs[1])
+        assert not follower.done
+        release.set()
+        assert set(led.result()) == {'foundation'}
+    assert set(batcher.recommendations(follower)) == {'foundation'}
+
+def test_abandoned_callers_are_left_out_of_matching(skin_analyzer, product_recommender, rgbs, monkeypatch):
+    batcher = MicroBatcher(skin_analyzer, product_recommender, window_ms=0)
+    matched = []
+    recommend_batch = product_recommender.recommend_batch
+    monkeypatch.setattr(product_recommender, "recommend_batch",
+                        lambda analyses, *args: matched.append(len(analyses)) or recommend_batch(analyses, *args))
+    
+    gone = RequestDeadline()
+    gone.cancel()
+    abandoned = batcher.submit(rgbs[0], ['foundation'], 5, gone)
+    kept = batcher.submit(rgbs[1], ['foundation'], 5)
+    assert set(batcher.recommendations(kept)) == {'foundation'}
+    assert matched == [1]
+    
+    # Its analysis was still handed out, but asking for matches fails
+    assert batcher.analysis(abandoned) == skin_analyzer.analyze_complete(*rgbs[0])
+    with pytest.raises(RequestCancelledException):
+        batcher.recommendations(abandoned)
+
+def test_batch_failure_reaches_every_caller(skin_analyzer, product_recommender, rgbs, monkeypatch):
+    batcher = MicroBatcher(skin_analyzer, product_recommender)
+    
+    def fail(*args):
+        raise RuntimeError("index unavailable")
+    monkeypatch.setattr(product_recommender, "recommend_batch", fail)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(batcher.analyze, rgb, ['foundation'], 5) for rgb in rgbs[:4]]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result()
+    assert not batcher._pending and not batcher._leading
@@ -0,0 +1,54 @@
+import cv2
+import numpy as np
+import pytest
+from app.services.analysis_pipeline import AnalysisOptions
+
+@pytest.fixture(scope="module")
+def selfie(selfie_jpeg):
+    return cv2.imdecode(np.frombuffer(selfie_jpeg, np.uint8), cv2.IMREAD_COLOR)
+
+@pytest.fixture(scope="module")
+def group_png(selfie) -> bytes:
+    """Two copies of the portrait side by side"""
+    _, encoded = cv2.imencode('.png', np.hstack([selfie, selfie]))
+    return encoded.tobytes()
+
+def test_every_face_is_analyzed_in_one_pass(pipeline, selfie, group_png):
+    per_copy = len(pipeline.image_processor.detect_faces(selfie))
+    options = AnalysisOptions.from_include("skin_analysis,foundation,morning_routine", top_k=3)
+    results = pipeline.analyze_faces(group_png, max_faces=10, options=options)
+    assert results.face_count == len(results.faces) == 2 * per_copy
+    
+    # Boxes in full image coordinates, the same faces found in both copies
+    left = sorted((r for r in results.faces if r.face.x < 512), key=lambda r: r.face.y)
+    right = sorted((r for r in results.faces if r.face.x >= 512), key=lambda r: r.face.y)
+    assert len(left) == len(right) == per_copy
+    for a, b in zip(left, right):
+        assert b.face.x - a.face.x == pytest.approx(512, abs=8)
+        assert b.skin_analysis.undertone == a.skin_analysis.undertone
+    
+    for result in results.faces:
+        assert len(result.foundation_recommendations) == 3
+        assert result.morning_routine is not None
+        assert result.blush_recommendations is None
+
+def test_largest_faces_are_kept(pipeline, group_png):
+    all_faces = pipeline.analyze_faces(group_png, max_faces=10, options=AnalysisOptions.from_include("skin_analysis"))
+    largest = pipeline.analyze_faces(group_png, max_faces=1, options=AnalysisOptions.from_include("skin_analysis"))
+    assert largest.face_count == 1
+    assert largest.faces[0].face.width == max(result.face.width for result in all_faces.faces)
+
+def test_faces_endpoint(client, group_png):
+    response = client.post("/api/analyze/faces?max_faces=2", files={"file": ("group.png", group_png, "image/png")})
+    assert response.status_code == 200
+    results = response.json()
+    assert results["face_count"] == 2
+    assert all(set(face) == {"face", "skin_analysis"} for face in results["faces"])
+
+def test_faces_endpoint_without_faces_gets_422(client, selfie):
+    # Sharp, well exposed and skin-colored, but no face
+    noise = np.random.default_rng(4).integers(-40, 40, selfie.shape)
+    _, image = cv2.imencode('.png', np.clip(noise + (120, 150, 200), 0, 255).astype(np.uint8))
+    response = client.post("/api/analyze/faces", files={"file": ("noise.png", image.tobytes(), "image/png")})
+    assert response.status_code == 422
+    assert response.json()["detail"]["error"] == "FACE_NOT_DETECTED"
@@ -0,0 +1,62 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+import pytest
+from prefork_server import read_memory_usage
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="pre-fork serving needs os.fork")
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def get_json(url: str):
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return response.status, json.loads(response.read())
+
+def test_memory_usage_is_read_from_proc():
+    usage = read_memory_usage(os.getpid())
+    assert set(usage) == {'rss', 'pss', 'private'}
+    if os.path.exists(f"/proc/{os.getpid()}/smaps_rollup"):
+        assert usage['rss'] >= usage['private'] > 0
+
+def test_workers_serve_and_drain_on_sigterm():
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "prefork_server.py", "--workers", "2", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                status, readiness = get_json(f"http://127.0.0.1:{port}/api/ready")
+                break
+            except OSError:
+                assert server.poll() is None and time.monotonic() < deadline
+                time.sleep(0.2)
+        
+        # Workers fork after warm-up, so they are ready from their first request
+        assert status == 200 and readiness["ready"]
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{port}/api/analyze/color?include=skin_analysis",
+            data=b'{"hex": "#D2AA96"}', headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            assert response.status == 200
+        
+        server.send_signal(signal.SIGTERM)
+        assert server.wait(timeout=30) == 0
+    finally:
+        if server.poll() is None:
+            server.kill()
+            server.wait()
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from config import settings
+
+SKIN_RGB = {'r': 198, 'g': 142, 'b': 106}
+
+@pytest.fixture
+def exact_scan_forbidden(product_recommender, monkeypatch):
+    """Fail if a query falls back from the precomputed tables to a full search"""
+    def forbidden(*args, **kwargs):
+        raise AssertionError("fell back to a full search")
+    
+    monkeypatch.setattr(product_recommender.shade_index, "query_batch", forbidden)
+    monkeypatch.setattr(product_recommender.shade_index, "neighbors", forbidden)
+    if product_recommender.shade_clusters is not None:
+        monkeypatch.setattr(product_recommender.shade_clusters, "query_batch", forbidden)
+    return product_recommender
+
+def test_tables_store_the_skin_type_candidate_pool(product_recommender):
+    pool = settings.RECOMMENDATION_GRID_CANDIDATES * settings.SKIN_TYPE_CANDIDATE_POOL
+    assert product_recommender.recommendation_grid.k >= pool
+    assert product_recommender.harmony_tables.k >= settings.HARMONY_CANDIDATES * settings.SKIN_TYPE_CANDIDATE_POOL
+
+@pytest.mark.parametrize("skin_type", ["oily", "dry", "combination", "sensitive"])
+def test_reranked_skin_types_use_the_grid(exact_scan_forbidden, skin_type):
+    recommender = exact_scan_forbidden
+    assert recommender.skin_type_ranker.adjusts([skin_type])
+    
+    foundation = recommender.find_best_matches(SKIN_RGB, "foundation", 5, skin_type)
+    blush = recommender.find_harmony_matches_batch([SKIN_RGB], ["Autumn"], ["warm_golden"], "blush", 5, [skin_type])[0]
+    
+    assert len(foundation) == 5
+    assert len(blush) == 5
+
+def test_grid_matches_the_exact_scan(product_recommender):
+    grid = product_recommender.recommendation_grid
+    labs = np.random.default_rng(0).uniform(grid.origin, grid.origin + (grid.shape - 1) * grid.step, (300, 3))
+    for category in grid.category_slots:
+        exact = product_recommender.shade_index.query_batch(labs, category, 5)
+        from_grid = grid.query_batch(labs, category, 5)
+        assert [[id(shade) for _, shade, _ in matches] for matches in from_grid] == \
+               [[id(shade) for _, shade, _ in matches] for matches in exact]
+
+def test_shade_search_applies_every_filter(client):
+    response = client.get("/api/products/search?hex=%23C68E6A&category=foundation,concealer&max_price=800&min_rating=4&top_k=20")
+    assert response.status_code == 200
+    search = response.json()
+    assert 0 < len(search["results"]) <= min(20, search["total"])
+    for shade in search["results"]:
+        assert shade["category"] in ("foundation", "concealer")
+        assert shade["price_inr"] <= 800 and shade["rating"] >= 4
+    distances = [shade["delta_e_distance"] for shade in search["results"]]
+    assert distances == sorted(distances)
+
+@pytest.mark.parametrize("query", ["hex=%23C68E6A&rgb=198,142,106", "rgb=198,142", "min_price=500&max_price=100"])
+def test_invalid_shade_searches_get_400(client, query):
+    assert client.get(f"/api/products/search?{query}").status_code == 400
@@ -0,0 +1,37 @@
+import cv2
+import numpy as np
+import pytest
+from app.services.image_processor import ImageProcessor
+from app.services.quality_gate import QualityGate
+from app.utils.error_handlers import ImageQualityException
+
+@pytest.fixture(scope="module")
+def gate():
+    return QualityGate(ImageProcessor())
+
+@pytest.fixture(scope="module")
+def selfie(selfie_jpeg):
+    return cv2.imdecode(np.frombuffer(selfie_jpeg, np.uint8), cv2.IMREAD_COLOR)
+
+def test_clear_selfie_passes(gate, selfie):
+    quality = gate.check(selfie)
+    assert set(quality) == {'brightness', 'clipped_fraction', 'sharpness', 'skin_ratio'}
+
+@pytest.mark.parametrize("code, spoil", [
+    ("IMAGE_TOO_DARK", lambda image: (image * 0.1).astype(np.uint8)),
+    ("IMAGE_OVEREXPOSED", lambda image: cv2.add(image, np.full_like(image, 160))),
+    ("IMAGE_TOO_BLURRY", lambda image: cv2.GaussianBlur(image, (0, 0), 12)),
+    ("NO_SKIN_DETECTED", lambda image: cv2.cvtColor(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), cv2.COLOR_GRAY2BGR)),
+])
+def test_hopeless_images_are_rejected(gate, selfie, code, spoil):
+    with pytest.raises(ImageQualityException) as error:
+        gate.check(spoil(selfie))
+    assert error.value.code == code
+
+def test_rejected_upload_skips_face_detection(client, selfie, monkeypatch):
+    from app.services.lifecycle import components
+    monkeypatch.setattr(components.pipeline.image_processor, "detect_face", lambda *args, **kwargs: pytest.fail())
+    _, dark = cv2.imencode('.jpg', (selfie * 0.1).astype(np.uint8))
+    response = client.post("/api/analyze", files={"file": ("dark.jpg", dark.tobytes(), "image/jpeg")})
+    assert response.status_code == 422
+    assert response.json()["detail"]["error"] == "IMAGE_TOO_DARK"
@@ -0,0 +1,88 @@
+import json
+import time
+import pytest
+from app.services.analysis_pipeline import AnalysisOptions
+from app.services.lifecycle import components
+from app.services.quality_tiers import QUALITY_TIERS, TierController, tier_controller
+from config import settings
+
+@pytest.fixture
+def controller(monkeypatch):
+    monkeypatch.setattr(settings, "QUALITY_TIER", "auto")
+    return TierController()
+
+def test_slow_latencies_degrade_the_tier(controller):
+    now = time.monotonic()
+    controller._latencies.extend((now, settings.TIER_MINIMAL_P95_SECONDS + 1) for _ in range(20))
+    assert controller.select().name == "minimal"
+
+def test_slow_burst_ages_out_without_new_traffic(controller):
+    long_ago = time.monotonic() - settings.TIER_LATENCY_WINDOW_SECONDS - 1
+    controller._latencies.extend((long_ago, settings.TIER_MINIMAL_P95_SECONDS + 1) for _ in range(20))
+    controller.current = QUALITY_TIERS['minimal']
+    assert controller.select().name == "full"
+
+def test_tracked_analyses_feed_the_p95(controller):
+    with controller.track(QUALITY_TIERS['full']):
+        pass
+    assert len(controller._latencies) == 1
+    assert controller.in_flight == 0
+
+def test_degraded_tier_reports_omitted_sections(pipeline):
+    results = pipeline.analyze_color(198, 142, 106, AnalysisOptions(), QUALITY_TIERS['fast'])
+    assert results.quality_tier == "fast"
+    assert results.omitted_sections == ["blush_recommendations", "eyeshadow_recommendations"]
+    assert results.blush_recommendations is None
+    assert results.foundation_recommendations
+
+def test_full_tier_omits_nothing(pipeline):
+    results = pipeline.analyze_color(198, 142, 106, AnalysisOptions.from_include("skin_analysis,blush"))
+    assert results.omitted_sections is None
+    assert "omitted_sections" not in results.model_dump(exclude_unset=True)
+
+def test_queue_depth_degrades_the_tier(controller, monkeypatch):
+    monkeypatch.setattr(controller, "_queue_depth", lambda: settings.TIER_FAST_QUEUE_DEPTH)
+    assert controller.select().name == "fast"
+    monkeypatch.setattr(controller, "_queue_depth", lambda: settings.TIER_MINIMAL_QUEUE_DEPTH)
+    assert controller.select().name == "minimal"
+
+def test_recovery_waits_for_load_well_below_the_threshold(controller, monkeypatch):
+    controller.current = QUALITY_TIERS['fast']
+    
+    # Below the threshold but above threshold * TIER_RECOVERY_RATIO: stay degraded
+    monkeypatch.setattr(controller, "_queue_depth", lambda: settings.TIER_FAST_QUEUE_DEPTH - 1)
+    assert controller.select().name == "fast"
+    monkeypatch.setattr(controller, "_queue_depth", lambda: 0)
+    assert controller.select().name == "full"
+
+def test_pinned_tier_ignores_load(monkeypatch):
+    monkeypatch.setattr(settings, "QUALITY_TIER", "minimal")
+    controller = TierController()
+    controller._latencies.append((time.monotonic(), 0.0))
+    assert controller.select().name == "minimal"
+
+def test_degraded_stream_reports_omitted_sections(client, selfie_jpeg, monkeypatch):
+    monkeypatch.setattr(settings, "QUALITY_TIER", "fast")
+    response = client.post("/api/analyze/stream?include=foundation,blush", files={"file": ("a.jpg", selfie_jpeg, "image/jpeg")})
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [event["section"] for event in events] == ["foundation_recommendations", "done"]
+    assert events[-1]["quality_tier"] == "fast"
+    assert events[-1]["omitted_sections"] == ["blush_recommendations"]
+
+def test_stream_is_tracked_until_its_last_section(client, selfie_jpeg, monkeypatch):
+    in_flight = []
+    iter_sections = components.pipeline.iter_sections
+    
+    def tracked_sections(*args):
+        for section in iter_sections(*args):
+            in_flight.append(tier_controller.in_flight)
+            yield section
+    monkeypatch.setattr(components.pipeline, "iter_sections", tracked_sections)
+    samples = len(tier_controller._latencies)
+    
+    response = client.post("/api/analyze/stream?include=skin_analysis,foundation",
+                           files={"file": ("a.jpg", selfie_jpeg, "image/jpeg")})
+    assert response.status_code == 200
+    assert in_flight == [1, 1]
+    assert tier_controller.in_flight == 0
+    assert len(tier_controller._latencies) == samples + 1
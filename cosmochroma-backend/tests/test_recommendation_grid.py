@@ -0,0 +1,51 @@
+import json
+import numpy as np
+import pytest
+from app.services.recommendation_grid import RecommendationGrid
+from config import settings
+
+def shades(results):
+    return [[id(shade) for _, shade, _ in matches] for matches in results]
+
+@pytest.fixture(scope="module")
+def coarse_grid(product_recommender):
+    """A grid with large cells, so each cell's candidates must cover a wide neighbourhood"""
+    return RecommendationGrid.build(product_recommender.shade_index, step=6.0, k=30)
+
+def test_coarse_grid_still_matches_the_exact_scan(coarse_grid):
+    report = coarse_grid.error_report(k=5, samples=2000)
+    assert all(stats['reranked_mismatch'] == 0 for stats in report.values())
+
+def test_colors_the_grid_cannot_serve_use_the_shade_index(coarse_grid, product_recommender):
+    shade_index = product_recommender.shade_index
+    labs = np.array([[99.0, 80.0, -60.0], [50.0, 0.0, 0.0], [5.0, 2.0, 3.0]])
+    for category in coarse_grid.category_slots:
+        assert shades(coarse_grid.query_batch(labs, category, 5)) == shades(shade_index.query_batch(labs, category, 5))
+        wide = coarse_grid.query_batch(labs[:1], category, coarse_grid.k + 1)
+        assert shades(wide) == shades(shade_index.query_batch(labs[:1], category, coarse_grid.k + 1))
+
+def test_saved_grid_is_reloaded_for_the_same_catalog(coarse_grid, product_recommender, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "RECOMMENDATION_GRID_CANDIDATES", 5)
+    path = tmp_path / "grid.npy"
+    coarse_grid.save(path)
+    loaded = RecommendationGrid.load(product_recommender.shade_index, path)
+    assert loaded is not None
+    assert np.array_equal(np.asarray(loaded.candidates), coarse_grid.candidates)
+    
+    labs = np.random.default_rng(6).uniform((40, 5, 5), (85, 25, 35), (50, 3))
+    assert shades(loaded.query_batch(labs, "foundation", 5)) == shades(coarse_grid.query_batch(labs, "foundation", 5))
+
+def test_stale_or_narrow_grid_is_not_loaded(coarse_grid, product_recommender, tmp_path, monkeypatch):
+    path = tmp_path / "grid.npy"
+    assert RecommendationGrid.load(product_recommender.shade_index, path) is None
+    coarse_grid.save(path)
+    
+    # Too few candidates for the configured re-ranking pool
+    monkeypatch.setattr(settings, "RECOMMENDATION_GRID_CANDIDATES", 100)
+    assert RecommendationGrid.load(product_recommender.shade_index, path) is None
+    monkeypatch.setattr(settings, "RECOMMENDATION_GRID_CANDIDATES", 5)
+    
+    # Built for another catalog
+    metadata = json.loads(path.with_suffix('.json').read_text())
+    path.with_suffix('.json').write_text(json.dumps(dict(metadata, fingerprint="0" * 16)))
+    assert RecommendationGrid.load(product_recommender.shade_index, path) is None
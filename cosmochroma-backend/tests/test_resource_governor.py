@@ -0,0 +1,69 @@
+import os
+import sys
+import cv2
+import pytest
+from app.utils.resource_governor import BLAS_THREAD_ENV_VARS, ResourceGovernor
+from config import settings
+
+@pytest.fixture
+def budget(monkeypatch):
+    """Set the budget settings for a fresh governor"""
+    def configure(**overrides):
+        values = {'CPU_CORES': 8, 'SERVER_WORKERS': 1, 'THREADS_PER_WORKER': 0,
+                  'PIPELINE_MAX_WORKERS': 0, 'OPENCV_THREADS': 0}
+        values.update(overrides)
+        for name, value in values.items():
+            monkeypatch.setattr(settings, name, value)
+        return ResourceGovernor()
+    return configure
+
+@pytest.mark.parametrize("workers, executor_threads, expected", [
+    (1, 0, (8, 8, 1)),
+    (2, 0, (4, 4, 1)),
+    (4, 1, (2, 1, 2)),
+    (16, 0, (1, 1, 1)),
+])
+def test_cores_are_split_between_workers_and_threads(budget, workers, executor_threads, expected):
+    governor = budget(SERVER_WORKERS=workers, PIPELINE_MAX_WORKERS=executor_threads)
+    assert (governor.thread_budget, governor.executor_threads, governor.opencv_threads) == expected
+    assert governor.blas_threads == governor.opencv_threads
+    assert governor.executor_threads * governor.opencv_threads <= max(1, 8 // workers)
+
+def test_prefork_reconfigures_for_its_worker_count(budget):
+    governor = budget()
+    governor.configure(workers=4)
+    assert governor.report() == {
+        'cpu_cores': 8, 'workers': 4, 'thread_budget': 2,
+        'executor_threads': 2, 'opencv_threads': 1, 'blas_threads': 1,
+    }
+
+def test_environment_limits_do_not_override_the_operator(budget, monkeypatch):
+    for var in BLAS_THREAD_ENV_VARS:
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setenv("MKL_NUM_THREADS", "3")
+    
+    budget(PIPELINE_MAX_WORKERS=4).apply_environment()
+    assert os.environ["OMP_NUM_THREADS"] == "2"
+    assert os.environ["MKL_NUM_THREADS"] == "3"
+
+def test_runtime_limits_apply_to_opencv(budget):
+    previous = cv2.getNumThreads()
+    try:
+        budget(OPENCV_THREADS=3).apply_runtime()
+        assert cv2.getNumThreads() == 3
+    finally:
+        cv2.setNumThreads(previous)
+
+def test_missing_threadpoolctl_is_reported(budget, monkeypatch):
+    monkeypatch.setitem(sys.modules, "threadpoolctl", None)
+    governor = budget()
+    warnings = []
+    monkeypatch.setattr(governor.app_logger, "warning", warnings.append)
+    governor.apply_runtime()
+    assert len(warnings) == 1 and "threadpoolctl" in warnings[0]
+
+def test_executor_is_sized_to_the_budget(budget):
+    governor = budget(PIPELINE_MAX_WORKERS=3)
+    assert governor.executor is governor.executor
+    assert governor.executor._max_workers == 3
+    governor.executor.shutdown()
@@ -0,0 +1,100 @@
+import cv2
+import numpy as np
+import pytest
+from skimage import data
+from app.services.analysis_pipeline import AnalysisPipeline
+from app.services.image_processor import ImageProcessor
+from app.services.selfie_cache import PerceptualHashCache
+from config import settings
+
+RGB = (220, 208, 203)
+FACE = {'x': 160, 'y': 20, 'width': 160, 'height': 200}
+BOX = (0.3125, 0.0390625, 0.3125, 0.390625)  # FACE in the 512x512 selfie
+
+@pytest.fixture(scope="module")
+def selfie():
+    """Portrait test image as a BGR frame"""
+    return cv2.cvtColor(data.astronaut(), cv2.COLOR_RGB2BGR)
+
+def reupload(image, scale=1.0, quality=70):
+    """The image resized and recompressed, as a re-export would"""
+    height, width = image.shape[:2]
+    resized = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    _, buffer = cv2.imencode('.jpg', resized, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+def key(image):
+    """Cache key of a frame, computed on its quality gate thumbnail like the pipeline does"""
+    return PerceptualHashCache.image_key(ImageProcessor().make_thumbnail(image, settings.QUALITY_THUMBNAIL_SIZE))
+
+def warm(image):
+    """The image with a warmer white balance (same structure, different color)"""
+    return np.clip(image * np.array([0.9, 1.0, 1.1]), 0, 255).astype(np.uint8)
+
+@pytest.mark.parametrize("scale, quality", [(1.0, 95), (1.0, 60), (0.75, 80), (0.5, 70)])
+def test_recompressed_reupload_hits(selfie, scale, quality):
+    cache = PerceptualHashCache()
+    cache.store(key(selfie), 0, BOX, RGB)
+    image = reupload(selfie, scale, quality)
+    cached = cache.lookup(key(image), 0)
+    assert cached.rgb == RGB
+    assert cached.face_coords(image.shape) == {name: int(round(v * scale)) for name, v in FACE.items()}
+
+def test_color_shifted_reupload_reuses_only_the_face(selfie):
+    cache = PerceptualHashCache()
+    cache.store(key(selfie), 0, BOX, RGB)
+    shifted = key(warm(selfie))
+    
+    # The grayscale hashes alone cannot tell the two apart
+    assert shifted.phash == key(selfie).phash
+    assert cache.lookup(shifted, 0) == (BOX, None)
+    assert cache.hits == 0
+
+def test_only_equal_or_better_tiers_are_reused(selfie):
+    cache = PerceptualHashCache()
+    image_key = key(selfie)
+    cache.store(image_key, 1, BOX, RGB)
+    assert cache.lookup(image_key, 0) == (BOX, None)
+    assert cache.lookup(image_key, 1) == (BOX, RGB)
+    assert cache.lookup(image_key, 2) == (BOX, RGB)
+
+def test_face_box_round_trips_through_frame_fractions(selfie):
+    box = PerceptualHashCache.face_box(FACE, selfie.shape)
+    assert box == BOX
+    cache = PerceptualHashCache()
+    cache.store(key(selfie), 0, box, RGB)
+    assert cache.lookup(key(selfie), 0).face_coords(selfie.shape) == FACE
+
+def test_least_recently_used_is_evicted():
+    cache = PerceptualHashCache(capacity=2)
+    rng = np.random.default_rng(3)
+    images = [rng.integers(0, 256, (64, 64, 3), dtype=np.uint8) for _ in range(3)]
+    keys = [key(image) for image in images]
+    cache.store(keys[0], 0, BOX, (1, 1, 1))
+    cache.store(keys[1], 0, BOX, (2, 2, 2))
+    assert cache.lookup(keys[0], 0).rgb == (1, 1, 1)
+    cache.store(keys[2], 0, BOX, (3, 3, 3))
+    
+    assert cache.lookup(keys[1], 0) is None
+    assert cache.lookup(keys[0], 0).rgb == (1, 1, 1)
+    assert len(cache.entries) == 2
+
+def test_pipeline_reuses_the_face_of_a_color_shifted_reupload(selfie, monkeypatch):
+    pipeline = AnalysisPipeline()
+    pipeline.selfie_cache = PerceptualHashCache()
+    _, original = cv2.imencode('.jpg', selfie)
+    _, shifted = cv2.imencode('.jpg', warm(selfie))
+    detections = []
+    detect_face = pipeline.image_processor.detect_face
+    monkeypatch.setattr(pipeline.image_processor, "detect_face",
+                        lambda *args, **kwargs: detections.append(1) or detect_face(*args, **kwargs))
+    
+    color = pipeline.extract_skin_color(original.tobytes())
+    assert pipeline.extract_skin_color(original.tobytes()) == color
+    assert pipeline.selfie_cache.hits == 1
+    
+    # Estimated again from the cached face box, without detection
+    assert pipeline.extract_skin_color(shifted.tobytes()) != color
+    assert pipeline.selfie_cache.hits == 1
+    assert len(detections) == 1
+    assert len(pipeline.selfie_cache.entries) == 2
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from app.services.color_utils import ColorUtils
+from app.services.shade_clusters import ShadeClusters
+from app.services.shade_index import ShadeIndex
+
+@pytest.fixture(scope="module")
+def shade_index():
+    """Synthetic catalog where most colors are re-listed by several brands with tiny differences"""
+    rng = np.random.default_rng(7)
+    base = np.column_stack([rng.uniform(25, 90, 1500), rng.uniform(-3, 40, 1500), rng.uniform(-3, 50, 1500)])
+    labs = np.repeat(base, 4, axis=0) + rng.normal(0, 0.15, (6000, 3))
+    products = [
+        {'id': i, 'name': f"Product {i}", 'brand': f"Brand {i % 7}", 'category': ['foundation', 'lipstick'][i // 4 % 2],
+         'price_inr': 100 + i % 900, 'rating': 3 + i % 3, 'reviews_count': i, 'shades': [{'name': f"Shade {i}"}]}
+        for i in range(len(labs))
+    ]
+    return ShadeIndex(products, labs)
+
+@pytest.fixture(scope="module")
+def clusters(shade_index):
+    return ShadeClusters.build(shade_index, threshold=1.0)
+
+def rows(shade_index, results):
+    return [[shade_index.row_of(shade) for _, shade, _ in matches] for matches in results]
+
+def capped_scan(shade_index, clusters, lab, category, k, max_per_brand, max_per_cluster):
+    """Reference: walk the full (delta_e, row) order and skip shades over a cap"""
+    candidates = shade_index.category_rows[category]
+    distances = ColorUtils.round_array(ColorUtils.delta_e_cie94_matrix(lab[None, :], shade_index.labs[candidates])[0])
+    selected, brands, groups = [], {}, {}
+    for position in np.lexsort((candidates, distances)):
+        row = candidates[position]
+        brand, group = shade_index.brand_codes[row], clusters.cluster_of[row]
+        if (max_per_brand and brands.get(brand, 0) >= max_per_brand) or \
+                (max_per_cluster and groups.get(group, 0) >= max_per_cluster):
+            continue
+        brands[brand] = brands.get(brand, 0) + 1
+        groups[group] = groups.get(group, 0) + 1
+        selected.append(int(row))
+        if len(selected) == k:
+            break
+    return selected
+
+def test_near_duplicates_share_a_cluster(shade_index, clusters):
+    assert len(clusters) < len(shade_index) / 2
+    leaders = clusters.leaders[clusters.cluster_of]
+    distances = np.array([
+        ColorUtils.delta_e_cie94_matrix(shade_index.labs[leader:leader + 1], shade_index.labs[row:row + 1])[0, 0]
+        for row, leader in enumerate(leaders)
+    ])
+    assert np.all(distances < 1.0)
+
+@pytest.mark.parametrize("k", [1, 5, 25])
+def test_queries_match_the_full_scan(shade_index, clusters, k):
+    labs = np.random.default_rng(8).uniform((25, -3, -3), (90, 40, 50), (200, 3))
+    for category in ('foundation', 'lipstick'):
+        assert rows(shade_index, clusters.query_batch(labs, category, k)) == \
+               rows(shade_index, shade_index.query_batch(labs, category, k))
+
+@pytest.mark.parametrize("max_per_brand, max_per_cluster", [(2, 0), (0, 1), (1, 1)])
+def test_caps_match_a_capped_scan(shade_index, clusters, max_per_brand, max_per_cluster):
+    labs = np.random.default_rng(9).uniform((25, -3, -3), (90, 40, 50), (60, 3))
+    results = rows(shade_index, clusters.query_batch(labs, 'foundation', 6, max_per_brand, max_per_cluster))
+    for lab, selected in zip(labs, results):
+        assert selected == capped_scan(shade_index, clusters, lab, 'foundation', 6, max_per_brand, max_per_cluster)
+
+def test_saved_clusters_reload_only_for_the_same_threshold(shade_index, clusters, tmp_path):
+    path = tmp_path / "clusters.npz"
+    clusters.save(path)
+    loaded = ShadeClusters.load(shade_index, path, threshold=1.0)
+    assert loaded is not None and np.array_equal(loaded.members, clusters.members)
+    assert ShadeClusters.load(shade_index, path, threshold=2.0) is None
+    assert ShadeClusters.load(shade_index, tmp_path / "missing.npz", threshold=1.0) is None
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from app.services.color_utils import ColorUtils
+from app.services.shade_index import ShadeIndex
+
+SHADES = 20000
+
+@pytest.fixture(scope="module")
+def shade_index():
+    """Synthetic catalog of one-shade products spread over the skin gamut"""
+    rng = np.random.default_rng(1)
+    labs = np.column_stack([rng.uniform(20, 90, SHADES), rng.uniform(-5, 45, SHADES), rng.uniform(-5, 55, SHADES)])
+    products = [
+        {'id': i, 'name': f"Product {i}", 'brand': f"Brand {i % 20}", 'category': ['foundation', 'blush'][i % 2],
+         'price_inr': 100 + i % 900, 'rating': 3 + i % 3, 'reviews_count': i, 'shades': [{'name': f"Shade {i}"}]}
+        for i in range(SHADES)
+    ]
+    return ShadeIndex(products, labs)
+
+def scan(shade_index, lab, k, radius):
+    """Reference result: every shade scored, sorted by (delta_e, row)"""
+    distances = ColorUtils.round_array(ColorUtils.delta_e_cie94_matrix(lab[None, :], shade_index.labs)[0])
+    order = np.lexsort((np.arange(len(distances)), distances))
+    results = [(int(row), float(distances[row])) for row in order]
+    if radius is not None:
+        results = [(row, delta_e) for row, delta_e in results if delta_e <= radius]
+    return results if k is None else results[:k]
+
+@pytest.mark.parametrize("k, radius", [(10, None), (None, 0.5), (None, 4.0), (50, 3.0), (5, 20.0)])
+def test_neighbors_match_a_full_scan(shade_index, k, radius):
+    rng = np.random.default_rng(2)
+    for lab in np.column_stack([rng.uniform(30, 85, 50), rng.uniform(2, 30, 50), rng.uniform(5, 40, 50)]):
+        user_lab = {'l': lab[0], 'a': lab[1], 'b': lab[2]}
+        assert shade_index.neighbors(user_lab, k, radius) == scan(shade_index, lab, k, radius)
+
+def test_search_covers_a_fraction_of_the_catalog(shade_index):
+    lab = np.array([65.0, 14.0, 22.0])
+    bound = scan(shade_index, lab, 10, None)[-1][1]
+    centers, radius = shade_index._search_balls(lab, bound)
+    covered = set()
+    for ball in shade_index.tree.query_ball_point(centers, radius):
+        covered.update(ball)
+    
+    single = shade_index.tree.query_ball_point(lab, (bound + 0.005) * np.sqrt(1 + np.hypot(lab[1], lab[2]) ** 2))
+    assert len(covered) < len(single) / 4
+
+def test_facet_filters_match_a_row_by_row_check(shade_index):
+    rng = np.random.default_rng(3)
+    products = [shade_index.products[p] for p in shade_index.product_rows.tolist()]
+    for i in range(50):
+        brands = [f"brand {b}" for b in rng.choice(20, 3, replace=False)]
+        low, high = sorted(rng.uniform(100, 1000, 2))
+        min_rating = [None, 4, 5][i % 3]
+        rows = shade_index.filter_rows(['blush'], brands, None, low, high, min_rating)
+        expected = [
+            row for row, product in enumerate(products)
+            if product['category'] == 'blush' and product['brand'].casefold() in brands
+            and low <= product['price_inr'] <= high and (min_rating is None or product['rating'] >= min_rating)
+        ]
+        assert rows.tolist() == expected
+
+def test_filtered_rows_are_ranked_by_color_or_rating(shade_index):
+    rows = shade_index.filter_rows(['foundation'], max_price=300)
+    lab = np.array([62.0, 12.0, 20.0])
+    ranked = shade_index.rank(rows, {'l': lab[0], 'a': lab[1], 'b': lab[2]}, 20)
+    reference = [(row, delta_e) for row, delta_e in scan(shade_index, lab, None, None) if row in set(rows.tolist())]
+    assert ranked == reference[:20]
+    
+    by_rating = shade_index.rank(rows, None, 20)
+    keys = [(-shade_index.ratings[row], -shade_index.reviews[row], row) for row, _ in by_rating]
+    assert keys == sorted(keys) and all(delta_e is None for _, delta_e in by_rating)
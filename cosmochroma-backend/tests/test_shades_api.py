@@ -0,0 +1,45 @@
+import pytest
+
+def all_pages(client, url: str) -> tuple:
+    """Every shade of a paginated query, following next_cursor"""
+    separator = '&' if '?' in url else '?'
+    page = client.get(url).json()
+    shades, total = list(page["results"]), page["total"]
+    while page["next_cursor"]:
+        page = client.get(f"{url}{separator}cursor={page['next_cursor']}").json()
+        shades.extend(page["results"])
+    return shades, total
+
+def test_pages_join_into_the_whole_result(client):
+    whole = client.get("/api/shades/near?hex=%23C68E6A&radius=15&limit=100").json()
+    assert whole["next_cursor"] is None
+    
+    shades, total = all_pages(client, "/api/shades/near?hex=%23C68E6A&radius=15&limit=3")
+    assert total == whole["total"] == len(shades) > 3
+    assert [shade["shade_id"] for shade in shades] == [shade["shade_id"] for shade in whole["results"]]
+    assert all(shade["delta_e_distance"] <= 15 for shade in shades)
+
+def test_radius_and_k_combine(client):
+    radius = client.get("/api/shades/near?rgb=198,142,106&radius=10&category=foundation&limit=100").json()
+    nearest = client.get("/api/shades/near?rgb=198,142,106&radius=10&k=4&category=foundation").json()
+    assert nearest["results"] == radius["results"][:4]
+    assert all(shade["category"] == "foundation" for shade in radius["results"])
+
+def test_shade_neighbors_exclude_the_shade(client):
+    shade_id = client.get("/api/shades/near?hex=%23C68E6A&k=1").json()["results"][0]["shade_id"]
+    neighbors, total = all_pages(client, f"/api/shades/{shade_id}/neighbors?k=12&limit=5")
+    assert total == len(neighbors) == 12
+    assert shade_id not in {shade["shade_id"] for shade in neighbors}
+    
+    by_reference = client.get(f"/api/shades/near?shade_id={shade_id}&k=12&limit=12").json()
+    assert by_reference["results"] == neighbors
+
+@pytest.mark.parametrize("url, status_code", [
+    ("/api/shades/unknown-shade/neighbors", 404),
+    ("/api/shades/near?hex=%23C68E6A", 400),
+    ("/api/shades/near?k=5", 400),
+    ("/api/shades/near?hex=%23C68E6A&rgb=1,2,3&k=5", 400),
+    ("/api/shades/near?hex=%23C68E6A&k=5&cursor=not-a-cursor", 400),
+])
+def test_invalid_shade_queries(client, url, status_code):
+    assert client.get(url).status_code == status_code
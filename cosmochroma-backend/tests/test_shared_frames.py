@@ -0,0 +1,94 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from PIL import Image
+from app.services import shared_frames
+from app.services.image_processor import ImageProcessor
+from app.services.quality_tiers import QUALITY_TIERS
+from app.services.selfie_cache import PerceptualHashCache
+from app.services.shared_frames import SharedFrameProcessPool, SharedFrameRing
+from app.utils.deadline import RequestDeadline
+from app.utils.error_handlers import DeadlineExceededException
+
+@pytest.fixture
+def frame_pool():
+    """Process pool stand-in running the worker function in a thread, with one small slot"""
+    pool = SharedFrameProcessPool(ImageProcessor(), workers=1)
+    pool.owner_pid = os.getpid()
+    pool.ring = SharedFrameRing(1, 64 * 64 * 3)
+    pool.pool = ThreadPoolExecutor(max_workers=1)
+    yield pool
+    pool.pool.shutdown(wait=True)
+    pool.ring.close()
+
+def test_slots_shrink_to_free_shared_memory(monkeypatch):
+    monkeypatch.setattr(shared_frames, "shm_available_bytes", lambda: 10 * 1024 * 1024)
+    pool = SharedFrameProcessPool(ImageProcessor(), workers=2)
+    pool._fit_shm()
+    assert pool.slots * pool.slot_bytes <= 10 * 1024 * 1024
+
+def test_waiting_for_a_slot_is_bounded_by_the_deadline(frame_pool):
+    held = frame_pool.ring.acquire()
+    try:
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceededException):
+            frame_pool.extract_skin_color(Image.new('RGB', (64, 64)), QUALITY_TIERS['full'], RequestDeadline(0.1))
+        assert time.monotonic() - started < 1
+    finally:
+        frame_pool.ring.release(held)
+
+def test_hung_worker_is_bounded_by_the_deadline(frame_pool, monkeypatch):
+    monkeypatch.setattr(shared_frames, "_extract_from_shared", lambda *args: time.sleep(0.5))
+    
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceededException):
+        frame_pool.extract_skin_color(Image.new('RGB', (64, 64)), QUALITY_TIERS['full'], RequestDeadline(0.1))
+    assert time.monotonic() - started < 0.4
+    
+    # The slot comes back only once the worker is done with it
+    assert frame_pool.ring.acquire(timeout=0) is None
+    assert frame_pool.ring.acquire(timeout=2) is not None
+
+def test_worker_processes_match_thread_mode(pipeline, selfie_jpeg):
+    pool = SharedFrameProcessPool(ImageProcessor(), workers=1)
+    pool.start()
+    try:
+        image = pipeline.image_processor.open_image(selfie_jpeg)
+        assert pool.extract_skin_color(image, QUALITY_TIERS['full']) == pipeline.extract_skin_color(selfie_jpeg)
+        
+        # Every slot is handed back
+        slots = [pool.ring.acquire(timeout=0) for _ in range(pool.slots)]
+        assert None not in slots
+    finally:
+        pool.shutdown()
+
+def test_frames_larger_than_a_slot_run_in_the_calling_thread(frame_pool, pipeline, selfie_jpeg, monkeypatch):
+    monkeypatch.setattr(shared_frames, "_extract_from_shared", lambda *args: pytest.fail("frame should overflow"))
+    image = pipeline.image_processor.open_image(selfie_jpeg)
+    assert frame_pool.extract_skin_color(image, QUALITY_TIERS['full']) == pipeline.extract_skin_color(selfie_jpeg)
+    assert frame_pool.ring.acquire(timeout=0) is not None
+
+def test_cached_face_box_skips_detection_in_the_worker(frame_pool, pipeline, selfie_jpeg, monkeypatch):
+    frame_pool.ring.close()
+    frame_pool.ring = SharedFrameRing(1, 512 * 512 * 3)
+    faces = []
+    extract = shared_frames._extract_from_shared
+    monkeypatch.setattr(shared_frames, "_extract_from_shared",
+                        lambda *args: faces.append(args[3]) or extract(*args))
+    shared_frames._init_worker(1)
+    cache = PerceptualHashCache()
+    
+    color = frame_pool.extract_skin_color(pipeline.image_processor.open_image(selfie_jpeg), QUALITY_TIERS['full'],
+                                          cache_probe=cache.probe(1))
+    assert color == pipeline.extract_skin_color(selfie_jpeg)
+    
+    # A color is only reused for the same or a worse tier, but the face box is reused for any
+    assert frame_pool.extract_skin_color(pipeline.image_processor.open_image(selfie_jpeg), QUALITY_TIERS['full'],
+                                         cache_probe=cache.probe(0)) == color
+    assert faces[0] is None and faces[1] is not None
+    
+    # A hit never reaches the worker
+    assert frame_pool.extract_skin_color(pipeline.image_processor.open_image(selfie_jpeg), QUALITY_TIERS['full'],
+                                         cache_probe=cache.probe(1)) == color
+    assert len(faces) == 2
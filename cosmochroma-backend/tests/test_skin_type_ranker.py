@@ -0,0 +1,122 @@
+import json
+import numpy as np
+import pytest
+from app.services.shade_index import ShadeIndex
+from app.services.skin_type_ranker import FEATURES, SkinTypeRanker
+
+WEIGHTS = {
+    'oily': {'long_wear': 4.0, 'matte': 3.0, 'dewy': -3.0},
+    'sensitive': {'hypoallergenic': 6.0, 'spf': 1.0},
+    'normal': {},
+}
+
+@pytest.fixture(scope="module")
+def shade_index():
+    rng = np.random.default_rng(20)
+    finishes = ['matte', 'dewy', 'satin', None]
+    products = [
+        {'id': i, 'name': f"Product {i}", 'brand': f"Brand {i % 5}", 'category': 'foundation',
+         'price_inr': 500, 'rating': 4, 'reviews_count': i, 'long_wear': i % 2 == 0, 'hydrating': i % 3 == 0,
+         'hypoallergenic': i % 4 == 0, 'spf': [0, 15, 30, 80][i % 4], 'finish': finishes[i % 4],
+         'shades': [{'name': f"Shade {i}-{s}", 'finish': finishes[(i + s) % 4] if s else None} for s in range(3)]}
+        for i in range(40)
+    ]
+    labs = np.column_stack([rng.uniform(40, 80, 120), rng.uniform(5, 25, 120), rng.uniform(5, 35, 120)])
+    return ShadeIndex(products, labs)
+
+@pytest.fixture(scope="module")
+def ranker(shade_index, tmp_path_factory):
+    path = tmp_path_factory.mktemp("weights") / "weights.json"
+    path.write_text(json.dumps(WEIGHTS))
+    return SkinTypeRanker.open(shade_index, path)
+
+def reference_rerank(ranker, candidates, skin_type, count):
+    """One list at a time: each place goes to the best scored unused shade of its palette"""
+    weights = ranker.weights.get(skin_type, ranker.zero_weights)
+    scored = {}
+    for position, match in enumerate(candidates):
+        score = match[2] - float(np.dot(ranker.features[ranker.shade_index.row_of(match[1])], weights))
+        scored.setdefault(match[3] if len(match) > 3 else None, []).append((score, position, match))
+    for group in scored.values():
+        group.sort(key=lambda scored_match: scored_match[:2])
+    
+    chosen = []
+    for match in candidates[:count]:
+        group = scored[match[3] if len(match) > 3 else None]
+        chosen.append(group.pop(0)[2])
+    return chosen
+
+def test_feature_matrix_reads_product_and_shade_attributes(ranker, shade_index):
+    for row in range(len(shade_index)):
+        product = shade_index.products[shade_index.product_rows[row]]
+        shade = product['shades'][shade_index.shade_rows[row]]
+        features = dict(zip(FEATURES, ranker.features[row]))
+        assert features['long_wear'] == product['long_wear']
+        assert features['hypoallergenic'] == product['hypoallergenic']
+        assert features['spf'] == pytest.approx(min(product['spf'] / 50, 1.0))
+        finish = shade['finish'] or product['finish']
+        assert [features[f] for f in ('matte', 'dewy', 'satin')] == [float(finish == f) for f in ('matte', 'dewy', 'satin')]
+
+@pytest.mark.parametrize("palettes", [None, ['analogous', 'contrast', 'complementary']])
+def test_vectorized_rerank_matches_the_reference(ranker, shade_index, palettes):
+    rng = np.random.default_rng(21)
+    skin_types = ['oily', 'sensitive', 'normal', 'dry'] * 5
+    matches = []
+    for _ in skin_types:
+        rows = rng.choice(len(shade_index), int(rng.integers(0, 15)), replace=False)
+        distances = np.sort(np.round(rng.uniform(0, 10, len(rows)), 2))
+        candidates = [shade_index.match(row, float(e)) for row, e in zip(rows, distances)]
+        if palettes:
+            candidates = [(*match, palettes[i % 3]) for i, match in enumerate(candidates)]
+        matches.append(candidates)
+    
+    results = ranker.rerank(matches, skin_types, 5)
+    for candidates, skin_type, result in zip(matches, skin_types, results):
+        assert result == reference_rerank(ranker, candidates, skin_type, 5)
+        if palettes:
+            assert [match[3] for match in result] == [match[3] for match in candidates[:5]]
+
+def test_skin_types_without_weights_keep_the_delta_e_order(ranker, shade_index):
+    candidates = [shade_index.match(row, float(row) / 10) for row in range(10)]
+    assert not ranker.adjusts(['normal', 'dry'])
+    assert ranker.rerank([candidates, candidates], ['normal', 'dry'], 4) == [candidates[:4], candidates[:4]]
+
+def test_oily_skin_prefers_long_wearing_matte_over_a_slightly_closer_dewy_shade(ranker, shade_index):
+    dewy = next(row for row in range(len(shade_index)) if ranker.features[row, FEATURES.index('dewy')] and
+                not ranker.features[row, FEATURES.index('long_wear')])
+    matte = next(row for row in range(len(shade_index)) if ranker.features[row, FEATURES.index('matte')] and
+                 ranker.features[row, FEATURES.index('long_wear')])
+    candidates = [shade_index.match(dewy, 1.0), shade_index.match(matte, 4.0)]
+    assert ranker.rerank([candidates], ['oily'], 1) == [[candidates[1]]]
+
+@pytest.mark.parametrize("weights, message", [
+    ({'greasy': {'matte': 1.0}}, "unknown skin type"),
+    ({'oily': {'shine': 1.0}}, "unknown feature"),
+    ({'oily': {'matte': "high"}}, "must be a number"),
+    ({'oily': {'matte': True}}, "must be a number"),
+])
+def test_invalid_weights_are_rejected(tmp_path, weights, message):
+    path = tmp_path / "weights.json"
+    path.write_text(json.dumps(weights))
+    with pytest.raises(ValueError, match=message):
+        SkinTypeRanker.load_weights(path)
+
+def test_shipped_weights_cover_every_skin_type():
+    weights = SkinTypeRanker.load_weights()
+    assert set(weights) == {'normal', 'oily', 'dry', 'combination', 'sensitive'}
+    assert all(vector.shape == (len(FEATURES),) for vector in weights.values())
+
+def test_products_without_attributes_are_neutral(tmp_path):
+    products = [
+        {'id': i, 'name': f"Product {i}", 'brand': "Brand", 'category': 'foundation', 'price_inr': 500,
+         'rating': 4, 'reviews_count': 1, 'shades': [{'name': f"Shade {i}"}]}
+        for i in range(4)
+    ]
+    shade_index = ShadeIndex(products, np.array([[50.0 + i, 10.0, 20.0] for i in range(4)]))
+    path = tmp_path / "weights.json"
+    path.write_text(json.dumps(WEIGHTS))
+    ranker = SkinTypeRanker.open(shade_index, path)
+    
+    assert not ranker.features.any()
+    candidates = [shade_index.match(row, float(row)) for row in range(4)]
+    assert ranker.rerank([candidates, candidates], ['oily', 'sensitive'], 3) == [candidates[:3], candidates[:3]]
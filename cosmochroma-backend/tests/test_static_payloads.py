@@ -0,0 +1,69 @@
+import gzip
+import json
+import pytest
+from app.services.static_payloads import StaticPayload
+
+CONTENT = {'products': [{'name': f"Shade {i}", 'hex': "#C68E6A"} for i in range(50)]}
+
+def test_gzip_body_and_etag_differ_from_identity():
+    payload = StaticPayload(CONTENT)
+    assert json.loads(gzip.decompress(payload.bodies['gzip'])) == json.loads(payload.bodies['identity'])
+    assert payload.etags['gzip'] == f'"{payload.digest}-gzip"' != payload.etag
+    assert StaticPayload(CONTENT).etag == payload.etag
+
+@pytest.mark.parametrize("accept_encoding, encoding", [
+    (None, 'identity'),
+    ("gzip, deflate", 'gzip'),
+    ("gzip;q=0", 'identity'),
+    ("deflate, *;q=0.5", 'gzip'),
+    ("identity;q=0, gzip;q=0.1", 'gzip'),
+])
+def test_encoding_negotiation(accept_encoding, encoding):
+    assert StaticPayload(CONTENT).negotiate(accept_encoding) == encoding
+
+@pytest.mark.parametrize("if_none_match, matches", [
+    (None, False),
+    ('"0123"', False),
+    ('*', True),
+])
+def test_if_none_match_literals(if_none_match, matches):
+    assert StaticPayload(CONTENT).matches(if_none_match) is matches
+
+def test_if_none_match_accepts_any_representation_and_weak_tags():
+    payload = StaticPayload(CONTENT)
+    assert payload.matches(f'"other", {payload.etags["gzip"]}')
+    assert payload.matches(f'W/{payload.etag}')
+
+@pytest.mark.parametrize("path", ["/api/routines/oily", "/api/products", "/api/products/foundation"])
+def test_matching_etag_gets_a_304(client, path):
+    first = client.get(path)
+    assert first.status_code == 200
+    assert "Accept-Encoding" in first.headers["vary"]
+    
+    repeat = client.get(path, headers={"If-None-Match": first.headers["etag"]})
+    assert repeat.status_code == 304
+    assert repeat.content == b""
+    assert repeat.headers["etag"] == first.headers["etag"]
+
+def test_gzip_clients_get_the_precompressed_body(client):
+    plain = client.get("/api/products", headers={"Accept-Encoding": "identity"})
+    compressed = client.get("/api/products", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in plain.headers
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["etag"] != plain.headers["etag"]
+    assert compressed.json() == plain.json()
+    assert plain.json()["total"] == len(plain.json()["products"])
+
+def test_category_catalog_holds_only_that_category(client):
+    body = client.get("/api/products/foundation").json()
+    assert body["categories"] == ["foundation"]
+    assert body["products"] and all(product["category"] == "foundation" for product in body["products"])
+
+def test_routines_cover_every_routine_type(client):
+    body = client.get("/api/routines/dry").json()
+    assert body["skin_type"] == "dry"
+    assert {"morning_routine", "evening_routine", "weekly_routine"} <= set(body)
+
+@pytest.mark.parametrize("path", ["/api/routines/greasy", "/api/products/perfume"])
+def test_unknown_skin_type_or_category_is_a_404(client, path):
+    assert client.get(path).status_code == 404